@@ -0,0 +1,135 @@
+"""
+Measures the throughput of a statistical term computed item by item, and
+on batches of NumPy columns (`Batch[Sample]`, see mypy_pkg/runtime.py).
+
+Both circuits standardize a stream of samples against running moments: the
+item term updates them in Python for every sample, the batch term once per
+batch of `--batch` samples, with NumPy. "unbatched" splits the batches back
+into items before the last term, "batches" counts them as they are.
+
+    python benchmarks/batches.py --items 100000 --batch 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Iterator, TypedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logicsponge.core as ls
+from mypy_pkg.runtime import Batch, Batcher, Unbatcher
+
+
+class Sample(TypedDict):
+    value: float
+
+
+class Scored(TypedDict):
+    value: float
+    z: float
+
+
+class Samples(ls.SourceTerm):
+    Output = Sample
+
+    def __init__(self, *args, items: int, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.values = [random.gauss(0.5, 1.0) for _ in range(items)]
+
+    def generate(self) -> Iterator[ls.DataItem]:
+        for value in self.values:
+            yield ls.DataItem({"value": value})
+
+
+class ZScore(ls.StatefulFunctionTerm):
+    Input = Sample
+    Output = Scored
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.n, self.total, self.squares = 0, 0.0, 0.0
+
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        value = di["value"]
+        self.n += 1
+        self.total += value
+        self.squares += value * value
+        mean = self.total / self.n
+        std = max(self.squares / self.n - mean * mean, 0.0) ** 0.5
+        return ls.DataItem({"value": value, "z": (value - mean) / std if std else 0.0})
+
+
+class BatchZScore(ls.StatefulFunctionTerm):
+    Input = Batch[Sample]
+    Output = Batch[Scored]
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.n, self.total, self.squares = 0, 0.0, 0.0
+
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        values = di["value"]
+        n = self.n + np.arange(1, len(values) + 1)
+        totals = self.total + np.cumsum(values)
+        squares = self.squares + np.cumsum(values * values)
+        self.n, self.total, self.squares = int(n[-1]), float(totals[-1]), float(squares[-1])
+        mean = totals / n
+        std = np.sqrt(np.maximum(squares / n - mean * mean, 0.0))
+        z = np.divide(values - mean, std, out=np.zeros_like(values), where=std > 0)
+        return ls.DataItem({"value": values, "z": z})
+
+
+class Count(ls.FunctionTerm):
+    """Counts samples, in single items or in batches."""
+
+    def __init__(self, *args, batched: bool, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.batched = batched
+        self.count = 0
+
+    def f(self, di: ls.DataItem) -> None:
+        self.count += len(di["z"]) if self.batched else 1
+
+
+def run(items: int, batch: int, variant: str) -> tuple[float, int]:
+    source, count = Samples(items=items), Count(batched=variant == "batches")
+    if variant == "items":
+        circuit = source * ZScore() * count
+    elif variant == "unbatched":
+        circuit = source * Batcher(size=batch, schema=Sample) * BatchZScore() * Unbatcher() * count
+    else:
+        circuit = source * Batcher(size=batch, schema=Sample) * BatchZScore() * count
+    start = time.perf_counter()
+    circuit.start()
+    circuit.join()
+    return time.perf_counter() - start, count.count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100_000, help="samples emitted by the source")
+    parser.add_argument("--batch", type=int, default=1000, help="samples per batch")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per variant")
+    args = parser.parse_args()
+    if args.items % args.batch:
+        parser.error("--items must be a multiple of --batch")
+
+    walls: dict[str, float] = {}
+    for name in ("items", "unbatched", "batches"):
+        runs = []
+        for _ in range(args.repeat):
+            wall, count = run(args.items, args.batch, name)
+            assert count == args.items
+            runs.append(wall)
+        walls[name] = statistics.median(runs)
+        print(f"{name:>9}: {walls[name]:.3f} s, {args.items / walls[name]:,.0f} items/s")
+    print(f"speedup: x{walls['items'] / walls['batches']:.2f} (x{walls['items'] / walls['unbatched']:.2f} when split back into items)")
+
+
+if __name__ == "__main__":
+    main()
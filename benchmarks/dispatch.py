@@ -0,0 +1,110 @@
+"""
+Measures what the plugin costs on code that does not use logicsponge.
+
+Mypy asks the plugin for a method hook on every method call it checks, so in
+a large codebase where logicsponge is a small part, nearly all of the
+plugin's work is answering "no" for unrelated fullnames. This generates a
+`corpus` package of plain classes (with `__mul__` and `__or__` operators, the
+methods the plugin hooks) and many call sites, and runs the same cold
+bare/plugin comparison as run.py on it.
+
+    python benchmarks/dispatch.py --modules 200 --repeat 5
+
+The report shows both wall times, their ratio and the total time spent in
+`get_method_hook`, measured by the plugin's profiler.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+from typing import Any
+
+from run import PLUGINS, hook_timings, measure, run_mypy, write_config
+
+
+def generate_module(index: int, classes: int, calls: int) -> str:
+    lines = ["from __future__ import annotations", ""]
+    if index:
+        lines += [f"from .m{index - 1} import *", ""]
+    for c in range(classes):
+        name = f"Vec{index}_{c}"
+        lines += [
+            f"class {name}:",
+            "    def __init__(self, x: float, y: float) -> None:",
+            "        self.x = x",
+            "        self.y = y",
+            f"    def __mul__(self, other: {name}) -> {name}:",
+            f"        return {name}(self.x * other.x, self.y * other.y)",
+            f"    def __or__(self, other: {name}) -> {name}:",
+            f"        return {name}(max(self.x, other.x), max(self.y, other.y))",
+            f"    def scale(self, k: float) -> {name}:",
+            f"        return {name}(self.x * k, self.y * k)",
+            "    def norm(self) -> float:",
+            "        return (self.x ** 2 + self.y ** 2) ** 0.5",
+            "",
+        ]
+    for c in range(classes):
+        name = f"Vec{index}_{c}"
+        lines.append(f"def use_{index}_{c}(items: list[{name}]) -> float:")
+        lines.append(f"    acc = {name}(1.0, 1.0)")
+        for k in range(calls):
+            lines.append(f"    acc = (acc * items[{k}]).scale({k}.5) | acc")
+        lines.append("    parts = ','.join(str(v.norm()) for v in items).split(',')")
+        lines.append("    return acc.norm() + len(parts)")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_corpus(out_dir: str, modules: int, classes: int, calls: int) -> int:
+    """
+    Writes the corpus into `out_dir/corpus` and returns its number of lines.
+    """
+    package = os.path.join(out_dir, "corpus")
+    os.makedirs(package, exist_ok=True)
+    with open(os.path.join(package, "__init__.py"), "w"):
+        pass
+    lines = 0
+    for index in range(modules):
+        text = generate_module(index, classes, calls)
+        with open(os.path.join(package, f"m{index}.py"), "w") as f:
+            f.write(text)
+        lines += text.count("\n") + 1
+    return lines
+
+
+def benchmark(modules: int, classes: int, calls: int, repeat: int, out_dir: str) -> dict[str, Any]:
+    lines = generate_corpus(out_dir, modules, classes, calls)
+    configs = {name: write_config(out_dir, name, plugin) for name, plugin in PLUGINS.items()}
+    run_mypy(configs["bare"], out_dir, package="corpus")
+    results = measure(configs, out_dir, repeat, package="corpus")
+    return {"lines": lines, "results": results, "hooks": hook_timings(out_dir, package="corpus")}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", type=int, default=100, help="modules in the corpus")
+    parser.add_argument("--classes", type=int, default=10, help="classes per module")
+    parser.add_argument("--calls", type=int, default=20, help="composition lines per function")
+    parser.add_argument("--repeat", type=int, default=3, help="cold runs per configuration")
+    parser.add_argument("--out-dir", help="where to generate the corpus (default: a temporary directory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = benchmark(args.modules, args.classes, args.calls, args.repeat, args.out_dir or tmp)
+
+    bare, plugin = report["results"]["bare"], report["results"]["plugin"]
+    print(f"corpus: {args.modules} modules, {report['lines']} lines")
+    for name, result in report["results"].items():
+        runs = ", ".join(f"{wall:.2f}" for wall in result["wall_runs_s"])
+        print(f"{name:>8}: {result['wall_s']:.2f} s (runs: {runs}), {result['peak_rss_mb']:.0f} MB, {result['errors']} errors")
+    print(f"overhead: {plugin['wall_s'] - bare['wall_s']:+.2f} s (x{plugin['wall_s'] / bare['wall_s']:.3f})")
+    dispatch = report["hooks"].get("get_method_hook", {"calls": 0, "total_s": 0.0})
+    print(
+        f"get_method_hook: {dispatch['calls']} calls, {dispatch['total_s'] * 1000:.1f} ms total, "
+        f"{dispatch['total_s'] / bare['wall_s']:.4%} of the bare run"
+    )
+
+
+if __name__ == "__main__":
+    main()
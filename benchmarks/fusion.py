@@ -0,0 +1,87 @@
+"""
+Measures the throughput of a chain of stateless FunctionTerms, as written
+(`Source() * Inc() * ... * Inc() * Count()`) and with the run of `Inc`s
+replaced by one `fuse(...)` term from mypy_pkg/runtime.py.
+
+    python benchmarks/fusion.py --stages 10 --items 20000
+
+Every term of a circuit hands each item over to the next one; a fused term
+calls the `f` of the terms it replaces one after the other instead, so the
+difference is the cost of those hand-offs.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Iterator, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logicsponge.core as ls
+from mypy_pkg.runtime import fuse
+
+
+class Numbers(ls.SourceTerm):
+    def __init__(self, *args, items: int, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.items = items
+
+    def generate(self) -> Iterator[ls.DataItem]:
+        for i in range(self.items):
+            yield ls.DataItem({"x": i})
+
+
+class Inc(ls.FunctionTerm):
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return ls.DataItem({"x": di["x"] + 1})
+
+
+class Count(ls.FunctionTerm):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.count = 0
+        self.last: Optional[int] = None
+
+    def f(self, di: ls.DataItem) -> None:
+        self.count += 1
+        self.last = di["x"]
+
+
+def run(stages: int, items: int, fused: bool) -> tuple[float, Count]:
+    incs = [Inc() for _ in range(stages)]
+    count = Count()
+    circuit = Numbers(items=items)
+    if fused:
+        circuit = circuit * fuse(*incs)
+    else:
+        for inc in incs:
+            circuit = circuit * inc
+    circuit = circuit * count
+    start = time.perf_counter()
+    circuit.start()
+    circuit.join()
+    return time.perf_counter() - start, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", type=int, default=10, help="Inc terms in the chain")
+    parser.add_argument("--items", type=int, default=20_000, help="items emitted by the source")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per variant")
+    args = parser.parse_args()
+
+    walls: dict[str, float] = {}
+    for name, fused in (("chain", False), ("fused", True)):
+        runs = []
+        for _ in range(args.repeat):
+            wall, count = run(args.stages, args.items, fused)
+            assert count.count == args.items and count.last == args.items - 1 + args.stages
+            runs.append(wall)
+        walls[name] = statistics.median(runs)
+        print(f"{name}: {walls[name]:.3f} s, {args.items / walls[name]:,.0f} items/s")
+    print(f"speedup: x{walls['chain'] / walls['fused']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
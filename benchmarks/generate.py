@@ -0,0 +1,200 @@
+"""
+Generates synthetic logicsponge projects to measure the cost of the plugin.
+
+The project is a package with:
+- `schemas.py`: TypedDict schemas `S0` ... `S<terms>` with `keys` keys each,
+- `terms.py`: one source per schema and terms `T<i>` mapping `S<i>` to `S<i+1>`,
+- `generics.py`: generic terms in the style of `XtoY_Gen[T]` (tests/hw4.py),
+- `circuits.py`: `*` chains of `chain` terms, fan-outs of `fanout` branches
+  joined with `|`, and chains through the generic terms.
+
+Usage: python benchmarks/generate.py OUT_DIR [--terms N] [--keys M] ...
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from dataclasses import asdict, dataclass
+
+KEY_TYPES = ["int", "str", "float", "bool", "list[int]"]
+
+
+@dataclass(frozen=True)
+class Params:
+    terms: int = 100
+    keys: int = 10
+    chain: int = 10
+    circuits: int = 50
+    fanout: int = 0
+    generics: int = 0
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.chain <= self.terms:
+            raise ValueError("chain must be between 1 and the number of terms")
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+def generate_schemas(params: Params) -> str:
+    lines = ["from typing import Generic, TypedDict, TypeVar", "", "T = TypeVar('T')", ""]
+    for i in range(params.terms + 1):
+        lines.append(f"class S{i}(TypedDict):")
+        for k in range(params.keys):
+            lines.append(f"    k{k}: {KEY_TYPES[k % len(KEY_TYPES)]}")
+        lines.append("")
+    lines += [
+        "class GenIn(TypedDict, Generic[T]):",
+        "    x: T",
+        "",
+        "class GenOut(TypedDict, Generic[T]):",
+        "    y: T",
+        "",
+        "class IntX(TypedDict):",
+        "    x: int",
+        "",
+        "class IntY(TypedDict):",
+        "    y: int",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def generate_terms(params: Params) -> str:
+    lines = [
+        "from typing import Iterator",
+        "import logicsponge.core as ls",
+        "from .schemas import *",
+        "",
+    ]
+    for i in range(params.terms + 1):
+        lines += [
+            f"class Source{i}(ls.SourceTerm):",
+            f"    Output = S{i}",
+            "    def generate(self) -> Iterator[ls.DataItem]:",
+            "        yield ls.DataItem({})",
+            "",
+        ]
+    for i in range(params.terms):
+        lines += [
+            f"class T{i}(ls.FunctionTerm):",
+            f"    Input = S{i}",
+            f"    Output = S{i + 1}",
+            "    def f(self, di: ls.DataItem) -> ls.DataItem:",
+            "        return di",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def generate_generics(params: Params) -> str:
+    lines = [
+        "from typing import Iterator",
+        "import logicsponge.core as ls",
+        "from .schemas import GenIn, GenOut, IntX, IntY",
+        "",
+        "class IntSource(ls.SourceTerm):",
+        "    Output = IntX",
+        "    def generate(self) -> Iterator[ls.DataItem]:",
+        "        yield ls.DataItem({'x': 0})",
+        "",
+        "class IntSink(ls.FunctionTerm):",
+        "    Input = IntY",
+        "    def f(self, di: ls.DataItem) -> ls.DataItem:",
+        "        return di",
+        "",
+    ]
+    for g in range(params.generics):
+        lines += [
+            f"class Gen{g}[T](ls.FunctionTerm):",
+            "    @property",
+            "    def Input(self) -> type[GenIn[T]]:",
+            "        return GenIn[T]",
+            "    @property",
+            "    def Output(self) -> type[GenOut[T]]:",
+            "        return GenOut[T]",
+            "    def f(self, di: ls.DataItem) -> ls.DataItem:",
+            "        return ls.DataItem({'y': di['x']})",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def generate_circuits(params: Params) -> str:
+    lines = [
+        "import logicsponge.core as ls",
+        "from .terms import *",
+        "from .generics import *",
+        "",
+        "def main() -> None:",
+    ]
+    starts = params.terms - params.chain + 1
+    for c in range(params.circuits):
+        start = (c * params.chain) % starts
+        chain = " * ".join(f"T{i}()" for i in range(start, start + params.chain))
+        lines.append(f"    c{c} = Source{start}() * {chain} * ls.Stop()")
+        if params.fanout:
+            branch = " * ".join(f"T{i}()" for i in range(start, start + params.chain))
+            branches = " | ".join(f"({branch})" for _ in range(params.fanout))
+            lines.append(f"    f{c} = Source{start}() * ({branches})")
+    for g in range(params.generics):
+        lines.append(f"    g{g} = IntSource() * Gen{g}[int]() * IntSink() * ls.Stop()")
+    lines.append("    pass")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def generate_project(out_dir: str, params: Params) -> list[str]:
+    """
+    Writes the project into `out_dir/synthetic` and returns the paths of its modules.
+    """
+    package = os.path.join(out_dir, "synthetic")
+    os.makedirs(package, exist_ok=True)
+    modules = {
+        "__init__.py": "",
+        "schemas.py": generate_schemas(params),
+        "terms.py": generate_terms(params),
+        "generics.py": generate_generics(params),
+        "circuits.py": generate_circuits(params),
+    }
+    paths = []
+    for name, text in modules.items():
+        path = os.path.join(package, name)
+        with open(path, "w") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def add_params_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = Params()
+    parser.add_argument("--terms", type=int, default=defaults.terms, help="number of FunctionTerms and schemas")
+    parser.add_argument("--keys", type=int, default=defaults.keys, help="keys per TypedDict schema")
+    parser.add_argument("--chain", type=int, default=defaults.chain, help="terms per '*' chain")
+    parser.add_argument("--circuits", type=int, default=defaults.circuits, help="number of chains")
+    parser.add_argument("--fanout", type=int, default=defaults.fanout, help="'|' branches per chain (0: none)")
+    parser.add_argument("--generics", type=int, default=defaults.generics, help="number of generic terms")
+
+
+def params_from_arguments(args: argparse.Namespace) -> Params:
+    return Params(
+        terms=args.terms,
+        keys=args.keys,
+        chain=args.chain,
+        circuits=args.circuits,
+        fanout=args.fanout,
+        generics=args.generics,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    add_params_arguments(parser)
+    args = parser.parse_args()
+    for path in generate_project(args.out_dir, params_from_arguments(args)):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
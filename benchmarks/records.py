@@ -0,0 +1,96 @@
+"""
+Measures the memory per item and the construction time of DataItems, of the
+records generated by mypy_pkg/runtime.py and of column blocks, on the items
+that flow through the circuits of plain_examples/.
+
+    python benchmarks/records.py --items 100000
+
+The values themselves are allocated before measuring and shared by all the
+containers, so bytes/item is what each container adds on top of them.
+"""
+import argparse
+import functools
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, TypedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logicsponge.core as ls
+from mypy_pkg.runtime import ColumnBlock, record_type
+
+
+class Message(TypedDict):
+    """hello_world.py: Hello -> World"""
+    message: str
+
+
+class Counted(TypedDict):
+    """counter.py: Counter's output"""
+    num: int
+    data: int
+
+
+class Cells(TypedDict):
+    """source_and_function.py: Source -> Compute"""
+    time: float
+    cells: float
+
+
+TTest = TypedDict("TTest", {"t-statistic": float | None, "p-value": float | None, "index": int})
+TTest.__doc__ = "stats.py: OneSampleTTest -> AddIndex -> Print"
+
+ITEMS: dict[type, Callable[[int], dict[str, Any]]] = {
+    Message: lambda i: {"message": f"Hello World! {i}"},
+    Counted: lambda i: {"num": i, "data": i * 2},
+    Cells: lambda i: {"time": i * 5.0, "cells": 10 * 1.1 ** (i % 100)},
+    TTest: lambda i: {"t-statistic": i * 0.1, "p-value": None if i % 7 else 0.5, "index": i},
+}
+
+
+def measure(build: Callable[[], Any], n: int) -> tuple[float, float]:
+    """
+    Bytes per item allocated by `build` and seconds per item it took.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    built = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    # tracemalloc slows allocations down: time a second, untraced build
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    return size / n, elapsed / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100_000, help="items per measurement")
+    args = parser.parse_args()
+    n = args.items
+
+    print(f"{'schema':<8} {'container':<10} {'bytes/item':>10} {'ns/item':>9}")
+    for schema, make in ITEMS.items():
+        payloads = [make(i) for i in range(n)]
+        items = [ls.DataItem(payload) for payload in payloads]
+        record = record_type(schema)
+        values = [tuple(payload[key] for key in record.keys) for payload in payloads]
+        results = {
+            "DataItem": measure(lambda payloads=payloads: [ls.DataItem(payload) for payload in payloads], n),
+            "record": measure(lambda record=record, values=values: [record(*row) for row in values], n),
+            "from_item": measure(lambda record=record, items=items: [record.from_item(item) for item in items], n),
+            "block": measure(functools.partial(ColumnBlock.from_items, schema, items), n),
+        }
+        for name, (size, elapsed) in results.items():
+            print(f"{schema.__name__:<8} {name:<10} {size:>10.0f} {elapsed * 1e9:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
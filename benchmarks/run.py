@@ -0,0 +1,223 @@
+"""
+Measures what the plugin costs on a synthetic project (see generate.py).
+
+mypy checks the project from a cold cache, without the plugin ("bare") and with
+it ("plugin"), `--repeat` times each. We record the median wall time, the peak
+resident memory of the mypy process and the number of errors reported. One
+more run with the plugin's profiler (LOGICSPONGE_PROFILE) records the time
+spent in each hook and phase of a check.
+
+    python benchmarks/run.py --terms 200 --chain 20 --save benchmarks/baselines/default.json
+    python benchmarks/run.py --compare benchmarks/baselines/default.json
+
+`--compare` reruns with the parameters of the baseline and exits with status 1
+when the plugin's overhead relative to the bare run, its peak memory or its
+error count regressed. Comparing ratios rather than seconds keeps baselines
+usable across machines.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Optional
+
+from mypy.version import __version__ as mypy_version
+
+from generate import Params, add_params_arguments, generate_project, params_from_arguments
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+PLUGINS = {
+    "bare": None,
+    "plugin": os.path.join(BASE_DIR, "mypy_pkg", "plugin.py"),
+}
+
+MYPY_CONFIG = """[mypy]
+python_version = 3.12
+{plugins}
+
+[mypy-logicsponge.*]
+ignore_missing_imports = True
+
+[logicsponge]
+allow_untyped_streams = True
+"""
+
+ERROR_LINE = re.compile(r"^.*:\d+: error: ")
+
+
+def write_config(out_dir: str, name: str, plugin: Optional[str]) -> str:
+    path = os.path.join(out_dir, f"mypy-{name}.ini")
+    with open(path, "w") as f:
+        f.write(MYPY_CONFIG.format(plugins=f"plugins = {plugin}" if plugin else ""))
+    return path
+
+
+def run_mypy(config: str, cwd: str, env: Optional[dict[str, str]] = None, package: str = "synthetic") -> dict[str, Any]:
+    """
+    Runs mypy on `package` from a cold cache and returns its wall time (s)
+    and error count.
+    """
+    args = [sys.executable, "-m", "mypy", "--config-file", config, "--no-incremental",
+            "--cache-dir", os.devnull, "-p", package]
+    start = time.perf_counter()
+    process = subprocess.Popen(args, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    stdout, stderr = process.communicate()
+    wall = time.perf_counter() - start
+    if process.returncode not in (0, 1):
+        raise RuntimeError(f"mypy failed:\n{stdout}{stderr}")
+    errors = sum(1 for line in stdout.splitlines() if ERROR_LINE.match(line))
+    return {"wall_s": wall, "errors": errors}
+
+
+def measure(configs: dict[str, str], cwd: str, repeat: int, package: str = "synthetic") -> dict[str, dict[str, Any]]:
+    """
+    Runs every configuration `repeat` times, interleaved so that they all see
+    the same state of the file system caches.
+    """
+    runs: dict[str, list[dict[str, Any]]] = {name: [] for name in configs}
+    for _ in range(repeat):
+        for name, config in configs.items():
+            # RUSAGE_CHILDREN aggregates over all children, so each run gets its own
+            # wrapper process whose only child is mypy
+            result = subprocess.run(
+                [sys.executable, __file__, "--measure-once", config, package],
+                cwd=cwd, capture_output=True, text=True, check=True,
+            )
+            runs[name].append(json.loads(result.stdout))
+    return {
+        name: {
+            "wall_s": statistics.median(run["wall_s"] for run in config_runs),
+            "wall_runs_s": [run["wall_s"] for run in config_runs],
+            "peak_rss_mb": max(run["peak_rss_mb"] for run in config_runs),
+            "errors": config_runs[-1]["errors"],
+        }
+        for name, config_runs in runs.items()
+    }
+
+
+def measure_once(config: str, package: str) -> None:
+    import resource
+
+    run = run_mypy(config, os.getcwd(), package=package)
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    run["peak_rss_mb"] = maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    print(json.dumps(run))
+
+
+def hook_timings(out_dir: str, package: str = "synthetic") -> dict[str, Any]:
+    """
+    The calls, total and maximum time of each hook and phase of the plugin,
+    from the profile it writes with LOGICSPONGE_PROFILE.
+    """
+    config = write_config(out_dir, "profiled", PLUGINS["plugin"])
+    path = os.path.join(out_dir, "profile.json")
+    run_mypy(config, out_dir, env={**os.environ, "LOGICSPONGE_PROFILE": path}, package=package)
+    with open(path) as f:
+        profile = json.load(f)
+    return {**profile["hooks"], **profile["phases"]}
+
+
+def benchmark(params: Params, repeat: int, out_dir: str) -> dict[str, Any]:
+    generate_project(out_dir, params)
+    configs = {name: write_config(out_dir, name, plugin) for name, plugin in PLUGINS.items()}
+    # One untimed run to warm up the file system caches
+    run_mypy(configs["bare"], out_dir)
+    results = measure(configs, out_dir, repeat)
+    bare, plugin = results["bare"], results["plugin"]
+    return {
+        "params": params.as_dict(),
+        "repeat": repeat,
+        "environment": {
+            "mypy": mypy_version,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+        "overhead": {
+            "wall_s": plugin["wall_s"] - bare["wall_s"],
+            "wall_ratio": plugin["wall_s"] / bare["wall_s"],
+            "peak_rss_mb": plugin["peak_rss_mb"] - bare["peak_rss_mb"],
+        },
+        "hooks": hook_timings(out_dir),
+    }
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """
+    Returns the regressions of `report` against `baseline`.
+    """
+    regressions = []
+    ratio, base_ratio = report["overhead"]["wall_ratio"], baseline["overhead"]["wall_ratio"]
+    if ratio > base_ratio * (1 + tolerance):
+        regressions.append(f"wall time ratio plugin/bare {ratio:.3f} > baseline {base_ratio:.3f} (+{tolerance:.0%})")
+    peak, base_peak = report["results"]["plugin"]["peak_rss_mb"], baseline["results"]["plugin"]["peak_rss_mb"]
+    if peak > base_peak * (1 + tolerance):
+        regressions.append(f"peak memory {peak:.1f} MB > baseline {base_peak:.1f} MB (+{tolerance:.0%})")
+    errors, base_errors = report["results"]["plugin"]["errors"], baseline["results"]["plugin"]["errors"]
+    if errors != base_errors:
+        regressions.append(f"{errors} errors reported, baseline reported {base_errors}")
+    return regressions
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print("params: " + ", ".join(f"{key}={value}" for key, value in report["params"].items()))
+    for name, result in report["results"].items():
+        print(f"{name:>8}: {result['wall_s']:.2f} s, {result['peak_rss_mb']:.0f} MB, {result['errors']} errors")
+    overhead = report["overhead"]
+    print(f"overhead: {overhead['wall_s']:+.2f} s (x{overhead['wall_ratio']:.3f}), {overhead['peak_rss_mb']:+.0f} MB")
+    print("hooks and phases:")
+    for name, timing in sorted(report["hooks"].items(), key=lambda item: -item[1]["total_s"]):
+        print(f"  {name:<32} {timing['calls']:>8} calls {timing['total_s'] * 1000:>9.1f} ms total {timing['max_s'] * 1000:>7.2f} ms max")
+
+
+def main() -> None:
+    if len(sys.argv) == 4 and sys.argv[1] == "--measure-once":
+        measure_once(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_params_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="cold runs per configuration")
+    parser.add_argument("--out-dir", help="where to generate the project (default: a temporary directory)")
+    parser.add_argument("--save", metavar="JSON", help="write the results to this file")
+    parser.add_argument("--compare", metavar="JSON", help="baseline to compare against, using its parameters")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    baseline = None
+    params = params_from_arguments(args)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        params = Params(**baseline["params"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = benchmark(params, args.repeat, args.out_dir or tmp)
+
+    print_report(report)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regression against " + args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Compares the generated validators of mypy_pkg/runtime.py with a naive
+validator that walks the type hints of the schema for every item.
+
+    python benchmarks/validators.py --items 100000
+
+Reports the time per item of each validator on a flat schema, a nested one
+and one with containers, and what `validated(every=N)` costs a trivial term.
+"""
+import argparse
+import functools
+import os
+import sys
+import time
+from typing import Any, Callable, NotRequired, TypedDict, Union, get_args, get_origin, get_type_hints, is_typeddict
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logicsponge.core as ls
+from mypy_pkg.runtime import validated, validation_stats, validator_for
+
+
+class Flat(TypedDict):
+    k0: int
+    k1: str
+    k2: float
+    k3: bool
+    k4: int
+    k5: str
+    k6: float
+    k7: bool
+    k8: int | None
+    k9: NotRequired[str]
+
+
+class Point(TypedDict):
+    x: float
+    y: float
+
+
+class Nested(TypedDict):
+    name: str
+    origin: Point
+    target: Point
+
+
+class Containers(TypedDict):
+    tags: list[str]
+    counts: dict[str, int]
+    path: list[Point]
+
+
+ITEMS: dict[type, dict[str, Any]] = {
+    Flat: {"k0": 1, "k1": "a", "k2": 1.5, "k3": True, "k4": 2, "k5": "b", "k6": 2, "k7": False, "k8": None},
+    Nested: {"name": "n", "origin": {"x": 0.0, "y": 0.0}, "target": {"x": 1.0, "y": 2.0}},
+    Containers: {"tags": ["a", "b", "c"], "counts": {"a": 1, "b": 2}, "path": [{"x": 0.0, "y": 0.0}] * 4},
+}
+
+
+def naive_matches(tp: Any, value: Any) -> bool:
+    """
+    The straightforward validator: resolves the type hints again for every
+    value and walks them with isinstance.
+    """
+    if tp is Any:
+        return True
+    if tp is None or tp is type(None):
+        return value is None
+    if is_typeddict(tp):
+        # Module without `from __future__ import annotations`: __required_keys__ is exact
+        if not isinstance(value, (dict, ls.DataItem)):
+            return False
+        required = tp.__required_keys__
+        for key, key_type in get_type_hints(tp).items():
+            if key not in value:
+                if key in required:
+                    return False
+                continue
+            if not naive_matches(key_type, value[key]):
+                return False
+        return True
+    origin, args = get_origin(tp), get_args(tp)
+    if origin is Union or origin is types.UnionType:
+        return any(naive_matches(arg, value) for arg in args)
+    if tp is float:
+        return isinstance(value, (int, float))
+    if origin is list:
+        return isinstance(value, list) and all(naive_matches(args[0], element) for element in value)
+    if origin is dict:
+        return isinstance(value, dict) and all(
+            naive_matches(args[0], k) and naive_matches(args[1], v) for k, v in value.items()
+        )
+    return isinstance(value, tp)
+
+
+def time_per_item(check: Callable[[Any], Any], items: list[Any]) -> float:
+    start = time.perf_counter()
+    for item in items:
+        check(item)
+    return (time.perf_counter() - start) / len(items)
+
+
+def sampled_term_cost(n: int, every: int) -> tuple[float, float]:
+    class Copy(ls.FunctionTerm):
+        Output = Flat
+
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    term = Copy() if every == 0 else validated(every=every)(Copy)()
+    item = ls.DataItem(ITEMS[Flat])
+    per_item = time_per_item(term.f, [item] * n)
+    return per_item, validation_stats(term).overhead if every else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100_000, help="items per measurement")
+    args = parser.parse_args()
+
+    print(f"{'schema':<12} {'naive':>10} {'compiled':>10} {'speedup':>8}")
+    for schema, data in ITEMS.items():
+        items = [ls.DataItem(data)] * args.items
+        validator = validator_for(schema)
+        assert validator.check(items[0]) and naive_matches(schema, items[0])
+        naive = time_per_item(functools.partial(naive_matches, schema), items)
+        compiled = time_per_item(validator.check, items)
+        print(f"{schema.__name__:<12} {naive * 1e9:>8.0f}ns {compiled * 1e9:>8.0f}ns {naive / compiled:>7.1f}x")
+
+    print()
+    print(f"{'validated':<12} {'per item':>10}")
+    for every in (0, 1, 10, 100):
+        per_item, _ = sampled_term_cost(args.items, every)
+        label = "off" if every == 0 else f"every={every}"
+        print(f"{label:<12} {per_item * 1e9:>8.0f}ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,1745 @@
 from __future__ import annotations
-from typing import Optional, Callable
+from typing import Any, Optional, Callable, Hashable, Iterator, TextIO
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field, fields, replace
 from enum import Enum, auto
+import atexit
+import configparser
+import json
+import logging
+import os
+import re
 import sys
+import time
 import tomllib
 
-from mypy.plugin import Plugin, MethodContext
+from mypy.plugin import Plugin, MethodContext, FunctionContext, ReportConfigContext, ClassDefContext
+from mypy.checker import TypeChecker
+from mypy.fixup import TypeFixer
+from mypy.server.trigger import make_trigger
 from mypy.types import (
-    Type as MypyType, Instance, TypeVarType,
+    Type as MypyType, Instance, TypeVarType, TypeVarId,
     AnyType, TypeOfAny, TypeType, CallableType, TypedDictType,
-    get_proper_type,
+    NoneType, UnionType, UninhabitedType, get_proper_type, deserialize_type,
+)
+from mypy.nodes import (
+    TypeInfo, Var, TypeAlias, Decorator, SymbolTable, SymbolTableNode, MypyFile,
+    AssignmentStmt, NameExpr, RefExpr, CallExpr, StrExpr, IntExpr, FloatExpr, JsonDict, ClassDef, Block, GDEF,
+    Expression, OpExpr, UnaryExpr,
 )
-from mypy.nodes import TypeInfo, Var, TypeAlias, Decorator
 from mypy.subtypes import is_subtype
+from mypy.meet import is_overlapping_types
 from mypy.expandtype import expand_type
+from mypy.constraints import infer_constraints, SUPERTYPE_OF
+from mypy.solve import solve_constraints
+from mypy.typeops import get_type_vars
+from mypy.typevars import fill_typevars
 from mypy.options import Options
+from mypy.lookup import lookup_fully_qualified
+from mypy.mro import calculate_mro
+from mypy.version import __version__ as mypy_version
+
+# https://mypy.readthedocs.io/en/stable/extending_mypy.html
+
+TERM_FULLNAME = "logicsponge.core.logicsponge.Term"
+SOURCE_TERM_FULLNAME = "logicsponge.core.logicsponge.SourceTerm"
+FUNCTION_TERM_FULLNAME = "logicsponge.core.logicsponge.FunctionTerm"
+STATEFUL_TERM_FULLNAME = "logicsponge.core.logicsponge.StatefulFunctionTerm"
+
+# Runtime helper running a chain of FunctionTerms as one term, see mypy_pkg/runtime.py
+FUSE_FULLNAME = "mypy_pkg.runtime.fuse"
+# `Input = Batch[Schema]`: items holding a column per key of Schema, see mypy_pkg/runtime.py
+BATCH_FULLNAME = "mypy_pkg.runtime.Batch"
+
+# NumPy dtype of the column of a batch holding values of a type, "object" otherwise
+COLUMN_DTYPES = {
+    "builtins.bool": "bool",
+    "builtins.int": "int64",
+    "builtins.float": "float64",
+    "builtins.complex": "complex128",
+    "builtins.str": "str",
+}
+
+# Term classes of logicsponge.core that circuits compose without subclassing
+CORE_TERMS = (
+    "Term", "SourceTerm", "ConstantSourceTerm", "FunctionTerm", "StatefulFunctionTerm",
+    "FlatMapTerm", "CompositeTerm", "ParallelTerm", "SequentialTerm", "KeyValueFilter",
+    "KeyFilter", "Rename",
+)
+
+# Key and format version of the data stored in TypeInfo.metadata
+METADATA_KEY = "logicsponge"
+METADATA_VERSION = 2
+
+
+# --- Logging ---
+
+LOG_LEVELS = {
+    "off": logging.CRITICAL + 1,
+    "error": logging.ERROR,
+    "warning": logging.WARNING,
+    "info": logging.INFO,
+    "debug": logging.DEBUG,
+}
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Renders a record as `event key=value ...`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", {})
+        parts = [f"[{record.levelname.lower()}] {record.getMessage()}"]
+        parts.extend(f"{key}={value}" for key, value in fields.items())
+        return " ".join(parts)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Renders a record as one JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": record.created,
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        for key, value in getattr(record, "fields", {}).items():
+            entry[key] = value if isinstance(value, (bool, int, float, type(None))) else str(value)
+        return json.dumps(entry)
+
+
+class PluginLogger:
+    """
+    Leveled, structured logger of the plugin.
+
+    Every call names an event and passes its data as keyword fields, e.g.
+    `log.debug("compose", lhs=lhs_type, rhs=rhs_type)`. Fields are only turned
+    into strings by the formatter, so a disabled level never pays for
+    formatting mypy types.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._logger = logging.getLogger(name)
+        self._logger.propagate = False
+        self.level = LOG_LEVELS["off"]
+        self._logger.setLevel(self.level)
+
+    def configure(self, level: str = "off", file: Optional[str] = None, format: str = "text") -> None:
+        """
+        Sets the level and the sink. Logs go to stderr unless `file` is given.
+        """
+        if level not in LOG_LEVELS:
+            raise ValueError(f"Unknown log_level '{level}', expected one of {', '.join(LOG_LEVELS)}")
+        if format not in ("text", "json"):
+            raise ValueError(f"Unknown log_format '{format}', expected 'text' or 'json'")
+
+        handler: logging.Handler
+        for handler in list(self._logger.handlers):
+            self._logger.removeHandler(handler)
+            handler.close()
+
+        self.level = LOG_LEVELS[level]
+        self._logger.setLevel(self.level)
+        if self.level > logging.CRITICAL:
+            return
+
+        if file is None:
+            handler = logging.StreamHandler(sys.stderr)
+        else:
+            handler = logging.FileHandler(file, delay=True, encoding="utf-8")
+        handler.setFormatter(JsonFormatter() if format == "json" else TextFormatter())
+        self._logger.addHandler(handler)
+
+    def debug(self, event: str, **fields: Any) -> None:
+        if self.level <= logging.DEBUG:
+            self._logger.debug(event, extra={"fields": fields})
+
+    def info(self, event: str, **fields: Any) -> None:
+        if self.level <= logging.INFO:
+            self._logger.info(event, extra={"fields": fields})
+
+    def warning(self, event: str, **fields: Any) -> None:
+        if self.level <= logging.WARNING:
+            self._logger.warning(event, extra={"fields": fields})
+
+
+log = PluginLogger("logicsponge.mypy")
+
+
+# --- Configuration ---
+
+CONFIG_SECTION = "logicsponge"
+
+
+@dataclass(frozen=True)
+class ModuleSettings:
+    """
+    Settings that can be overridden per module.
+    """
+    allow_untyped_streams: bool = False
+    warn_unread_keys: bool = False
+
+    def apply(self, changes: dict[str, Any]) -> ModuleSettings:
+        return replace(self, **changes) if changes else self
+
+
+def parse_module_settings(raw: dict[str, Any], source: str) -> dict[str, Any]:
+    """
+    Validates the per-module keys of a section, converting INI strings.
+    """
+    changes: dict[str, Any] = {}
+    for f in fields(ModuleSettings):
+        if f.name not in raw:
+            continue
+        value = raw[f.name]
+        if isinstance(value, str):
+            value = configparser.ConfigParser.BOOLEAN_STATES.get(value.lower(), value)
+        if not isinstance(value, bool):
+            raise ValueError(f"{source}: {f.name} must be a boolean, got {value!r}")
+        changes[f.name] = value
+    return changes
+
+
+class ModuleMatcher:
+    """
+    Resolves the settings of a module from the global settings and the overrides.
+
+    Patterns follow mypy's per-module sections:
+
+    1. `foo.bar.*` matches `foo.bar` and its submodules; `foo.*` and then
+       `foo.bar.*` apply, the most specific last.
+    2. Patterns with a `*` elsewhere (`*.legacy`, `foo.*.bar`) are compiled to
+       regexes and applied on top, in the order they were declared.
+    3. A concrete module name is applied last.
+
+    The result is cached per module, so the lookup done for every composition
+    is a dict access.
+    """
+
+    def __init__(self, defaults: ModuleSettings, overrides: list[tuple[str, dict[str, Any]]]) -> None:
+        self.defaults = defaults
+        self._wildcards: dict[str, dict[str, Any]] = {}
+        self._globs: list[tuple[re.Pattern[str], dict[str, Any]]] = []
+        self._concrete: dict[str, dict[str, Any]] = {}
+        for pattern, changes in overrides:
+            if pattern.endswith(".*") and "*" not in pattern[:-2]:
+                self._wildcards.setdefault(pattern[:-2], {}).update(changes)
+            elif "*" in pattern:
+                self._globs.append((self._compile_glob(pattern), changes))
+            else:
+                self._concrete.setdefault(pattern, {}).update(changes)
+        self._cache: dict[str, ModuleSettings] = {}
+
+    def __len__(self) -> int:
+        return len(self._wildcards) + len(self._globs) + len(self._concrete)
+
+    def settings_for(self, module: str) -> ModuleSettings:
+        settings = self._cache.get(module)
+        if settings is None:
+            settings = self._cache[module] = self._resolve(module)
+        return settings
+
+    def _resolve(self, module: str) -> ModuleSettings:
+        settings = self.defaults
+        path = module.split(".")
+        for i in range(1, len(path) + 1):
+            settings = settings.apply(self._wildcards.get(".".join(path[:i]), {}))
+        for pattern, changes in self._globs:
+            if pattern.match(module):
+                settings = settings.apply(changes)
+        return settings.apply(self._concrete.get(module, {}))
+
+    @staticmethod
+    def _compile_glob(pattern: str) -> re.Pattern[str]:
+        # As in mypy, '.*' matches zero or more sections; a leading '*' at
+        # least one
+        parts = pattern.split(".")
+        expr = re.escape(parts[0]) if parts[0] != "*" else r"[^.]+(\.[^.]+)*"
+        for part in parts[1:]:
+            expr += re.escape("." + part) if part != "*" else r"(\..*)?"
+        return re.compile(expr + r"\Z")
+
+
+@dataclass
+class PluginConfig:
+    """
+    The `[tool.logicsponge]` (pyproject.toml) or `[logicsponge]` (mypy.ini,
+    setup.cfg) section, with its per-module overrides.
+    """
+    path: Optional[str] = None
+    settings: dict[str, Any] = field(default_factory=dict)
+    overrides: list[tuple[str, dict[str, Any]]] = field(default_factory=list)
+
+    def get(self, key: str, default: Any) -> Any:
+        return self.settings.get(key, default)
+
+    def resolve_path(self, path: Optional[str]) -> Optional[str]:
+        """
+        Paths in the configuration are relative to the file they appear in.
+        """
+        if path is None or self.path is None:
+            return path
+        return os.path.join(os.path.dirname(self.path), path)
+
+    @classmethod
+    def load(cls, options: Options) -> PluginConfig:
+        for path in cls.candidates(options):
+            config = cls.read(path)
+            if config is not None:
+                return config
+        return cls()
+
+    @staticmethod
+    def candidates(options: Options) -> list[str]:
+        """
+        The files that may hold our section: the config file mypy uses, then
+        the pyproject.toml next to it. Without a config file, the pyproject.toml
+        of the project containing the working directory.
+        """
+        if options.config_file:
+            config_file = os.path.abspath(options.config_file)
+            pyproject = os.path.join(os.path.dirname(config_file), "pyproject.toml")
+            return [config_file] if config_file == pyproject else [config_file, pyproject]
+
+        directory = os.getcwd()
+        while True:
+            pyproject = os.path.join(directory, "pyproject.toml")
+            if os.path.isfile(pyproject):
+                return [pyproject]
+            parent = os.path.dirname(directory)
+            if parent == directory or os.path.exists(os.path.join(directory, ".git")):
+                return []
+            directory = parent
+
+    @classmethod
+    def read(cls, path: str) -> Optional[PluginConfig]:
+        if not os.path.isfile(path):
+            return None
+
+        if path.endswith(".toml"):
+            with open(path, "rb") as f:
+                section = tomllib.load(f).get("tool", {}).get(CONFIG_SECTION)
+            if section is None:
+                return None
+            settings = dict(section)
+            overrides: list[tuple[str, dict[str, Any]]] = []
+            for override in settings.pop("overrides", []):
+                modules = override.get("module")
+                if isinstance(modules, str):
+                    modules = [modules]
+                if not modules:
+                    raise ValueError(f"{path}: every [[tool.{CONFIG_SECTION}.overrides]] needs a 'module'")
+                changes = parse_module_settings(override, path)
+                overrides.extend((module, changes) for module in modules)
+            return cls(path, settings, overrides)
+
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        if CONFIG_SECTION not in parser:
+            return None
+        settings = dict(parser[CONFIG_SECTION])
+        for key, value in settings.items():
+            if value.lower() in parser.BOOLEAN_STATES:
+                settings[key] = parser.BOOLEAN_STATES[value.lower()]
+            elif value.isdigit():
+                settings[key] = int(value)
+        overrides = []
+        for name in parser.sections():
+            if name.startswith(CONFIG_SECTION + "-"):
+                changes = parse_module_settings(dict(parser[name]), path)
+                for module in name[len(CONFIG_SECTION) + 1:].split(","):
+                    overrides.append((module.strip(), changes))
+        return cls(path, settings, overrides)
+
+
+# --- Costs ---
+
+# Optional class attributes declaring the cost of a term, next to Input/Output:
+# the seconds it takes to process one item, and the items per second a source emits
+COST_ATTRIBUTES = {"Latency": "latency", "Rate": "rate"}
+
+
+@dataclass(frozen=True)
+class Cost:
+    """
+    Static performance model of a term or circuit.
+
+    Every term of a circuit runs in its own thread, so items flow through a
+    chain like through a pipeline: the latency of an item is the sum of the
+    latencies along its path (the longest one, for `|`), while the chain
+    keeps up with at most one item per `period`, the latency of its slowest
+    term, the `bottleneck`. `rate` is what the sources upstream emit.
+    """
+    latency: float = 0.0
+    period: float = 0.0
+    bottleneck: Optional[str] = None
+    rate: Optional[float] = None
+
+    @classmethod
+    def from_data(cls, data: Optional[JsonDict], name: str) -> Cost:
+        """
+        Terms store what they declare (latency and rate) and circuits store
+        all the fields; `name` is the bottleneck of a term that declares a latency.
+        """
+        if not data:
+            return cls()
+        latency = data.get("latency", 0.0)
+        period = data.get("period", latency)
+        rate = data.get("rate")
+        if (
+            not isinstance(latency, (int, float))
+            or not isinstance(period, (int, float))
+            or not (rate is None or isinstance(rate, (int, float)))
+        ):
+            raise ValueError(f"Invalid cost stored for {name}: {data}")
+        return cls(
+            latency=latency,
+            period=period,
+            bottleneck=data.get("bottleneck", name if latency else None),
+            rate=rate,
+        )
+
+    @property
+    def throughput(self) -> float:
+        """
+        Items per second the circuit can sustain.
+        """
+        return 1 / self.period if self.period else float("inf")
+
+    def then(self, downstream: Cost) -> Cost:
+        slowest = self if self.period >= downstream.period else downstream
+        return Cost(self.latency + downstream.latency, slowest.period, slowest.bottleneck, self.rate)
+
+    def beside(self, other: Cost) -> Cost:
+        slowest = self if self.period >= other.period else other
+        rates = [rate for rate in (self.rate, other.rate) if rate is not None]
+        return Cost(max(self.latency, other.latency), slowest.period, slowest.bottleneck, sum(rates) if rates else None)
+
+    def serialize(self) -> Optional[JsonDict]:
+        return None if self == Cost() else asdict(self)
+
+
+# --- Caches ---
+
+
+@dataclass
+class CacheStats:
+    """
+    Hit/miss counters of one of the plugin caches.
+    """
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return f"hits={self.hits}, misses={self.misses}, hit rate={self.hit_rate:.1%}"
+
+
+def mro_token(type_info: TypeInfo) -> tuple[SymbolTable, ...]:
+    """
+    Change token of a class: the symbol tables along its MRO.
+
+    Mypy (and dmypy in particular) swaps in fresh symbol tables whenever it
+    re-analyses a class, so comparing them by identity tells us whether a
+    cached result about the class is still valid.
+    """
+    return tuple(base.names for base in type_info.mro)
+
+
+def token_matches(token: tuple[SymbolTable, ...], type_info: TypeInfo) -> bool:
+    mro = type_info.mro
+    if len(mro) != len(token):
+        return False
+    return all(base.names is names for base, names in zip(mro, token))
+
+
+def schema_token(*schemas: Optional[StreamSchema]) -> tuple[tuple[TypeInfo, tuple[SymbolTable, ...]], ...]:
+    """
+    Change tokens of the classes declaring `schemas`: what we resolved from
+    them is stale once one of them is analysed again, even when the term
+    that refers to them is not (a schema edited in another module).
+    """
+    token = []
+    for schema in schemas:
+        for leaf in () if schema is None else schema.leaves():
+            info = leaf.info
+            if info is not None:
+                token.append((info, mro_token(info)))
+    return tuple(token)
+
+
+@dataclass(frozen=True)
+class ResolvedTerm:
+    """
+    The Input and Output schemas of a term class.
+    """
+    token: tuple[SymbolTable, ...]
+    input: Optional[StreamSchema]
+    output: Optional[StreamSchema]
+    # Set for library terms, which transform their upstream's schema instead
+    behavior: Optional[TermBehavior] = None
+    cost: Cost = Cost()
+    # Fullname of the term whose items come out, when there is a single one
+    producer: Optional[str] = None
+    # Stateless FunctionTerms at the end of the circuit that could run as one
+    run: tuple[str, ...] = ()
+    # Emits items without an upstream: a source, or a circuit starting with sources
+    source: bool = False
+    # See `schema_token`
+    schema_token: tuple[tuple[TypeInfo, tuple[SymbolTable, ...]], ...] = ()
+
+    def is_valid_for(self, type_info: TypeInfo) -> bool:
+        return token_matches(self.token, type_info) and all(
+            token_matches(token, info) for info, token in self.schema_token
+        )
+
+
+@dataclass(frozen=True)
+class Verdict:
+    """
+    Outcome of checking one Output schema against one Input schema.
+
+    Failed verdicts keep the exact diagnostics so that they can be replayed
+    at every composition site that hits the cache.
+    """
+    errors: tuple[str, ...] = ()
+    keep_default_return: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+class VerdictCache:
+    """
+    Bounded LRU cache of compatibility verdicts.
+
+    Entries remember the two schema objects they were computed for. Schemas
+    are shared per fullname and replaced when their content changes (see
+    `StreamPlugin._store_schema`), so an edited schema never hits a stale verdict.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[StreamSchema, StreamSchema, Verdict]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, lhs_output: StreamSchema, rhs_input: StreamSchema) -> Optional[Verdict]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] is not lhs_output or entry[1] is not rhs_input:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[2]
+
+    def put(self, key: Hashable, lhs_output: StreamSchema, rhs_input: StreamSchema, verdict: Verdict) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (lhs_output, rhs_input, verdict)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+class SchemaShape:
+    """
+    The structure of a TypedDict schema: its keys, their value types and
+    which of them are required. Shared by all the schemas with that structure.
+    """
+    __slots__ = ("key", "fullnames")
+
+    def __init__(self, key: Hashable) -> None:
+        self.key = key
+        self.fullnames: set[str] = set()
+
+
+class SchemaInterner:
+    """
+    Hash-conses schemas by structure, so that structurally identical schemas
+    declared in different modules (re-exported, aliased or copied) share one
+    `SchemaShape` and compare equal by identity.
+
+    Schemas with type variables have no shape: their value types depend on
+    the type arguments of each composition.
+    """
+
+    def __init__(self) -> None:
+        self._shapes: dict[Hashable, SchemaShape] = {}
+        self.schemas = 0
+        # Verdicts answered by comparing shapes
+        self.identity_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._shapes)
+
+    def intern(self, schema: StreamSchema) -> Optional[SchemaShape]:
+        key = schema.structure_key
+        if key is None:
+            return None
+        shape = self._shapes.get(key)
+        if shape is None:
+            shape = self._shapes[key] = SchemaShape(key)
+        if schema.fullname not in shape.fullnames:
+            if shape.fullnames:
+                log.debug("schema_shape_shared", schema=schema.fullname, shared_with=sorted(shape.fullnames))
+            shape.fullnames.add(schema.fullname)
+            self.schemas += 1
+        return shape
+
+    def shared(self) -> list[list[str]]:
+        """
+        The groups of schemas that share a shape, largest first.
+        """
+        groups = [sorted(shape.fullnames) for shape in self._shapes.values() if len(shape.fullnames) > 1]
+        return sorted(groups, key=lambda group: (-len(group), group))
+
+    def __str__(self) -> str:
+        groups = self.shared()
+        duplicates = sum(len(group) - 1 for group in groups)
+        return (
+            f"schemas={self.schemas}, shapes={len(self)}, shared shapes={len(groups)} "
+            f"({duplicates} duplicate declarations), identity hits={self.identity_hits}"
+        )
+
+
+# --- Profiling ---
+
+# Path of the JSON profile to write, enables profiling like the `profile` setting
+PROFILE_ENV = "LOGICSPONGE_PROFILE"
+PROFILE_VERSION = 1
+
+# What the profiler times: mypy's hook lookups and the hooks they return...
+PROFILED_HOOKS = (
+    "get_method_hook", "get_function_hook", "get_base_class_hook",
+    "check_stream_compatibility", "check_parallel_composition", "check_fusion", "_store_term_metadata",
+)
+# ... and the phases of a composition check
+PROFILED_PHASES = (
+    "_resolve_term", "_get_type_attribute", "_type_arguments", "_verdict",
+    "_nominal_check", "_structural_check", "_circuit_type",
+)
+# The hooks that check a composition site
+COMPOSITION_HOOKS = ("check_stream_compatibility", "check_parallel_composition", "check_fusion")
+
+
+@dataclass
+class Timing:
+    calls: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.calls += 1
+        self.total_s += elapsed
+        self.max_s = max(self.max_s, elapsed)
+
+
+class Profiler:
+    """
+    Times the hooks of the plugin, the phases of its checks and each
+    composition site, for `StreamPlugin._write_profile`.
+
+    Only a plugin with profiling enabled wraps its methods with `timed`, so
+    profiling costs nothing otherwise. Times are inclusive: a phase is also
+    counted in the hook that runs it, and `_verdict` in itself for unions.
+    """
+
+    def __init__(self, path: str, top: int = 10) -> None:
+        self.path = path
+        self.top = top
+        self.started = time.perf_counter()
+        self.timings: dict[str, Timing] = {}
+        self.sites: dict[tuple[str, int, str], Timing] = {}
+
+    def timed(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        timing = self.timings.setdefault(name, Timing())
+        composition = name in COMPOSITION_HOOKS
+
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                timing.add(elapsed)
+                if composition:
+                    self._record_site(name, args[0], elapsed)
+
+        wrapper.__name__ = getattr(func, "__name__", name)
+        return wrapper
+
+    def _record_site(self, hook: str, ctx: MethodContext | FunctionContext, elapsed: float) -> None:
+        checker = ctx.api
+        path = checker.tree.path if isinstance(checker, TypeChecker) else "<unknown>"
+        self.sites.setdefault((path, ctx.context.line, hook), Timing()).add(elapsed)
+
+    def data(self, caches: dict[str, CacheStats]) -> JsonDict:
+        def timings(names: tuple[str, ...]) -> JsonDict:
+            return {name: asdict(self.timings[name]) for name in names if self.timings.get(name, Timing()).calls}
+
+        sites = sorted(self.sites.items(), key=lambda item: -item[1].total_s)[:self.top]
+        return {
+            "version": PROFILE_VERSION,
+            "wall_s": time.perf_counter() - self.started,
+            "hooks": timings(PROFILED_HOOKS),
+            "phases": timings(PROFILED_PHASES),
+            "caches": {name: {**asdict(stats), "hit_rate": stats.hit_rate} for name, stats in caches.items()},
+            "slowest_sites": [
+                {"file": path, "line": line, "hook": hook, **asdict(timing)} for (path, line, hook), timing in sites
+            ],
+        }
+
+    def write(self, caches: dict[str, CacheStats], out: TextIO) -> None:
+        """
+        Writes the JSON profile to `self.path`, and its top entries as a table to `out`.
+        """
+        data = self.data(caches)
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=2)
+
+        print(f"Logicsponge Plugin: profile written to {self.path}, plugin loaded {data['wall_s']:.2f} s ago", file=out)
+        rows = sorted({**data["hooks"], **data["phases"]}.items(), key=lambda item: -item[1]["total_s"])[:self.top]
+        print(f"  {'hook or phase':<30} {'calls':>9} {'total ms':>10} {'max ms':>9}", file=out)
+        for name, timing in rows:
+            print(f"  {name:<30} {timing['calls']:>9} {timing['total_s'] * 1000:>10.1f} {timing['max_s'] * 1000:>9.2f}", file=out)
+        print(f"  {'cache':<30} {'hits':>9} {'misses':>10} {'hit rate':>9}", file=out)
+        for name, stats in caches.items():
+            print(f"  {name:<30} {stats.hits:>9} {stats.misses:>10} {stats.hit_rate:>9.1%}", file=out)
+        print(f"  {'slowest composition site':<30} {'calls':>9} {'total ms':>10} {'max ms':>9}", file=out)
+        for site in data["slowest_sites"]:
+            where = f"{site['file']}:{site['line']}"
+            print(f"  {where:<30} {site['calls']:>9} {site['total_s'] * 1000:>10.1f} {site['max_s'] * 1000:>9.2f}", file=out)
+
+
+# --- Library terms ---
+
+
+class Behavior(Enum):
+    SOURCE = auto()
+    TRANSFORM = auto()
+    IDENTITY = auto()
+    SINK = auto()
+    MERGE = auto()
+    FLATTEN = auto()
+    EXTEND = auto()
+    REPLACE = auto()
+    BATCH = auto()
+    UNBATCH = auto()
+
+
+@dataclass(frozen=True)
+class TermBehavior:
+    """
+    What a term without Input/Output declarations does to the schema of its
+    upstream:
+
+    - "identity": passes items through (Print, filters, plots),
+    - "sink": ends the stream (Stop),
+    - "source": produces items and cannot be composed into,
+    - "merge" / "flatten": merges the streams of parallel branches,
+    - "extend": adds keys, the ones in `adds` and one named by the constructor
+      argument `key_argument`, of type `key_type`,
+    - "replace": emits items with the keys in `output` only,
+    - "batch" / "unbatch": groups items into a `Batch` of their schema, and
+      splits batches back into items.
+
+    A term generic in its schema (`Input: type[S]`, as in the library stubs)
+    has a behavior too: "identity" with `Output: type[S]`, "sink" without
+    an Output (see `StreamPlugin._schema_behavior`).
+
+    Key types are written as in annotations: "int", "float | None", "Any",
+    or a fully qualified class name.
+    """
+    kind: Behavior
+    adds: tuple[tuple[str, str], ...] = ()
+    key_argument: Optional[str] = None
+    key_type: str = "int"
+    output: tuple[tuple[str, str], ...] = ()
+    # Keyword arguments the output only holds for, with their defaults
+    arguments: tuple[tuple[str, Any], ...] = ()
+
+    @classmethod
+    def from_spec(cls, spec: Any) -> TermBehavior:
+        """
+        Reads the form used in LIBRARY_TERMS and by entry points: a behavior
+        name, or a dict with a "behavior" key and the fields above.
+        """
+        if isinstance(spec, str):
+            spec = {"behavior": spec}
+        kind = Behavior[spec["behavior"].upper()]
+        if kind is Behavior.TRANSFORM:
+            raise ValueError("'transform' is what terms declaring Input/Output do")
+        return cls(
+            kind=kind,
+            adds=tuple(spec.get("adds", {}).items()),
+            key_argument=spec.get("key_argument"),
+            key_type=spec.get("key_type", "int"),
+            output=tuple(spec.get("output", {}).items()),
+            arguments=tuple(spec.get("arguments", {}).items()),
+        )
+
+
+LIBRARY_TERMS: dict[str, Any] = {
+    "logicsponge.core.logicsponge.Print": "identity",
+    "logicsponge.core.logicsponge.PPrint": "identity",
+    "logicsponge.core.logicsponge.PrintKeys": "identity",
+    "logicsponge.core.logicsponge.Dump": "identity",
+    "logicsponge.core.logicsponge.Id": "identity",
+    "logicsponge.core.logicsponge.Delay": "identity",
+    "logicsponge.core.logicsponge.DataItemFilter": "identity",
+    "logicsponge.core.logicsponge.Stop": "sink",
+    # Drops the keys the projection plan found unread
+    "mypy_pkg.runtime.Project": "identity",
+    "mypy_pkg.runtime.Batcher": "batch",
+    "mypy_pkg.runtime.Unbatcher": "unbatch",
+    "logicsponge.core.logicsponge.MergeToSingleStream": "merge",
+    "logicsponge.core.logicsponge.Flatten": "flatten",
+    "logicsponge.core.logicsponge.AddIndex": {"behavior": "extend", "key_argument": "key", "key_type": "int"},
+    "logicsponge.core.dashboard.Plot": "identity",
+    "logicsponge.core.dashboard.BinaryPlot": "identity",
+    "logicsponge.core.dashboard.DeepPlot": "identity",
+    "logicsponge.core.plot.Plot": "identity",
+    "logicsponge.core.plot.DeepPlot": "identity",
+    "logicsponge.core.stats.Sum": {"behavior": "replace", "output": {"sum": "float"}},
+    # With dim=0, statistics over time per key: the keys of the upstream
+    "logicsponge.core.stats.Mean": {"behavior": "replace", "output": {"mean": "float"}, "arguments": {"dim": 1}},
+    "logicsponge.core.stats.Std": {"behavior": "replace", "output": {"std": "float"}, "arguments": {"dim": 1}},
+    "logicsponge.core.stats.StdHull": {
+        "behavior": "replace",
+        "output": {"mean": "float", "lower_bound": "float", "upper_bound": "float"},
+        "arguments": {"dim": 1},
+    },
+    "logicsponge.core.stats.OneSampleTTest": {
+        "behavior": "replace",
+        "output": {"t-statistic": "float | None", "p-value": "float | None"},
+    },
+    "logicsponge.core.stats.PairedTTest": {
+        "behavior": "replace",
+        "output": {"t-statistic": "float | None", "p-value": "float | None"},
+    },
+    "logicsponge.core.stats.KruskalWallis": {
+        "behavior": "replace",
+        "output": {"h-statistic": "float | None", "p-value": "float | None"},
+    },
+}
+
+ENTRY_POINT_GROUP = "logicsponge_mypy.behaviors"
+
+
+class BehaviorRegistry:
+    """
+    Behaviors of library terms, by class fullname.
+
+    Packages shipping their own terms register them through an entry point
+    in the "logicsponge_mypy.behaviors" group, pointing to a dict in the
+    format of LIBRARY_TERMS or to a function returning one:
+
+        [project.entry-points."logicsponge_mypy.behaviors"]
+        mypkg = "mypkg.typing:BEHAVIORS"
+
+    Entry points are only loaded the first time we look up a class that is
+    not a logicsponge term.
+    """
+
+    def __init__(self, specs: dict[str, Any], group: Optional[str] = ENTRY_POINT_GROUP) -> None:
+        self._behaviors = {fullname: TermBehavior.from_spec(spec) for fullname, spec in specs.items()}
+        self._group = group
+
+    def __len__(self) -> int:
+        return len(self._behaviors)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._behaviors)
+
+    def register(self, specs: dict[str, Any], source: str = "<register>") -> None:
+        for fullname, spec in specs.items():
+            try:
+                self._behaviors[fullname] = TermBehavior.from_spec(spec)
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                log.warning("behavior_invalid", source=source, term=fullname, error=e)
+
+    def get(self, fullname: str) -> Optional[TermBehavior]:
+        behavior = self._behaviors.get(fullname)
+        if behavior is None and self._group is not None and not fullname.startswith("logicsponge."):
+            self._load_entry_points()
+            behavior = self._behaviors.get(fullname)
+        return behavior
+
+    def lookup(self, type_info: TypeInfo) -> Optional[TermBehavior]:
+        """
+        The behavior of a term class, inherited from the closest registered
+        base unless the class (or a base up to it) declares a schema: the
+        library stubs (stubs/) declare the schemas of the terms they cover,
+        and the registered behaviors only apply to the library source.
+        """
+        for base in type_info.mro:
+            if "Input" in base.names or "Output" in base.names:
+                return None
+            behavior = self.get(base.fullname)
+            if behavior is not None:
+                return behavior
+        return None
+
+    def _load_entry_points(self) -> None:
+        group, self._group = self._group, None
+        if group is None:
+            return
+        from importlib.metadata import entry_points
+
+        for entry_point in entry_points(group=group):
+            try:
+                specs = entry_point.load()
+                if callable(specs):
+                    specs = specs()
+            except Exception as e:
+                log.warning("behavior_entry_point_failed", entry_point=entry_point.name, error=e)
+                continue
+            self.register(specs, source=entry_point.name)
+            log.info("behavior_entry_point", entry_point=entry_point.name, terms=len(specs))
+
+
+behaviors = BehaviorRegistry(LIBRARY_TERMS)
+
+
+# --- Projection plan ---
+
+PLAN_VERSION = 2
+
+
+class CircuitPlan:
+    """
+    What the runtime can do with the circuits of each module:
+
+    - edges: for every composition `A * B`, the keys of A's Output that B's
+      Input reads (`Project` drops the others right after A),
+    - fusions: the maximal runs of adjacent stateless FunctionTerms in a `*`
+      chain, with no `|` in between (`fuse` runs them as one term).
+
+    Written as JSON when mypy exits; the entries of the modules checked in
+    this run replace those already in the file.
+    """
+
+    def __init__(self) -> None:
+        self.edges: dict[str, dict[tuple[int, str, str], JsonDict]] = {}
+        self.fusions: dict[str, set[tuple[int, int, tuple[str, ...]]]] = {}
+
+    def record(self, module: str, line: int, producer: str, consumer: str, needed: list[str], unread: list[str]) -> None:
+        self.edges.setdefault(module, {})[(line, producer, consumer)] = {
+            "line": line,
+            "producer": producer,
+            "consumer": consumer,
+            "needed": needed,
+            "unread": unread,
+        }
+
+    def record_fusion(self, module: str, line: int, column: int, run: tuple[str, ...]) -> None:
+        """
+        Every step of a chain extends the run of the previous one, and the
+        steps of one chain share its position, so only the longest run starting
+        at a position is kept.
+        """
+        self.fusions.setdefault(module, set()).add((line, column, run))
+
+    def module_data(self, module: str) -> JsonDict:
+        edges = self.edges.get(module, {})
+        runs = self.fusions.get(module, set())
+        maximal = [
+            (line, column, run) for line, column, run in runs
+            if not any(
+                (other_line, other_column) == (line, column) and len(other) > len(run) and other[:len(run)] == run
+                for other_line, other_column, other in runs
+            )
+        ]
+        return {
+            "edges": sorted(edges.values(), key=lambda edge: (edge["line"], edge["producer"], edge["consumer"])),
+            "fusions": [{"line": line, "column": column, "terms": list(run)} for line, column, run in sorted(maximal)],
+        }
+
+    def write(self, path: str) -> None:
+        modules: dict[str, Any] = {}
+        try:
+            with open(path) as f:
+                existing = json.load(f)
+            if existing.get("version") == PLAN_VERSION:
+                modules = existing["modules"]
+        except (OSError, ValueError, KeyError):
+            pass
+        checked = set(self.edges) | set(self.fusions)
+        for module in checked:
+            modules[module] = self.module_data(module)
+        with open(path, "w") as f:
+            json.dump({"version": PLAN_VERSION, "modules": modules}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        log.info("circuit_plan", path=path, modules=len(checked))
+
+
+# --- Topology ---
+
+TOPOLOGY_VERSION = 1
+
+# Line, column, end line and end column of an expression
+Position = tuple[int, int, Optional[int], Optional[int]]
+
+
+@dataclass(frozen=True)
+class Fragment:
+    """
+    The part of a module's graph an expression stands for: its nodes, the
+    nodes the items enter through and those they leave from.
+    """
+    nodes: tuple[int, ...]
+    entries: tuple[int, ...]
+    exits: tuple[int, ...]
+
+
+class ModuleTopology:
+    """
+    The graph of the compositions of one module.
+
+    Nodes are the operands that are not compositions themselves: term
+    instances, but also variables and calls holding a circuit. `a * b` links
+    every exit of `a` to every entry of `b`, `a | b` puts them side by side.
+    The circuits are the compositions that are not part of a larger one.
+
+    Expressions are identified by their position, so that checking one twice
+    (mypy defers some) does not add nodes.
+    """
+
+    def __init__(self) -> None:
+        self.nodes: list[JsonDict] = []
+        self.edges: set[tuple[int, int]] = set()
+        self.fragments: dict[Position, Fragment] = {}
+        self.leaves: dict[Position, Fragment] = {}
+        self.nested: set[Position] = set()
+
+    @staticmethod
+    def position(expr: Expression) -> Position:
+        return (expr.line, expr.column, expr.end_line, expr.end_column)
+
+    def compose(self, expr: OpExpr, lhs: Callable[[], JsonDict], rhs: Callable[[], JsonDict]) -> None:
+        """
+        Records `expr`; `lhs` and `rhs` describe its operands when they are
+        new nodes.
+        """
+        position = self.position(expr)
+        if position in self.fragments:
+            return
+        left = self._operand(expr.left, lhs)
+        right = self._operand(expr.right, rhs)
+        nodes = left.nodes + right.nodes
+        if expr.op == "*":
+            self.edges.update((exit, entry) for exit in left.exits for entry in right.entries)
+            self.fragments[position] = Fragment(nodes, left.entries, right.exits)
+        else:
+            self.fragments[position] = Fragment(nodes, left.entries + right.entries, left.exits + right.exits)
+
+    def _operand(self, expr: Expression, describe: Callable[[], JsonDict]) -> Fragment:
+        position = self.position(expr)
+        fragment = self.fragments.get(position)
+        if fragment is not None:
+            self.nested.add(position)
+            return fragment
+        fragment = self.leaves.get(position)
+        if fragment is None:
+            node = {"id": len(self.nodes), "line": expr.line, "column": expr.column, **describe()}
+            self.nodes.append(node)
+            fragment = self.leaves[position] = Fragment((node["id"],), (node["id"],), (node["id"],))
+        return fragment
+
+    def data(self) -> JsonDict:
+        """
+        Node ids follow the order of the source rather than the order mypy
+        checked the expressions in.
+        """
+        order = sorted(self.nodes, key=lambda node: (node["line"], node["column"], node["id"]))
+        ids = {node["id"]: new_id for new_id, node in enumerate(order)}
+        circuits = [
+            {
+                "line": position[0],
+                "column": position[1],
+                "nodes": sorted(ids[node] for node in fragment.nodes),
+                "entries": [ids[node] for node in fragment.entries],
+                "exits": [ids[node] for node in fragment.exits],
+            }
+            for position, fragment in sorted(self.fragments.items(), key=lambda item: item[0][:2])
+            if position not in self.nested
+        ]
+        return {
+            "nodes": [{**node, "id": ids[node["id"]]} for node in order],
+            "edges": sorted((ids[source], ids[target]) for source, target in self.edges),
+            "circuits": circuits,
+        }
+
+
+class TopologyExport:
+    """
+    Writes the graph of each module checked to `<directory>/<module>.json`
+    when mypy exits. A file is only rewritten when its content changes, so
+    tools watching the directory see the modules whose circuits did.
+    """
+
+    def __init__(self) -> None:
+        self.modules: dict[str, ModuleTopology] = {}
+
+    def module(self, name: str) -> ModuleTopology:
+        topology = self.modules.get(name)
+        if topology is None:
+            topology = self.modules[name] = ModuleTopology()
+        return topology
+
+    def write(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        written = 0
+        for name, topology in self.modules.items():
+            text = json.dumps(
+                {"version": TOPOLOGY_VERSION, "module": name, **topology.data()}, separators=(",", ":"), sort_keys=True
+            ) + "\n"
+            path = os.path.join(directory, f"{name}.json")
+            try:
+                with open(path) as f:
+                    if f.read() == text:
+                        continue
+            except OSError:
+                pass
+            # Readers never see a partly written file
+            with open(f"{path}.tmp", "w") as f:
+                f.write(text)
+            os.replace(f"{path}.tmp", path)
+            written += 1
+        log.info("topology", directory=directory, modules=len(self.modules), written=written)
+
+
+# --- Schemas ---
+
+
+def column_dtype(typ: MypyType) -> str:
+    proper = get_proper_type(typ)
+    if isinstance(proper, Instance):
+        return COLUMN_DTYPES.get(proper.type.fullname, "object")
+    return "object"
+
+
+class StreamSchema:
+    """
+    Normalized form of an Input/Output schema.
+
+    The JSON form holds the keys of a TypedDict schema with their value types,
+    the required keys and the generic parameters of the schema. It is what we
+    store in the metadata of term classes, and mypy writes it to the
+    incremental cache along with them. Value types are only deserialized when a
+    structural check needs them.
+
+    Schemas that are not TypedDicts (plain classes, Any) have no items and
+    are compared nominally.
+
+    Compositions produce schemas that no class declares, with a `kind`:
+    - "product": the streams of parallel branches (`a | b`), one per member,
+    - "union": items that may come from any of the members,
+    - "merged": a TypedDict with the keys of all members,
+    - "intersection": the Input of parallel branches (`a | b`), items that
+      satisfy every member; its keys are those of all members,
+    - "keys": a TypedDict given by a library term behavior,
+    - "batch": `Batch[member]`, items holding a column of values per key of
+      its single member.
+    - "var": a type variable of the term (`Input: type[S]`), any schema.
+
+    A generic schema with type arguments (`GenX[T]` in a generic term, or
+    `GenY[int]` once a composition solved T) has the kind "applied": its
+    single member is the generic schema, and its items are those of the
+    member with the arguments substituted.
+    """
+
+    def __init__(
+        self,
+        data: JsonDict,
+        modules: dict[str, MypyFile],
+        info: Optional[TypeInfo] = None,
+        members: Optional[tuple[StreamSchema, ...]] = None,
+    ) -> None:
+        self.data = data
+        self.fullname: str = data["fullname"]
+        self.kind: Optional[str] = data.get("kind")
+        # The interned schemas of a composite, when it is built from them
+        if members is None:
+            members = tuple(StreamSchema(member, modules) for member in data.get("members", ()))
+        self.members = members
+        if self.kind == "batch":
+            self.name: str = f"Batch[{self.members[0].name}]"
+        elif self.kind == "applied":
+            self.name = f"{self.members[0].name}[{', '.join(data['arg_names'])}]"
+        elif self.members:
+            self.name = f"{self.kind}[{', '.join(member.name for member in self.members)}]"
+        elif self.kind in (None, "var"):
+            self.name = self.fullname.rsplit(".", 1)[-1]
+        else:
+            self.name = self.fullname
+        self.module_name: str = data["module"]
+        self.type_vars: list[str] = data["type_vars"]
+        # Key sets, to check for missing keys without deserializing any value type
+        self.keys: tuple[str, ...] = tuple(key for key, _ in data["items"] or ())
+        self.key_set = frozenset(self.keys)
+        self.required_keys = frozenset(data["required"])
+        self.optional_keys = self.key_set - self.required_keys
+        self.is_typeddict = data["items"] is not None
+        self._modules = modules
+        self._info = info
+        self._items: Optional[dict[str, MypyType]] = None
+        self._args: Optional[tuple[MypyType, ...]] = None
+        self._free_type_vars: Optional[tuple[TypeVarType, ...]] = None
+        self._description: Optional[JsonDict] = None
+        # Set by `StreamPlugin._store_schema`, see SchemaInterner
+        self.shape: Optional[SchemaShape] = None
+        self._expanded: dict[tuple[tuple[TypeVarId, MypyType], ...], dict[str, MypyType]] = {}
+
+    @staticmethod
+    def serialize_info(info: TypeInfo) -> JsonDict:
+        typeddict = info.typeddict_type
+        return {
+            "fullname": info.fullname,
+            "module": info.module_name,
+            "items": None if typeddict is None else [[key, typ.serialize()] for key, typ in typeddict.items.items()],
+            "required": [] if typeddict is None else sorted(typeddict.required_keys),
+            "type_vars": list(info.type_vars),
+        }
+
+    @staticmethod
+    def applied_data(schema: StreamSchema, info: TypeInfo, args: tuple[MypyType, ...]) -> JsonDict:
+        """
+        `schema`, the generic schema of `info`, with the type arguments `args`.
+        Type variables are named with their namespace, so that `GenX[T]` in
+        two generic terms are different schemas.
+        """
+        mapping = {type_var.id: arg for type_var, arg in zip(info.defn.type_vars, args)}
+        items = None
+        if schema.is_typeddict:
+            items = [[key, expand_type(typ, mapping).serialize()] for key, typ in schema.items.items()]
+        arg_fullnames = [
+            f"{arg.id.namespace}.{arg.name}" if isinstance(arg, TypeVarType) else str(arg)
+            for arg in map(get_proper_type, args)
+        ]
+        return {
+            "fullname": f"{schema.fullname}[{', '.join(arg_fullnames)}]",
+            "module": schema.module_name,
+            "items": items,
+            "required": sorted(schema.required_keys),
+            "type_vars": sorted({type_var.name for arg in args for type_var in get_type_vars(arg)}),
+            "kind": "applied",
+            "members": [schema.data],
+            "args": [arg.serialize() for arg in args],
+            "arg_names": [arg.name if isinstance(arg, TypeVarType) else str(arg) for arg in map(get_proper_type, args)],
+        }
+
+    @staticmethod
+    def variable_data(type_var: TypeVarType) -> JsonDict:
+        return {
+            "fullname": f"{type_var.id.namespace}.{type_var.name}",
+            "module": type_var.fullname.rpartition(".")[0],
+            "items": None,
+            "required": [],
+            "type_vars": [type_var.name],
+            "kind": "var",
+        }
+
+    @staticmethod
+    def composite_data(kind: str, members: tuple[StreamSchema, ...]) -> JsonDict:
+        items: Optional[list[Any]] = None
+        required: set[str] = set()
+        if kind in ("merged", "intersection") and all(member.is_typeddict for member in members):
+            # Later members override the keys of earlier ones, like dict.update;
+            # intersections are checked member by member and only use the keys
+            merged_items: dict[str, Any] = {}
+            for member in members:
+                merged_items.update(dict(member.data["items"]))
+                required.update(member.required_keys)
+            items = [[key, typ] for key, typ in merged_items.items()]
+        return {
+            "fullname": f"{kind}[{', '.join(member.fullname for member in members)}]",
+            "module": members[0].module_name,
+            "items": items,
+            "required": sorted(required),
+            "type_vars": sorted({name for member in members for name in member.type_vars}),
+            "kind": kind,
+            "members": [member.data for member in members],
+        }
+
+    @property
+    def structure_key(self) -> Optional[Hashable]:
+        """
+        The keys with their serialized value types, sorted, and the required
+        keys: equal for structurally identical TypedDicts whatever their name.
+        """
+        if not self.is_typeddict or self.type_vars:
+            return None
+        items = tuple(sorted((key, json.dumps(typ, sort_keys=True)) for key, typ in self.data["items"]))
+        return items, tuple(sorted(self.required_keys))
+
+    def expanded_items(self, type_args: dict[TypeVarId, MypyType]) -> dict[str, MypyType]:
+        """
+        The value types with the type arguments of a consumer substituted,
+        expanded once per set of type arguments.
+        """
+        if not type_args:
+            return self.items
+        key = tuple(type_args.items())
+        expanded = self._expanded.get(key)
+        if expanded is None:
+            expanded = self._expanded[key] = {
+                name: expand_type(typ, type_args) for name, typ in self.items.items()
+            }
+        return expanded
+
+    def describe(self) -> JsonDict:
+        """
+        The JSON form of the topology export: the value type of each key as
+        mypy prints it.
+        """
+        if self._description is None:
+            self._description = {"name": self.fullname}
+            if self.is_typeddict:
+                self._description["keys"] = {key: str(typ) for key, typ in self.items.items()}
+                self._description["required"] = sorted(self.required_keys)
+            if self.members:
+                self._description["members"] = [member.describe() for member in self.members]
+        return self._description
+
+    def leaves(self) -> Iterator[StreamSchema]:
+        """
+        The declared schemas this schema is made of.
+        """
+        if not self.members:
+            yield self
+        for member in self.members:
+            yield from member.leaves()
+
+    @property
+    def info(self) -> Optional[TypeInfo]:
+        if self._info is None and self.kind is None:
+            sym = lookup_fully_qualified(self.fullname, self._modules)
+            if sym is not None and isinstance(sym.node, TypeInfo):
+                self._info = sym.node
+        return self._info
+
+    @staticmethod
+    def deserialize_types(data: list[JsonDict], modules: dict[str, MypyFile]) -> tuple[MypyType, ...]:
+        fixer = TypeFixer(modules, allow_missing=False)
+        types = []
+        for item in data:
+            typ = deserialize_type(item)
+            typ.accept(fixer)
+            types.append(typ)
+        return tuple(types)
+
+    @property
+    def args(self) -> tuple[MypyType, ...]:
+        """
+        The type arguments of an "applied" schema.
+        """
+        if self._args is None:
+            self._args = self.deserialize_types(self.data.get("args", []), self._modules)
+        return self._args
+
+    @property
+    def free_type_vars(self) -> tuple[TypeVarType, ...]:
+        """
+        The type variables in the value types, which a composition solves from
+        the schema of its upstream.
+        """
+        if self._free_type_vars is None:
+            found: dict[TypeVarId, TypeVarType] = {}
+            if self.type_vars and self.is_typeddict:
+                for typ in self.items.values():
+                    for type_var in get_type_vars(typ):
+                        found.setdefault(type_var.id, type_var)
+            self._free_type_vars = tuple(found.values())
+        return self._free_type_vars
+
+    @property
+    def items(self) -> dict[str, MypyType]:
+        if self._items is None:
+            if self._info is not None and self._info.typeddict_type is not None:
+                self._items = dict(self._info.typeddict_type.items)
+            else:
+                fixer = TypeFixer(self._modules, allow_missing=False)
+                self._items = {}
+                for key, data in self.data["items"] or []:
+                    typ = deserialize_type(data)
+                    typ.accept(fixer)
+                    self._items[key] = typ
+        return self._items
+
+
+class StreamPlugin(Plugin):
+
+    def __init__(self, options: Options) -> None:
+        super().__init__(options)
+        
+        # Input/Output resolution cache, keyed by the fullname of the term class
+        self._term_cache: dict[str, ResolvedTerm] = {}
+        self.term_cache_stats = CacheStats()
+
+        # Compatibility verdicts, keyed by schema pair and RHS type arguments
+        self._verdict_cache = VerdictCache()
+
+        # One StreamSchema per schema fullname, replaced when the schema changes
+        self._schemas: dict[str, StreamSchema] = {}
+        # One SchemaShape per schema structure
+        self.interner = SchemaInterner()
+        # Attributes read from TypeInfo metadata (hits) or resolved again (misses)
+        self.metadata_stats = CacheStats()
+
+        # Product, union and merged schemas, keyed by kind and members
+        self._composites: dict[tuple[str, tuple[StreamSchema, ...]], StreamSchema] = {}
+
+        # Generic schemas with type arguments, keyed by generic schema and arguments
+        self._applied: dict[tuple[StreamSchema, tuple[MypyType, ...]], StreamSchema] = {}
+
+        # Type arguments solved for generic terms, keyed by term, schemas and explicit arguments
+        self._solutions: dict[
+            tuple[str, StreamSchema, StreamSchema, tuple[tuple[TypeVarId, MypyType], ...]], dict[TypeVarId, MypyType]
+        ] = {}
+        self.solution_stats = CacheStats()
+
+        # Synthetic circuit classes, keyed by module, base class and schemas
+        self._circuits: dict[
+            tuple[str, str, Optional[StreamSchema], Optional[StreamSchema], Cost, Optional[str], tuple[str, ...], bool],
+            TypeInfo,
+        ] = {}
+
+        # Parsed once; per-module settings are resolved through `self.modules`
+        self.config = PluginConfig()
+        try:
+            self.config = PluginConfig.load(options)
+            defaults = ModuleSettings().apply(parse_module_settings(self.config.settings, self.config.path or "<defaults>"))
+            self.modules = ModuleMatcher(defaults, self.config.overrides)
+            self.report_cache_stats: bool = self.config.get("report_cache_stats", False)
+            self._verdict_cache.maxsize = self.config.get("verdict_cache_size", self._verdict_cache.maxsize)
+            self.projection_plan_path = self.config.resolve_path(self.config.get("projection_plan", None))
+            self.topology_dir = self.config.resolve_path(self.config.get("topology_dir", None))
+            self.profile_path = os.environ.get(PROFILE_ENV) or self.config.resolve_path(self.config.get("profile", None))
+            self.profile_top: int = self.config.get("profile_top", 10)
+            log.configure(
+                level=self.config.get("log_level", "off"),
+                file=self.config.resolve_path(self.config.get("log_file", None)),
+                format=self.config.get("log_format", "text"),
+            )
+        except Exception as e:
+            # Be careful not to crash Mypy if config parsing fails
+            print(f"Warning: Could not parse configuration: {e}", file=sys.stderr)
+            self.modules = ModuleMatcher(ModuleSettings(), [])
+            self.report_cache_stats = False
+            self.projection_plan_path = None
+            self.topology_dir = None
+            self.profile_path = os.environ.get(PROFILE_ENV)
+            self.profile_top = 10
+
+        log.info(
+            "plugin_loaded",
+            mypy_version=mypy_version,
+            python_version=sys.version.split()[0],
+            config=self.config.path,
+            allow_untyped_streams=self.modules.defaults.allow_untyped_streams,
+            overrides=len(self.modules),
+        )
+
+        if self.report_cache_stats:
+            # Mypy skips the atexit handlers on its fast exit path
+            options.fast_exit = False
+            atexit.register(self._report_cache_stats)
+
+        self.projection_plan = CircuitPlan()
+        if self.projection_plan_path is not None:
+            options.fast_exit = False
+            atexit.register(self.projection_plan.write, self.projection_plan_path)
+
+        self.topology = TopologyExport()
+        if self.topology_dir is not None:
+            options.fast_exit = False
+            atexit.register(self.topology.write, self.topology_dir)
+
+        # Profiling replaces the profiled methods of this instance with timed
+        # ones, before the hook tables below take them
+        self.profiler: Optional[Profiler] = None
+        if self.profile_path:
+            self.profiler = Profiler(self.profile_path, self.profile_top)
+            for name in PROFILED_HOOKS + PROFILED_PHASES:
+                setattr(self, name, self.profiler.timed(name, getattr(self, name)))
+            options.fast_exit = False
+            atexit.register(self._write_profile)
+
+        # Method hooks by method fullname, see get_method_hook
+        self._composition_hooks: dict[str, Callable[[MethodContext], MypyType]] = {
+            "__mul__": self.check_stream_compatibility,
+            "__or__": self.check_parallel_composition,
+        }
+        self._composition_suffixes = tuple(f".{method}" for method in self._composition_hooks)
+        self._library_method_hooks: dict[str, Optional[Callable[[MethodContext], MypyType]]] = {
+            f"{class_name}.{method}": hook
+            for class_name in [f"{TERM_FULLNAME.rpartition('.')[0]}.{name}" for name in CORE_TERMS] + list(behaviors)
+            for method, hook in self._composition_hooks.items()
+        }
+        self._method_hooks = dict(self._library_method_hooks)
+
+    def set_modules(self, modules: dict[str, MypyFile]) -> None:
+        """
+        Mypy calls this whenever it loads modules: at the start of a build, and
+        for each module dmypy rechecks. Classes may have changed, so the method
+        hooks found for user classes are forgotten.
+        """
+        super().set_modules(modules)
+        self._method_hooks = dict(self._library_method_hooks)
+
+    def report_config_data(self, ctx: ReportConfigContext) -> dict[str, bool]:
+        """
+        Settings that change the plugin's verdicts. Mypy stores them in the cache
+        metadata of every module and rechecks the module when they change.
+        """
+        return asdict(self.modules.settings_for(ctx.id))
+
+    def _settings_for(self, ctx: MethodContext | FunctionContext) -> ModuleSettings:
+        checker = ctx.api
+        if isinstance(checker, TypeChecker):
+            return self.modules.settings_for(checker.tree.fullname)
+        return self.modules.defaults
+
+    def get_method_hook(self, fullname: str) -> Optional[Callable[[MethodContext], MypyType]]:
+        """
+        Mypy asks for a hook on every method call it checks, so the common case
+        is a single dict lookup: the table starts with the library terms and
+        remembers every fullname it looked up since mypy last loaded modules
+        (see set_modules).
+        """
+        try:
+            return self._method_hooks[fullname]
+        except KeyError:
+            pass
 
-# https://mypy.readthedocs.io/en/stable/extending_mypy.html
+        if not fullname.endswith(self._composition_suffixes):
+            self._method_hooks[fullname] = None
+            return None
 
-class StreamPlugin(Plugin):
+        # Mypy names the method after the class of the receiver, which is a user
+        # defined subclass more often than not: only run for logicsponge terms.
+        # _store_term_metadata forgets the classes it sees become terms.
+        class_name, _, method = fullname.rpartition(".")
+        hook: Optional[Callable[[MethodContext], MypyType]] = None
+        if class_name.startswith("logicsponge.") or self._is_term_class(class_name):
+            hook = self._composition_hooks[method]
+        self._method_hooks[fullname] = hook
+        return hook
 
-    def __init__(self, options: Options) -> None:
-        super().__init__(options)
-        
-        # Default value
-        self.allow_untyped_streams: bool = False
-        
-        # Try to read from pyproject.toml
-        # Note: options.config_file might be 'mypy.ini', 'pyproject.toml', or None
-        config_path = "pyproject.toml" 
-        
-        # If the user explicitly passed a config file to mypy, checks if it is useful
-        if options.config_file and options.config_file.endswith(".toml"):
-            config_path = options.config_file
+    def get_function_hook(self, fullname: str) -> Optional[Callable[[FunctionContext], MypyType]]:
+        if fullname == FUSE_FULLNAME:
+            return self.check_fusion
+        return None
 
-        try:
-            with open(config_path, "rb") as f:
-                data = tomllib.load(f)
-                # Navigate to [tool.logicsponge]
-                settings = data.get("tool", {}).get("logicsponge", {})
-                self.allow_untyped_streams = settings.get("allow_untyped_streams", False)
-                
-                print(f"Logicsponge Plugin: allow_untyped_streams = {self.allow_untyped_streams}")
-        except FileNotFoundError:
-            pass
-        except Exception as e:
-            # Be careful not to crash Mypy if config parsing fails
-            print(f"Warning: Could not parse configuration: {e}")
+    def get_base_class_hook(self, fullname: str) -> Optional[Callable[[ClassDefContext], None]]:
+        if fullname == TERM_FULLNAME or self._is_term_class(fullname):
+            return self._store_term_metadata
+        return None
 
+    def _is_term_class(self, fullname: str) -> bool:
+        sym = self.lookup_fully_qualified(fullname)
+        return sym is not None and isinstance(sym.node, TypeInfo) and sym.node.has_base(TERM_FULLNAME)
 
-    def get_method_hook(self, fullname: str) -> Optional[Callable[[MethodContext], MypyType]]:
-        # Only run this plugin for the logic sponge library
-        if not fullname.startswith("logicsponge."):
+    def _store_term_metadata(self, ctx: ClassDefContext) -> None:
+        """
+        Resolves the Input/Output schemas of a term class right after semantic
+        analysis and stores them in the metadata of its TypeInfo.
+
+        Mypy serializes the metadata into the incremental cache, so a warm run
+        gets the schemas of unchanged modules without looking at the class body
+        again. Attributes we cannot resolve yet are left out and resolved at
+        check time instead.
+        """
+        info = ctx.cls.info
+        for method in self._composition_hooks:
+            self._method_hooks.pop(f"{info.fullname}.{method}", None)
+
+        metadata: JsonDict = {"version": METADATA_VERSION}
+        for attr_name in ("Input", "Output"):
+            schema = self._resolve_in_class_body(ctx, attr_name)
+            if schema is not None:
+                metadata[attr_name.lower()] = schema.data
+            elif self._lookup_attribute(info, attr_name) is None:
+                metadata[attr_name.lower()] = None
+        cost = self._declared_cost(ctx)
+        if cost:
+            metadata["cost"] = cost
+        info.metadata[METADATA_KEY] = metadata
+        log.debug("term_metadata", term=info.fullname, attrs=sorted(metadata))
+
+    @staticmethod
+    def _declared_cost(ctx: ClassDefContext) -> JsonDict:
+        """
+        The `Latency` and `Rate` the class body assigns literals to, completed
+        with what its closest base with a cost declares.
+        """
+        info = ctx.cls.info
+        declared: JsonDict = {}
+        for stmt in ctx.cls.defs.body:
+            if not isinstance(stmt, AssignmentStmt):
+                continue
+            # `-1.0` is parsed as the negation of the literal `1.0`
+            operand, sign = stmt.rvalue, 1
+            if isinstance(stmt.rvalue, UnaryExpr) and stmt.rvalue.op in ("-", "+"):
+                sign = -1 if stmt.rvalue.op == "-" else 1
+                operand = stmt.rvalue.expr
+            if not isinstance(operand, (IntExpr, FloatExpr)):
+                continue
+            for lvalue in stmt.lvalues:
+                if isinstance(lvalue, NameExpr) and lvalue.name in COST_ATTRIBUTES:
+                    if sign * operand.value < 0:
+                        ctx.api.fail(f"{lvalue.name} of a term cannot be negative.", stmt)
+                        continue
+                    declared[COST_ATTRIBUTES[lvalue.name]] = float(sign * operand.value)
+        for base in info.mro[1:]:
+            inherited = base.metadata.get(METADATA_KEY, {}).get("cost")
+            if inherited:
+                return {**inherited, **declared}
+        return declared
+
+    def _resolve_in_class_body(self, ctx: ClassDefContext, attr_name: str) -> Optional[StreamSchema]:
+        info = ctx.cls.info
+        if attr_name not in info.names:
+            # Inherited: reuse what we stored for the base class
+            for base in info.mro[1:]:
+                if attr_name in base.names:
+                    data = base.metadata.get(METADATA_KEY, {}).get(attr_name.lower())
+                    return None if data is None else self._schema_from_data(data)
             return None
-            
-        if fullname.endswith(".__mul__"):
-            return self.check_stream_compatibility
-        return None
+
+        # The type of `Output = HelloMsg` is only inferred by the checker, but
+        # the class body already tells us which class it refers to
+        node = info.names[attr_name].node
+        if isinstance(node, Var) and node.type is None:
+            for stmt in ctx.cls.defs.body:
+                if (
+                    isinstance(stmt, AssignmentStmt)
+                    and any(isinstance(lv, NameExpr) and lv.name == attr_name for lv in stmt.lvalues)
+                    and isinstance(stmt.rvalue, RefExpr)
+                ):
+                    target = stmt.rvalue.node
+                    if isinstance(target, TypeInfo):
+                        return self._intern_schema(target)
+                    if isinstance(target, TypeAlias):
+                        # `type AB = A | B`
+                        return self._normalize_schema(target.target, f"{info.fullname}.{attr_name}")
+            return None
+
+        return self._attribute_schema(info, attr_name)
+
+    def _attribute_schema(self, type_info: TypeInfo, attr_name: str) -> Optional[StreamSchema]:
+        typ = self._get_type_attribute(type_info, attr_name)
+        return None if typ is None else self._normalize_schema(typ, f"{type_info.fullname}.{attr_name}")
+
+    def _normalize_schema(self, typ: MypyType, declared: str) -> Optional[StreamSchema]:
+        """
+        Maps the type a term declares as its Input/Output to its canonical
+        schema, whatever the form of the declaration: a TypedDict class, the
+        functional `TypedDict('X', {...})` form, a type alias, a `type[...]`
+        property or annotation.
+
+        - `Union[A, B]` (or `A | B`) is the union of the schemas of its members
+          (a stream of items of either schema), so that it shares its verdicts
+          with the union emitted by `MergeToSingleStream`.
+        - `Batch[A]` is the batch schema of `A`.
+        - A generic schema with type arguments is an "applied" schema.
+        - A type variable (`Input: type[S]`) is a "var" schema.
+        """
+        proper = get_proper_type(typ)
+        if isinstance(proper, TypeVarType):
+            return self._store_schema(StreamSchema.variable_data(proper))
+        if isinstance(proper, TypedDictType):
+            proper = proper.fallback
+        if isinstance(proper, UnionType):
+            members = [self._normalize_schema(item, declared) for item in proper.items]
+            if any(member is None for member in members):
+                return None
+            return self._composite_schema("union", tuple(member for member in members if member is not None))
+        if not isinstance(proper, Instance):
+            log.debug("schema_unresolved", attr=declared, reason="does not reference a class", type=proper)
+            return None
+        if proper.type.fullname == BATCH_FULLNAME:
+            item = self._normalize_schema(proper.args[0], declared) if proper.args else None
+            if item is None or item.kind not in (None, "applied"):
+                log.debug("schema_unresolved", attr=declared, reason="batch of a non-class")
+                return None
+            return self._composite_schema("batch", (item,))
+        return self._instance_schema(proper)
+
+    def _instance_schema(self, instance: Instance) -> StreamSchema:
+        """
+        The schema of `instance`: the declared schema, or the generic schema
+        with its type arguments when they are not its own type variables
+        (`GenX[T]` in `class XtoY_Gen[T]`, `GenX[int]`).
+        """
+        schema = self._intern_schema(instance.type)
+        type_vars = instance.type.defn.type_vars
+        if all(isinstance(arg, TypeVarType) and arg.id == type_var.id for arg, type_var in zip(instance.args, type_vars)):
+            return schema
+        key = (schema, tuple(instance.args))
+        applied = self._applied.get(key)
+        if applied is None:
+            applied = self._applied[key] = self._store_schema(StreamSchema.applied_data(schema, instance.type, key[1]))
+        return applied
+
+    def _intern_schema(self, info: TypeInfo) -> StreamSchema:
+        schema = self._store_schema(StreamSchema.serialize_info(info))
+        if schema._info is None:
+            schema._info = info
+        return schema
+
+    def _schema_from_data(self, data: JsonDict) -> StreamSchema:
+        """
+        The schema stored as `data` in the metadata of a term or circuit, as
+        its classes declare it now.
+
+        The stored form is a copy taken when the metadata was written: the
+        TypedDicts it names may have changed since, in a module that was
+        checked again while the module of the term was not (dmypy, or a
+        warm cache). It is only used as is for schemas no class declares
+        and for classes we cannot find.
+        """
+        # Set by mypy before any hook runs
+        assert self._modules is not None
+        kind = data.get("kind")
+        if kind is None:
+            sym = lookup_fully_qualified(data["fullname"], self._modules)
+            if sym is not None and isinstance(sym.node, TypeInfo):
+                return self._intern_schema(sym.node)
+        elif kind == "applied":
+            generic = self._schema_from_data(data["members"][0])
+            if generic.info is not None:
+                args = StreamSchema.deserialize_types(data["args"], self._modules)
+                return self._instance_schema(Instance(generic.info, list(args)))
+        elif kind in ("product", "union", "intersection", "merged", "batch"):
+            return self._composite_schema(kind, tuple(self._schema_from_data(member) for member in data["members"]))
+        return self._store_schema(data)
+
+    def _store_schema(self, data: JsonDict, members: Optional[tuple[StreamSchema, ...]] = None) -> StreamSchema:
+        """
+        The one schema of a fullname, replaced when its content changes.
+        """
+        schema = self._schemas.get(data["fullname"])
+        if schema is None or schema.data != data:
+            assert self._modules is not None
+            schema = StreamSchema(data, self._modules, members=members)
+            schema.shape = self.interner.intern(schema)
+            self._schemas[schema.fullname] = schema
+        return schema
     
     def check_stream_compatibility(self, ctx: MethodContext) -> MypyType:
         """
@@ -66,146 +1750,930 @@ class StreamPlugin(Plugin):
             return ctx.default_return_type
         rhs_type = ctx.arg_types[0][0] 
 
-        print(f"\nAnalyzing stream {lhs_type} * {rhs_type}")
+        log.debug("compose", lhs=lhs_type, rhs=rhs_type)
 
         # We only care if both sides are Instances (classes)
         if not isinstance(lhs_type, Instance) or not isinstance(rhs_type, Instance):
             return ctx.default_return_type
-        
-        class Behavior(Enum):
-            SOURCE = auto()
-            IDENTITY = auto()
-            SINK = auto()
-        
-        LIBRARY_BEHAVIORS = {
-            "logicsponge.core.logicsponge.Print": Behavior.IDENTITY,
-            "logicsponge.core.logicsponge.Stop": Behavior.SINK,
-            # "logicsponge.core.logicsponge.JsonParser": Behavior.IDENTITY,
-        }
-
-        rhs_fullname = rhs_type.type.fullname
-        rhs_behavior: Behavior | None = LIBRARY_BEHAVIORS.get(rhs_fullname)
-        # lhs_fullname = lhs_type.type.fullname
-        # lhs_behavior = LIBRARY_BEHAVIORS.get(lhs_fullname)
-
-        if rhs_behavior is Behavior.SOURCE:
-            ctx.api.fail(
-                "Stream mismatch: Cannot compose into a SourceTerm.",
-                ctx.context
-            )
-            return AnyType(TypeOfAny.from_error)
-        if rhs_behavior is Behavior.IDENTITY:
-            print(f"\tIdentity term detected: passing through type {lhs_type}")
-            return lhs_type
 
-        if rhs_behavior is Behavior.SINK:
-            print(f"\tSink term detected: accepting any input, returning {rhs_type}")
-            return rhs_type
+        lhs = self._resolve_term(lhs_type.type)
+        rhs = self._resolve_term(rhs_type.type)
+        # The circuit carries these schemas, also through library terms
+        self._record_dependencies(ctx, lhs_type.type, "Output", lhs.output)
+        self._record_dependencies(ctx, rhs_type.type, "Input", rhs.input)
+        if self.topology_dir is not None:
+            self._record_topology(ctx, lhs_type.type, lhs, rhs_type.type, rhs)
+        cost = self._sequential_cost(ctx, lhs, rhs)
+        if rhs.behavior is not None:
+            return self._apply_behavior(ctx, rhs.behavior, lhs, cost, rhs.producer)
         
         # CASE 3: Regular Terms
+        type_args = self._type_arguments(rhs_type, lhs.output, rhs.input)
+        output = self._substitute(rhs.output, type_args)
+        verdict = None if lhs.output is None or rhs.input is None else self._verdict(lhs.output, rhs.input, type_args)
+        run = self._extend_run(ctx, lhs, rhs, rhs_type.type.fullname, verdict)
+        circuit = self._circuit_type(ctx, lhs.input, output, cost, rhs.producer, run, lhs.source)
 
         # 1. Extract Output type from Left Hand Side (LHS)
-        lhs_output = self._get_type_attribute(lhs_type.type, "Output")
+        lhs_output = lhs.output
         if lhs_output is None:
-            if self.allow_untyped_streams:
-                print("\tAllowing untyped stream due to configuration.")
-                return rhs_type
+            if self._settings_for(ctx).allow_untyped_streams:
+                log.debug("untyped_stream_allowed", side="lhs", term=lhs_type)
+                return circuit
             ctx.api.fail("No Output type found on LHS of stream composition.", ctx.context)
             return AnyType(TypeOfAny.from_error)
         
         # 2. Extract Input type from Right Hand Side (RHS)
-        rhs_input = self._get_type_attribute(rhs_type.type, "Input")
+        rhs_input = rhs.input
         if rhs_input is None:
-            if self.allow_untyped_streams:
-                print("\tAllowing untyped stream due to configuration.")
-                return rhs_type
+            if self._settings_for(ctx).allow_untyped_streams:
+                log.debug("untyped_stream_allowed", side="rhs", term=rhs_type)
+                return circuit
             ctx.api.fail("No Input type found on RHS of stream composition.", ctx.context)
             return AnyType(TypeOfAny.from_error)
         
         # 3. Check Compatibility
-        return self._check_stream_compatibility(ctx, rhs_type, lhs_output, rhs_input)
+        assert verdict is not None
+        if verdict.ok:
+            # Only an edge proven compatible tells which keys the consumer reads
+            self._plan_projection(ctx, lhs, rhs_type.type.fullname, lhs_output, rhs_input)
+        return self._check_stream_compatibility(ctx, verdict, circuit)
+
+    def _type_arguments(
+        self, rhs_type: Instance, lhs_output: Optional[StreamSchema], rhs_input: Optional[StreamSchema]
+    ) -> dict[TypeVarId, MypyType]:
+        """
+        The type arguments of the RHS term: those written out (`XtoY_Gen[int]()`)
+        and those solved by unifying its Input with the upstream Output, key
+        by key (`CreateIntX() * XtoY_Gen()` binds T to int).
 
+        Solutions are memoized per term, upstream schema and written-out
+        arguments. A type variable without a solution within its bound is
+        left free, so that the key check reports the mismatch.
+        """
+        explicit: dict[TypeVarId, MypyType] = {}
+        for type_var, arg in zip(rhs_type.type.defn.type_vars, rhs_type.args):
+            # `XtoY_Gen()` is inferred as `XtoY_Gen[Never]`
+            proper = get_proper_type(arg)
+            if isinstance(proper, UninhabitedType) or (
+                isinstance(proper, AnyType) and proper.type_of_any == TypeOfAny.from_omitted_generics
+            ):
+                continue
+            explicit[type_var.id] = arg
+        if lhs_output is None or rhs_input is None or not lhs_output.is_typeddict:
+            return explicit
+        free = [type_var for type_var in rhs_input.free_type_vars if type_var.id not in explicit]
+        if not free:
+            return explicit
+
+        key = (rhs_type.type.fullname, lhs_output, rhs_input, tuple(explicit.items()))
+        solution = self._solutions.get(key)
+        if solution is not None:
+            self.solution_stats.hits += 1
+            return solution
+        self.solution_stats.misses += 1
 
-    def _check_stream_compatibility(self, ctx: MethodContext, rhs_type: Instance, lhs_output: TypeInfo, rhs_input: TypeInfo) -> MypyType:
+        expected = rhs_input.expanded_items(explicit)
+        constraints = []
+        for name in rhs_input.keys:
+            if name in lhs_output.key_set:
+                constraints.extend(infer_constraints(expected[name], lhs_output.items[name], SUPERTYPE_OF))
+        solved, _ = solve_constraints(free, constraints, strict=False)
+        solution = dict(explicit)
+        for type_var, value in zip(free, solved):
+            if value is None or not is_subtype(value, type_var.upper_bound):
+                continue
+            solution[type_var.id] = value
+        self._solutions[key] = solution
+        log.debug(
+            "type_arguments", term=rhs_type.type.fullname, output=lhs_output.fullname,
+            solution={type_var.name: str(solution.get(type_var.id, type_var)) for type_var in free},
+        )
+        return solution
+
+    def _substitute(self, schema: Optional[StreamSchema], type_args: dict[TypeVarId, MypyType]) -> Optional[StreamSchema]:
         """
-        Logic to check if LHS output matches RHS input using structural subtyping.
-        Corrected to verify that LHS satisfies all requirements of RHS.
+        `schema` with the solved type arguments of its term substituted, e.g.
+        the Output `GenY[T]` of `XtoY_Gen` becomes `GenY[int]`.
         """
-        
+        if schema is None or not type_args or not schema.type_vars:
+            return schema
+        if schema.kind == "applied":
+            info = schema.members[0].info
+            args = list(schema.args)
+        elif schema.kind is None:
+            info = schema.info
+            args = [] if info is None else list(info.defn.type_vars)
+        else:
+            return schema
+        if info is None:
+            return schema
+        return self._instance_schema(Instance(info, [expand_type(arg, type_args) for arg in args]))
+
+    def _record_topology(
+        self, ctx: MethodContext, lhs_info: TypeInfo, lhs: ResolvedTerm, rhs_info: TypeInfo, rhs: ResolvedTerm
+    ) -> None:
+        checker = ctx.api
+        if not isinstance(ctx.context, OpExpr) or not isinstance(checker, TypeChecker):
+            return
+        self.topology.module(checker.tree.fullname).compose(
+            ctx.context,
+            lambda: self._describe_term(lhs_info, lhs),
+            lambda: self._describe_term(rhs_info, rhs),
+        )
+
+    @staticmethod
+    def _describe_term(type_info: TypeInfo, resolved: ResolvedTerm) -> JsonDict:
+        metadata = type_info.metadata.get(METADATA_KEY)
+        if metadata is not None and "producer" in metadata:
+            kind = "circuit"
+        elif resolved.behavior is not None:
+            kind = "library"
+        elif type_info.has_base(SOURCE_TERM_FULLNAME):
+            kind = "source"
+        elif type_info.has_base(STATEFUL_TERM_FULLNAME):
+            kind = "stateful"
+        elif type_info.has_base(FUNCTION_TERM_FULLNAME):
+            kind = "function"
+        else:
+            kind = "term"
+        return {
+            "term": type_info.fullname,
+            "kind": kind,
+            "behavior": None if resolved.behavior is None else resolved.behavior.kind.name.lower(),
+            "input": None if resolved.input is None else resolved.input.describe(),
+            "output": None if resolved.output is None else resolved.output.describe(),
+            "cost": resolved.cost.serialize(),
+        }
+
+    def _extend_run(
+        self, ctx: MethodContext, lhs: ResolvedTerm, rhs: ResolvedTerm, rhs_fullname: str, verdict: Optional[Verdict]
+    ) -> tuple[str, ...]:
+        """
+        The run of stateless FunctionTerms `lhs * rhs` ends with. A single
+        FunctionTerm joins the run of `lhs` when the edge between them is typed
+        on both sides and proven compatible (`verdict`); anything else ends it.
+        """
+        if rhs.run != (rhs_fullname,):
+            return rhs.run
+        if not lhs.run or verdict is None or not verdict.ok:
+            return rhs.run
+        run = lhs.run + rhs.run
+        checker = ctx.api
+        if isinstance(checker, TypeChecker):
+            self.projection_plan.record_fusion(checker.tree.fullname, ctx.context.line, ctx.context.column, run)
+        return run
+
+    def _sequential_cost(self, ctx: MethodContext, lhs: ResolvedTerm, rhs: ResolvedTerm) -> Cost:
+        """
+        The cost of `lhs * rhs`. Reports the bottleneck of `rhs` when it cannot
+        keep up with the items the sources of `lhs` emit.
+        """
+        cost = lhs.cost.then(rhs.cost)
+        rate = lhs.cost.rate
+        if rate is not None and rate > rhs.cost.throughput:
+            ctx.api.fail(
+                f'Stream throughput: upstream emits {rate:g} items/s but "{rhs.cost.bottleneck}" '
+                f"processes at most {rhs.cost.throughput:g} items/s "
+                f"(critical path {cost.latency:g} s per item).",
+                ctx.context
+            )
+        if cost != Cost():
+            log.debug(
+                "circuit_cost",
+                latency=cost.latency, throughput=cost.throughput, bottleneck=cost.bottleneck, rate=rate,
+            )
+        return cost
+
+    def _plan_projection(
+        self, ctx: MethodContext, lhs: ResolvedTerm, consumer: str, lhs_output: StreamSchema, rhs_input: StreamSchema
+    ) -> None:
+        """
+        Records which keys of the items `lhs` produces the `consumer` reads, and
+        warns about the others: nothing downstream of the consumer sees them,
+        since a term emits the items of its own Output.
+
+        Library terms are taken to read every key (Print does), so only an edge
+        between two declared schemas gets a plan.
+        """
+        if lhs.producer is None or not lhs_output.is_typeddict or not rhs_input.is_typeddict:
+            return
+        if lhs_output.kind not in (None, "keys") or rhs_input.kind not in (None, "intersection"):
+            return
+        needed = rhs_input.key_set
+        produced = lhs_output.keys
+        unread = [key for key in produced if key not in needed]
+        checker = ctx.api
+        if isinstance(checker, TypeChecker):
+            self.projection_plan.record(
+                checker.tree.fullname, ctx.context.line, lhs.producer, consumer,
+                needed=[key for key in produced if key in needed], unread=unread,
+            )
+        if unread and self._settings_for(ctx).warn_unread_keys:
+            keys = ", ".join(unread)
+            ctx.api.msg.note(
+                f'Key{"s" if len(unread) > 1 else ""} {keys} produced by "{lhs.producer.rpartition(".")[2]}" '
+                f"{'are' if len(unread) > 1 else 'is'} never consumed",
+                ctx.context,
+            )
+
+    def _apply_behavior(
+        self, ctx: MethodContext, behavior: TermBehavior, lhs: ResolvedTerm, cost: Cost, producer: Optional[str]
+    ) -> MypyType:
+        """
+        Composition with a library term: derives the Output of the circuit
+        from the Output of the LHS, following the term's registered behavior.
+        """
+        kind = behavior.kind
+        if kind is Behavior.SOURCE:
+            ctx.api.fail(
+                "Stream mismatch: Cannot compose into a SourceTerm.",
+                ctx.context
+            )
+            return AnyType(TypeOfAny.from_error)
+
+        output: Optional[StreamSchema]
+        if kind is Behavior.IDENTITY:
+            output = lhs.output
+        elif kind is Behavior.SINK:
+            output = None
+        elif kind is Behavior.FLATTEN or (kind is Behavior.MERGE and self._call_argument(ctx, "combine") is True):
+            output = self._merge_schema(lhs.output)
+        elif kind is Behavior.MERGE:
+            output = self._union_schema(lhs.output)
+        elif kind is Behavior.REPLACE:
+            if all(self._call_argument(ctx, name, default) == default for name, default in behavior.arguments):
+                output = self._library_schema(ctx, behavior.output)
+            else:
+                # Other arguments, or ones we cannot read, emit other keys
+                log.debug("library_arguments_unresolved", arguments=[name for name, _ in behavior.arguments])
+                output = None
+        elif kind is Behavior.BATCH or kind is Behavior.UNBATCH:
+            batched = lhs.output is not None and lhs.output.kind == "batch"
+            if lhs.output is not None and batched == (kind is Behavior.BATCH):
+                expected, got = ("single items", "batches") if batched else ("batches", "single items")
+                term = get_proper_type(ctx.arg_types[0][0])
+                ctx.api.fail(
+                    f'Stream mismatch: "{term.type.name if isinstance(term, Instance) else term}" expects {expected}, '
+                    f"but the upstream emits {got} of '{(lhs.output.members[0] if batched else lhs.output).name}'.",
+                    ctx.context
+                )
+                return AnyType(TypeOfAny.from_error)
+            if lhs.output is None:
+                output = None
+            elif batched:
+                output = lhs.output.members[0]
+            else:
+                output = self._composite_schema("batch", (lhs.output,))
+        else:
+            output = self._extend_schema(ctx, behavior, lhs.output)
+
+        log.debug("library_term", behavior=kind.name.lower(), output=output and output.fullname)
+        # Only a term that replaces the items is their single producer
+        return self._circuit_type(
+            ctx, lhs.input, output, cost, producer if kind is Behavior.REPLACE else None, source=lhs.source
+        )
+
+    def _extend_schema(self, ctx: MethodContext, behavior: TermBehavior, schema: Optional[StreamSchema]) -> Optional[StreamSchema]:
+        adds = list(behavior.adds)
+        if behavior.key_argument is not None:
+            key = self._call_argument(ctx, behavior.key_argument)
+            if not isinstance(key, str):
+                # The key is computed at runtime: we cannot know the keys of the Output
+                log.debug("key_argument_unresolved", argument=behavior.key_argument)
+                return None
+            adds.append((key, behavior.key_type))
+        if schema is None or not schema.is_typeddict:
+            return None
+        if not adds:
+            return schema
+        added = self._library_schema(ctx, tuple(adds))
+        return None if added is None else self._composite_schema("merged", (schema, added))
+
+    def _library_schema(self, ctx: MethodContext, keys: tuple[tuple[str, str], ...]) -> Optional[StreamSchema]:
+        """
+        A TypedDict schema for keys given as annotation strings.
+        """
+        items = []
+        for key, annotation in keys:
+            typ = self._parse_key_type(annotation)
+            if typ is None:
+                log.warning("key_type_unresolved", key=key, type=annotation)
+                return None
+            items.append([key, typ.serialize()])
+        fields = ", ".join(f"{key}: {annotation}" for key, annotation in keys)
+        return self._store_schema({
+            "fullname": f"{{{fields}}}",
+            "module": "builtins",
+            "items": items,
+            "required": sorted(key for key, _ in keys),
+            "type_vars": [],
+            "kind": "keys",
+        })
+
+    def _parse_key_type(self, annotation: str) -> Optional[MypyType]:
+        items: list[MypyType] = []
+        for part in annotation.split("|"):
+            name = part.strip()
+            if name == "None":
+                items.append(NoneType())
+            elif name == "Any":
+                items.append(AnyType(TypeOfAny.special_form))
+            else:
+                sym = self.lookup_fully_qualified(name if "." in name else f"builtins.{name}")
+                if sym is None or not isinstance(sym.node, TypeInfo):
+                    return None
+                items.append(Instance(sym.node, [AnyType(TypeOfAny.special_form)] * len(sym.node.type_vars)))
+        return UnionType.make_union(items)
+
+    @staticmethod
+    def _call_argument(ctx: MethodContext, name: str, default: Any = None) -> Any:
+        """
+        The value of a literal keyword argument in the construction of the
+        RHS, as in `MergeToSingleStream(combine=True)`, `default` when the
+        construction does not pass it, or None when the RHS is not
+        constructed in place or the argument is not a literal.
+        """
+        if not ctx.args or not ctx.args[0]:
+            return None
+        expr = ctx.args[0][0]
+        if not isinstance(expr, CallExpr):
+            return None
+        for arg_name, arg in zip(expr.arg_names, expr.args):
+            if arg_name == name:
+                if isinstance(arg, (StrExpr, IntExpr)):
+                    return arg.value
+                if isinstance(arg, NameExpr) and arg.fullname in ("builtins.True", "builtins.False"):
+                    return arg.fullname == "builtins.True"
+                return None
+        return default
+
+    def check_parallel_composition(self, ctx: MethodContext) -> MypyType:
+        """
+        `a | b` feeds the same items to both branches and produces their
+        streams side by side: the Input is the intersection of the branch
+        Inputs, which an upstream must satisfy one by one, and the Output is
+        the product of the branch Outputs.
+        """
+        lhs_type = ctx.type
+        if not ctx.arg_types or not ctx.arg_types[0]:
+            return ctx.default_return_type
+        rhs_type = ctx.arg_types[0][0]
+
+        log.debug("parallel", lhs=lhs_type, rhs=rhs_type)
+        if not isinstance(lhs_type, Instance) or not isinstance(rhs_type, Instance):
+            return ctx.default_return_type
+
+        lhs = self._resolve_term(lhs_type.type)
+        rhs = self._resolve_term(rhs_type.type)
+        if self.topology_dir is not None:
+            self._record_topology(ctx, lhs_type.type, lhs, rhs_type.type, rhs)
+        for term, resolved in ((lhs_type.type, lhs), (rhs_type.type, rhs)):
+            self._record_dependencies(ctx, term, "Input", resolved.input)
+            self._record_dependencies(ctx, term, "Output", resolved.output)
+
+        # Sources have no Input and library terms take any: only the other
+        # branch constrains the upstream
+        inputs = []
+        for term, resolved in ((lhs_type.type, lhs), (rhs_type.type, rhs)):
+            if resolved.input is not None:
+                inputs.append(resolved.input)
+            elif resolved.behavior is None and not resolved.source and not self._settings_for(ctx).allow_untyped_streams:
+                ctx.api.fail(f'No Input type found on branch "{term.name}" of parallel composition.', ctx.context)
+        if lhs.input is not None and rhs.input is not None:
+            self._report_conflicts(ctx, lhs.input, rhs.input)
+        input = self._composite_schema("intersection", tuple(inputs)) if inputs else None
+        if lhs.output is None or rhs.output is None:
+            output = None
+        else:
+            output = self._composite_schema("product", (lhs.output, rhs.output))
+        return self._circuit_type(ctx, input, output, lhs.cost.beside(rhs.cost), source=lhs.source and rhs.source)
+
+    @staticmethod
+    def _report_conflicts(ctx: MethodContext, lhs_input: StreamSchema, rhs_input: StreamSchema) -> None:
+        """
+        Reports the keys that two parallel branches both read with types no
+        value has: no upstream can feed both.
+        """
+        lhs_members = lhs_input.members if lhs_input.kind == "intersection" else (lhs_input,)
+        rhs_members = rhs_input.members if rhs_input.kind == "intersection" else (rhs_input,)
+        for lhs_member in lhs_members:
+            for rhs_member in rhs_members:
+                if not lhs_member.is_typeddict or not rhs_member.is_typeddict:
+                    continue
+                for key in lhs_member.keys:
+                    if key not in rhs_member.key_set:
+                        continue
+                    lhs_type, rhs_type = lhs_member.items[key], rhs_member.items[key]
+                    if not is_overlapping_types(lhs_type, rhs_type):
+                        ctx.api.fail(
+                            f"Stream mismatch: Parallel branches expect key '{key}' with conflicting types.\n"
+                            f"  {lhs_member.name}: {lhs_type}\n"
+                            f"  {rhs_member.name}: {rhs_type}",
+                            ctx.context
+                        )
+
+    def check_fusion(self, ctx: FunctionContext) -> MypyType:
+        """
+        `fuse(a, b, c)` runs like `a * b * c`: the terms must be stateless
+        FunctionTerms whose Outputs match the Inputs that follow, and the
+        result carries the Input of `a` and the Output of `c`.
+        """
+        terms = [get_proper_type(arg) for arg in ctx.arg_types[0]] if ctx.arg_types else []
+        if not terms or not all(isinstance(term, Instance) for term in terms):
+            return ctx.default_return_type
+        instances = [term for term in terms if isinstance(term, Instance)]
+
+        resolved = [self._resolve_term(term.type) for term in instances]
+        for term, term_resolved in zip(instances, resolved):
+            if term_resolved.run != (term.type.fullname,):
+                ctx.api.fail(f'Cannot fuse "{term.type.name}": only stateless FunctionTerms can be fused.', ctx.context)
+                return AnyType(TypeOfAny.from_error)
+
+        cost = resolved[0].cost
+        output = resolved[0].output
+        for (lhs_type, lhs), (rhs_type, rhs) in zip(zip(instances, resolved), zip(instances[1:], resolved[1:])):
+            cost = cost.then(rhs.cost)
+            # The Output of a generic term, with the type arguments solved so far
+            lhs_output, type_args = output, self._type_arguments(rhs_type, output, rhs.input)
+            output = self._substitute(rhs.output, type_args)
+            self._record_dependencies(ctx, lhs_type.type, "Output", lhs.output)
+            self._record_dependencies(ctx, rhs_type.type, "Input", rhs.input)
+            if lhs_output is None or rhs.input is None:
+                if not self._settings_for(ctx).allow_untyped_streams:
+                    side = "Output" if lhs_output is None else "Input"
+                    ctx.api.fail(f'No {side} type found on "{(lhs_type if lhs_output is None else rhs_type).type.name}" in fuse().', ctx.context)
+                continue
+            verdict = self._verdict(lhs_output, rhs.input, type_args)
+            for message in verdict.errors:
+                ctx.api.fail(message, ctx.context)
+
+        run = tuple(term.type.fullname for term in instances)
+        return self._circuit_type(ctx, resolved[0].input, output, cost, resolved[-1].producer, run)
+
+    def _merge_schema(self, schema: Optional[StreamSchema]) -> Optional[StreamSchema]:
+        """
+        The schema of items combined from all the streams of `schema`, or
+        None when one of them is not a TypedDict.
+        """
+        if schema is None or schema.kind not in ("product", "union"):
+            return schema
+        if not all(member.is_typeddict for member in schema.members):
+            return None
+        return self._composite_schema("merged", schema.members)
+
+    def _union_schema(self, schema: Optional[StreamSchema]) -> Optional[StreamSchema]:
+        if schema is None or schema.kind != "product":
+            return schema
+        return self._composite_schema("union", schema.members)
+
+    def _composite_schema(self, kind: str, members: tuple[StreamSchema, ...]) -> StreamSchema:
+        """
+        Returns the interned composite schema. Members of the same kind are
+        flattened, so that `a | b | c` has three members and not two.
+
+        The members of a union or an intersection are unordered: they are
+        deduplicated and sorted, and a union or an intersection of a single
+        schema is that schema.
+        """
+        flat: list[StreamSchema] = []
+        for member in members:
+            flat.extend(member.members if member.kind == kind and kind in ("product", "union", "intersection") else (member,))
+        if kind in ("union", "intersection"):
+            flat = sorted({member.fullname: member for member in flat}.values(), key=lambda member: member.fullname)
+            if len(flat) == 1:
+                return flat[0]
+        key = (kind, tuple(flat))
+        schema = self._composites.get(key)
+        if schema is None:
+            schema = self._composites[key] = self._store_schema(StreamSchema.composite_data(kind, key[1]), key[1])
+        return schema
+
+    def _circuit_type(
+        self,
+        ctx: MethodContext | FunctionContext,
+        input: Optional[StreamSchema],
+        output: Optional[StreamSchema],
+        cost: Cost = Cost(),
+        producer: Optional[str] = None,
+        run: tuple[str, ...] = (),
+        source: bool = False,
+    ) -> MypyType:
+        """
+        Returns the type of a composition: a subclass of what the operator
+        returns (e.g. SequentialTerm) carrying the Input, the Output and the
+        Cost of the whole circuit in its metadata.
+
+        The next composition resolves it like any other term, so each step of
+        a chain reuses the result of the previous one and a chain of n terms
+        is checked in n constant-time steps.
+        """
+        base = get_proper_type(ctx.default_return_type)
+        checker = ctx.api
+        if not isinstance(base, Instance) or not isinstance(checker, TypeChecker):
+            return ctx.default_return_type
+
+        module = checker.tree
+        key = (module.fullname, base.type.fullname, input, output, cost, producer, run, source)
+        info = self._circuits.get(key)
+        if info is None or module.names.get(info.name) is None or module.names[info.name].node is not info:
+            info = self._circuits[key] = self._add_circuit_info(module, base, input, output, cost, producer, run, source)
+        return Instance(info, [])
+
+    @staticmethod
+    def _add_circuit_info(
+        module: MypyFile,
+        base: Instance,
+        input: Optional[StreamSchema],
+        output: Optional[StreamSchema],
+        cost: Cost,
+        producer: Optional[str],
+        run: tuple[str, ...],
+        source: bool,
+    ) -> TypeInfo:
+        """
+        Creates a circuit class and adds it to the (hidden) names of the module,
+        so that mypy can serialize the types that refer to it.
+
+        Its metadata holds copies of the schemas: `_schema_from_data` reads
+        them back as their classes declare them at that point.
+        """
+        metadata: JsonDict = {
+            "version": METADATA_VERSION,
+            "input": None if input is None else input.data,
+            "output": None if output is None else output.data,
+            "producer": producer,
+        }
+        if run:
+            metadata["run"] = list(run)
+        if source:
+            metadata["source"] = True
+        if cost != Cost():
+            metadata["cost"] = cost.serialize()
+        signature = f"{'None' if input is None else input.name} -> {'None' if output is None else output.name}"
+        # Mypy splits fullnames on dots to look them up
+        signature = signature.replace(".", "_")
+        name = f"{base.type.name}[{signature}]"
+        # Circuits of one signature with different metadata are different
+        # classes: only their fullname, which mypy needs to be unique, tells
+        # them apart
+        key = name
+        suffix = 1
+        while key in module.names:
+            existing = module.names[key].node
+            if isinstance(existing, TypeInfo) and existing.metadata.get(METADATA_KEY) == metadata:
+                return existing
+            suffix += 1
+            key = f"{name}#{suffix}"
+
+        defn = ClassDef(name, Block([]))
+        defn.fullname = f"{module.fullname}.{key}"
+        info = TypeInfo(SymbolTable(), defn, module.fullname)
+        defn.info = info
+        info.bases = [base]
+        calculate_mro(info)
+        info.metadata[METADATA_KEY] = metadata
+        module.names[key] = SymbolTableNode(GDEF, info, plugin_generated=True, module_public=False)
+        log.debug("circuit_type", name=defn.fullname)
+        return info
+
+
+    def _record_dependencies(self, ctx: MethodContext | FunctionContext, term: TypeInfo, attr_name: str, schema: Optional[StreamSchema]) -> None:
+        """
+        Tells mypy that the module being checked depends on a schema it never names.
+
+        A composition reads the Input/Output schemas of terms behind mypy's back,
+        so mypy does not know that `a * b` must be rechecked when the TypedDict
+        behind `a.Output` changes in another module.
+        """
+        checker = ctx.api
+        if not isinstance(checker, TypeChecker):
+            return
+
+        leaves = [] if schema is None else list(schema.leaves())
+
+        # Incremental mode: module references end up as (indirect) dependencies
+        # in the cache metadata of the module
+        for leaf in leaves:
+            if leaf.module_name != checker.tree.fullname:
+                checker.module_refs.add(leaf.module_name)
+
+        # Daemon: fine-grained dependencies of the current target on the
+        # attribute (along the MRO up to its definition) and on the schema
+        if self.options.fine_grained_incremental:
+            target = checker.tscope.current_target()
+            deps = checker.tree.plugin_deps
+            for base in term.mro:
+                deps.setdefault(make_trigger(f"{base.fullname}.{attr_name}"), set()).add(target)
+                if attr_name in base.names:
+                    break
+            for leaf in leaves:
+                deps.setdefault(make_trigger(leaf.fullname), set()).add(target)
+
+    @staticmethod
+    def _check_stream_compatibility(ctx: MethodContext, verdict: Verdict, circuit: MypyType) -> MypyType:
+        """
+        Reports the verdict on whether the LHS output matches the RHS input,
+        cached per (Output schema, Input schema, RHS type arguments).
+        Returns `circuit`, the type of the composition, when they match.
+        """
+        # Replay the diagnostics at this composition site
+        for message in verdict.errors:
+            ctx.api.fail(message, ctx.context)
+
+        if verdict.ok:
+            return circuit
+        if verdict.keep_default_return:
+            return ctx.default_return_type
+        return AnyType(TypeOfAny.from_error)
+
+    def _verdict(self, lhs_output: StreamSchema, rhs_input: StreamSchema, rhs_map: dict[TypeVarId, MypyType]) -> Verdict:
         # 1. Exact Name Match (Optimization)
         if lhs_output.fullname == rhs_input.fullname:
-            return rhs_type
+            return Verdict()
+
+        # Structurally identical TypedDicts, declared under different names
+        if lhs_output.shape is not None and lhs_output.shape is rhs_input.shape:
+            self.interner.identity_hits += 1
+            return Verdict()
+
+        # 2. Handle 'Any', and terms generic in their Input schema
+        if rhs_input.fullname == 'typing.Any' or rhs_input.kind == "var":
+            return Verdict()
+
+        key = (lhs_output.fullname, rhs_input.fullname, tuple(rhs_map.items()))
+        verdict = self._verdict_cache.get(key, lhs_output, rhs_input)
+        if verdict is None:
+            verdict = self._compute_verdict(lhs_output, rhs_input, rhs_map)
+            self._verdict_cache.put(key, lhs_output, rhs_input, verdict)
+            log.debug("verdict", output=lhs_output.fullname, input=rhs_input.fullname, ok=verdict.ok)
+        return verdict
+
+    def _compute_verdict(self, lhs_output: StreamSchema, rhs_input: StreamSchema, rhs_map: dict[TypeVarId, MypyType]) -> Verdict:
+        """
+        Checks that the LHS Output satisfies all requirements of the RHS Input.
+        """
+
+        # Items of a product or a union may come from any member: each of
+        # them must satisfy the Input
+        if lhs_output.kind in ("product", "union"):
+            return self._all_of([self._verdict(member, rhs_input, rhs_map) for member in lhs_output.members])
+
+        # Parallel branches all get the items: each of their Inputs must be
+        # satisfied on its own
+        if rhs_input.kind == "intersection":
+            return self._all_of([self._verdict(lhs_output, member, rhs_map) for member in rhs_input.members])
+
+        # An Input union accepts the items of any of its members; each
+        # member is checked (and its verdict cached) on its own
+        if rhs_input.kind == "union":
+            verdicts = [self._verdict(lhs_output, member, rhs_map) for member in rhs_input.members]
+            if any(verdict.ok for verdict in verdicts):
+                return Verdict()
+            lines = [f"Stream mismatch: '{lhs_output.name}' matches no member of Input '{rhs_input.name}'."]
+            for member, verdict in zip(rhs_input.members, verdicts):
+                for error in verdict.errors:
+                    reason = error.removeprefix("Stream mismatch: ").replace("\n", "\n  ")
+                    lines.append(f"  {member.name}: {reason}")
+            return Verdict(errors=("\n".join(lines),))
 
-        # 2. Handle 'Any'
-        if rhs_input.fullname == 'typing.Any':
-            return rhs_type
+        if lhs_output.kind == "batch" or rhs_input.kind == "batch":
+            return self._batch_verdict(lhs_output, rhs_input, rhs_map)
 
         # 3. Nominal Subtype Check (Inheritance)
         # Useful if not using TypedDicts, or if one inherits from the other
-        lhs_out_inst = Instance(lhs_output, [])
-        rhs_in_inst = Instance(rhs_input, [])
-        if is_subtype(lhs_out_inst, rhs_in_inst):
-            return rhs_type
+        if self._nominal_check(lhs_output, rhs_input):
+            return Verdict()
 
         # 4. TypedDict Structural Check
-        if lhs_output.typeddict_type is None or rhs_input.typeddict_type is None:
+        if not lhs_output.is_typeddict or not rhs_input.is_typeddict:
             # If we are here, nominal check failed and one isn't a TypedDict.
             # We fail because we cannot perform structural comparison on non-TypedDicts.
-            ctx.api.fail(
-                f"Stream mismatch: Cannot compose '{lhs_output.name}' into '{rhs_input.name}' "
-                "(types match neither by inheritance nor TypedDict structure).",
-                ctx.context
+            return Verdict(
+                errors=(
+                    f"Stream mismatch: Cannot compose '{lhs_output.name}' into '{rhs_input.name}' "
+                    "(types match neither by inheritance nor TypedDict structure).",
+                ),
+                keep_default_return=True,
             )
-            return ctx.default_return_type
-        
-        # Prepare generic mappings for the RHS (Input)
-        rhs_map = dict(zip(rhs_type.type.type_vars, rhs_type.args))
-        
-        # KEY FIX: Iterate over RHS (Requirements), not LHS (Available)
-        # We need to ensure every key required by RHS exists in LHS.
-        required_inputs = rhs_input.typeddict_type.items
-        available_outputs = lhs_output.typeddict_type.items
-        
-        for key, type_r in required_inputs.items():
-            
-            # Check A: Does the Output have the required key?
-            type_l = available_outputs.get(key)
-            if type_l is None:
-                ctx.api.fail(
-                    f"Stream mismatch: Input expects key '{key}', but Output does not provide it.",
-                    ctx.context
-                )
-                return AnyType(TypeOfAny.from_error)
+        return self._structural_check(lhs_output, rhs_input, rhs_map)
 
-            # Check B: Are the types compatible?
-            expected_type = expand_type(type_r, rhs_map)
-            
-            if not is_subtype(type_l, expected_type):
-                ctx.api.fail(
+    @staticmethod
+    def _all_of(verdicts: list[Verdict]) -> Verdict:
+        errors: list[str] = []
+        keep_default_return = False
+        for verdict in verdicts:
+            errors.extend(error for error in verdict.errors if error not in errors)
+            keep_default_return = keep_default_return or verdict.keep_default_return
+        return Verdict(errors=tuple(errors), keep_default_return=keep_default_return and bool(errors))
+
+    @staticmethod
+    def _nominal_check(lhs_output: StreamSchema, rhs_input: StreamSchema) -> bool:
+        lhs_info, rhs_info = lhs_output.info, rhs_input.info
+        return lhs_info is not None and rhs_info is not None and is_subtype(Instance(lhs_info, []), Instance(rhs_info, []))
+
+    def _structural_check(self, lhs_output: StreamSchema, rhs_input: StreamSchema, rhs_map: dict[TypeVarId, MypyType]) -> Verdict:
+        errors = []
+        for key, problem, type_l, expected_type in self._key_problems(lhs_output, rhs_input, rhs_map):
+            if problem == "missing":
+                errors.append(f"Stream mismatch: Input expects key '{key}', but Output does not provide it.")
+            elif problem == "optional":
+                errors.append(
+                    f"Stream mismatch: Input expects key '{key}', but Output may not provide it "
+                    f"(not required in '{lhs_output.name}')."
+                )
+            else:
+                errors.append(
                     f"Stream mismatch: Key '{key}' type mismatch.\n"
                     f"  Expected: {expected_type}\n"
-                    f"  Got:      {type_l}",
-                    ctx.context
+                    f"  Got:      {type_l}"
                 )
-                return AnyType(TypeOfAny.from_error)
-        
-        # If we survive the loop, the types are compatible.
-        return rhs_type
-        
-    def _get_type_attribute(self, type_info: TypeInfo, attr_name: str) -> Optional[TypeInfo]:
+        return Verdict(errors=tuple(errors))
+
+    @staticmethod
+    def _key_problems(
+        lhs_output: StreamSchema, rhs_input: StreamSchema, rhs_map: dict[TypeVarId, MypyType], columns: bool = False
+    ) -> Iterator[tuple[str, str, Optional[MypyType], Optional[MypyType]]]:
         """
-        Searches for a class attribute (e.g., 'Input', 'Output') in the class 
-        and its parents, returning the TypeInfo of the value assigned to it.
+        Every key of `rhs_input` that `lhs_output` does not satisfy, in the
+        order of `rhs_input`: "missing" when a required key is absent,
+        "optional" when it is not required in the Output, "type" when the
+        value types do not match. Keys only the Input marks as not required
+        may be absent.
+
+        Batches have a column for every key of their schema, so `columns`
+        skips the "optional" check.
         """
-        
-        # 1. Search the Class and its Parents (MRO)
-        # type_info.get() only checks the class itself. 
+        missing = rhs_input.required_keys - lhs_output.key_set
+        unsure = frozenset() if columns else rhs_input.required_keys & lhs_output.optional_keys
+        shared = rhs_input.key_set & lhs_output.key_set
+        if not missing and not unsure and not shared:
+            return
+        expected = rhs_input.expanded_items(rhs_map)
+        available = lhs_output.items if shared else {}
+        for key in rhs_input.keys:
+            if key in missing:
+                yield key, "missing", None, None
+            elif key in unsure:
+                yield key, "optional", available[key], expected[key]
+            elif key in shared and not is_subtype(available[key], expected[key]):
+                yield key, "type", available[key], expected[key]
+
+    def _batch_verdict(self, lhs_output: StreamSchema, rhs_input: StreamSchema, rhs_map: dict[TypeVarId, MypyType]) -> Verdict:
+        """
+        Batches only go into batches. Their columns are compared like the keys
+        of items, with the dtype of each column in the messages.
+        """
+        if lhs_output.kind != rhs_input.kind:
+            if lhs_output.kind == "batch":
+                adapter = "split them with Unbatcher()"
+                got, expected = f"batches of '{lhs_output.members[0].name}'", f"single items of '{rhs_input.name}'"
+            else:
+                adapter = "group them with Batcher(size=...)"
+                got, expected = f"single items of '{lhs_output.name}'", f"batches of '{rhs_input.members[0].name}'"
+            return Verdict(errors=(f"Stream mismatch: Output emits {got} but Input expects {expected}; {adapter}.",))
+
+        lhs_items, rhs_items = lhs_output.members[0], rhs_input.members[0]
+        if not lhs_items.is_typeddict or not rhs_items.is_typeddict:
+            return self._verdict(lhs_items, rhs_items, rhs_map)
+        errors = []
+        for key, problem, type_l, expected_type in self._key_problems(lhs_items, rhs_items, rhs_map, columns=True):
+            if problem == "missing":
+                errors.append(f"Stream mismatch: Input expects column '{key}', but Output does not provide it.")
+            elif type_l is not None and expected_type is not None:
+                errors.append(
+                    f"Stream mismatch: Column '{key}' type mismatch.\n"
+                    f"  Expected: {column_dtype(expected_type)} ({expected_type})\n"
+                    f"  Got:      {column_dtype(type_l)} ({type_l})"
+                )
+        return Verdict(errors=tuple(errors))
+
+    def _resolve_term(self, type_info: TypeInfo) -> ResolvedTerm:
+        """
+        Returns the Input and Output schemas of a term class, memoized per
+        TypeInfo until the term or a class declaring its schemas changes.
+
+        Schemas come from the metadata stored by `_store_term_metadata` when
+        there is one, and from the attributes of the class otherwise.
+        """
+        cached = self._term_cache.get(type_info.fullname)
+        if cached is not None and cached.is_valid_for(type_info):
+            self.term_cache_stats.hits += 1
+            return cached
+
+        self.term_cache_stats.misses += 1
+        metadata = type_info.metadata.get(METADATA_KEY)
+        if metadata is not None and metadata.get("version") != METADATA_VERSION:
+            metadata = None
+
+        settled = True
+        schemas: dict[str, Optional[StreamSchema]] = {}
+        for attr_name in ("Input", "Output"):
+            if metadata is not None and attr_name.lower() in metadata:
+                self.metadata_stats.hits += 1
+                data = metadata[attr_name.lower()]
+                schemas[attr_name] = None if data is None else self._schema_from_data(data)
+                continue
+
+            self.metadata_stats.misses += 1
+            schemas[attr_name] = self._attribute_schema(type_info, attr_name)
+            # An attribute whose type has not been inferred yet resolves to None for now,
+            # but not for good: leave it out of the cache so that we look again next time.
+            settled = settled and self._is_settled(type_info, attr_name)
+
+        behavior = behaviors.lookup(type_info) or self._schema_behavior(schemas["Input"], schemas["Output"])
+        # Circuits store their producer and whether they start at a source
+        circuit = metadata if metadata is not None and "producer" in metadata else None
+        resolved = ResolvedTerm(
+            token=mro_token(type_info),
+            schema_token=schema_token(schemas["Input"], schemas["Output"]),
+            input=schemas["Input"],
+            output=schemas["Output"],
+            behavior=behavior,
+            cost=Cost.from_data(None if metadata is None else metadata.get("cost"), type_info.name),
+            producer=circuit["producer"] if circuit is not None else type_info.fullname,
+            run=self._run_of(type_info, metadata, behavior),
+            source=circuit.get("source", False) if circuit is not None else type_info.has_base(SOURCE_TERM_FULLNAME),
+        )
+        if settled:
+            self._term_cache[type_info.fullname] = resolved
+        return resolved
+
+    @staticmethod
+    def _schema_behavior(input: Optional[StreamSchema], output: Optional[StreamSchema]) -> Optional[TermBehavior]:
+        """
+        The behavior of a term generic in its schema: `Input: type[S]` with
+        `Output: type[S]` passes items through, without an Output it ends the
+        stream. With any other Output it is a regular term accepting any Input.
+        """
+        if input is None or input.kind != "var":
+            return None
+        if output is None:
+            return TermBehavior(Behavior.SINK)
+        if output.fullname == input.fullname:
+            return TermBehavior(Behavior.IDENTITY)
+        return None
+
+    @staticmethod
+    def _run_of(type_info: TypeInfo, metadata: Optional[JsonDict], behavior: Optional[TermBehavior]) -> tuple[str, ...]:
+        if metadata is not None and "producer" in metadata:
+            return tuple(metadata.get("run", ()))
+        if (
+            type_info.has_base(FUNCTION_TERM_FULLNAME)
+            and not type_info.has_base(STATEFUL_TERM_FULLNAME)
+            and behavior is None
+        ):
+            return (type_info.fullname,)
+        return ()
+
+    def _is_settled(self, type_info: TypeInfo, attr_name: str) -> bool:
+        sym = self._lookup_attribute(type_info, attr_name)
+        return sym is None or not isinstance(sym.node, Var) or sym.node.type is not None
+
+    def _report_cache_stats(self) -> None:
+        print(f"Logicsponge Plugin: Input/Output cache {self.term_cache_stats}", file=sys.stderr)
+        print(f"Logicsponge Plugin: schemas from metadata {self.metadata_stats}", file=sys.stderr)
+        print(
+            f"Logicsponge Plugin: verdict cache {self._verdict_cache.stats}, "
+            f"size={len(self._verdict_cache)}/{self._verdict_cache.maxsize}, "
+            f"evictions={self._verdict_cache.evictions}",
+            file=sys.stderr,
+        )
+        print(f"Logicsponge Plugin: type argument solutions {self.solution_stats}", file=sys.stderr)
+        print(f"Logicsponge Plugin: schema interning {self.interner}", file=sys.stderr)
+        for group in self.interner.shared()[:5]:
+            print(f"Logicsponge Plugin:   same shape: {', '.join(group)}", file=sys.stderr)
+
+    def _write_profile(self) -> None:
+        assert self.profiler is not None
+        caches = {
+            "Input/Output": self.term_cache_stats,
+            "schemas from metadata": self.metadata_stats,
+            "verdicts": self._verdict_cache.stats,
+            "type argument solutions": self.solution_stats,
+        }
+        try:
+            self.profiler.write(caches, sys.stderr)
+        except OSError as e:
+            print(f"Warning: Could not write the profile: {e}", file=sys.stderr)
+
+    @staticmethod
+    def _lookup_attribute(type_info: TypeInfo, attr_name: str) -> Optional[SymbolTableNode]:
         # We iterate MRO to find inherited attributes.
-        sym = None
         for base in type_info.mro:
-            sym = base.get(attr_name)
+            sym = base.names.get(attr_name)
             if sym:
-                break
+                return sym
+        return None
+
+    def _get_type_attribute(self, type_info: TypeInfo, attr_name: str) -> Optional[MypyType]:
+        """
+        Searches for a class attribute (e.g., 'Input', 'Output') in the class 
+        and its parents, returning the type it declares (see `_normalize_schema`).
+        """
+        
+        # 1. Search the Class and its Parents (MRO)
+        sym = self._lookup_attribute(type_info, attr_name)
                 
         if not sym or not sym.node:
             # Debug tip: If this hits, the line 'Output = ...' is missing from your python code.
@@ -217,101 +2685,83 @@ class StreamPlugin(Plugin):
         # class Hello(...):
         #     class Output(TypedDict): ...
         if isinstance(node, TypeInfo):
-            print("\tOutput/Input attribute is a TypeInfo.")
-            return node
+            log.debug("schema_attribute", term=type_info.fullname, attr=attr_name, kind="TypeInfo")
+            instance = fill_typevars(node)
+            return instance if isinstance(instance, Instance) else Instance(node, [])
         
         # CASE B: It is a Type Alias
         if isinstance(node, TypeAlias):
-            print("\tOutput/Input attribute is a TypeAlias.")
-            print(f"{node = }")
-
-            return None
+            log.debug("schema_attribute", term=type_info.fullname, attr=attr_name, kind="TypeAlias", target=node.target)
+            return node.target
         
         # CASE C: It is a Decorator
         if isinstance(node, Decorator):
-            print("\tOutput/Input attribute is a Decorator.")
+            log.debug("schema_attribute", term=type_info.fullname, attr=attr_name, kind="Decorator", type=node.type)
 
             if not isinstance(node.type, CallableType):
-                print(f"Decorator type is not a CallableType : {type(node.type)}")
-                return None
-            
-            print(f"Decorator type is CallableType: {node.type}")
-            ret_type = get_proper_type(node.type.ret_type)
-            print(f"\tRet_type is {ret_type}")
-            if not isinstance(ret_type, TypeType):
-                print("\tOutput/Input attribute does not reference a class")
+                log.debug("schema_unresolved", term=type_info.fullname, attr=attr_name, reason="decorator is not callable")
                 return None
             
-            item_type = get_proper_type(ret_type.item)
-            print(f"Decorator return type is TypeType: {ret_type.item} ({item_type})")
-            print(type(item_type)) # mypy.types.TypedDictType
-
-            if isinstance(item_type, Instance):
-                return item_type.type
-            elif isinstance(item_type, TypedDictType):
-                return item_type.fallback.type
-            else:
-                print("Stream mismatch: Output/Input attribute does not reference a class.")
-                return None
+            item_type = self._type_item(node.type.ret_type)
+            if item_type is None:
+                log.debug("schema_unresolved", term=type_info.fullname, attr=attr_name, reason="does not reference a class")
+            return item_type
 
         # CASE D: It is a variable assignment
         # class Hello(...):
         #     Output = HelloMsg
         if not isinstance(node, Var):
-            print("\tOutput/Input attribute is not of type 'Type[...]'.")
-            print(f"{type(node) = }\n{node = }")
+            log.debug("schema_unresolved", term=type_info.fullname, attr=attr_name, reason="unsupported node", node=type(node).__name__)
             return None
         
         # Unwrap the variable's type
         # The type of the variable 'Output' is 'Type[HelloMsg]'
         var_type = get_proper_type(node.type)
+        if var_type is None:
+            log.debug("schema_unresolved", term=type_info.fullname, attr=attr_name, reason="type not inferred yet")
+            return None
         
         # SUB-CASE 1: It's a TypeType (e.g. Output: Type[HelloMsg] = ...)
-        if isinstance(var_type, TypeType):
-            item_type = get_proper_type(var_type.item)
-            if isinstance(item_type, Instance):
-                return item_type.type
-            else:
-                print("\tOutput/Input attribute does not reference a class.")
-                return None
+        item_type = self._type_item(var_type)
+        if item_type is not None:
+            return item_type
 
         # SUB-CASE 2: It's a Callable (e.g. Output = HelloMsg)
         # Mypy treats the class symbol 'HelloMsg' as its constructor.
         if isinstance(var_type, CallableType):
             # We want the return type of the constructor: "-> HelloMsg"
-            ret_type = get_proper_type(var_type.ret_type)
-            if isinstance(ret_type, Instance):
-                return ret_type.type
-            elif isinstance(ret_type, TypedDictType):
-                return ret_type.fallback.type
-            else:
-                print("\tOutput/Input attribute does not reference a class.")
-                print(f"{type(ret_type) = }\n{ret_type = }")
-                return None
+            return var_type.ret_type
         
         # SUB-CASE 3: Legacy Instance check (fallback)
         if isinstance(var_type, Instance):
             
             if var_type.type.fullname != 'builtins.type':
-                print("\tOutput/Input attribute is not of type 'Type[...]'.")
+                log.debug("schema_unresolved", term=type_info.fullname, attr=attr_name, reason="not of type 'Type[...]'")
                 return None
 
             # The argument to Type[...] is the actual class (HelloMsg)
             if not var_type.args:
-                print("\tOutput/Input attribute has no type arguments.")
+                log.debug("schema_unresolved", term=type_info.fullname, attr=attr_name, reason="no type arguments")
                 return None
 
-            actual_type = get_proper_type(var_type.args[0])
-            if isinstance(actual_type, Instance):
-                return actual_type.type
-            else:
-                print("\tOutput/Input attribute does not reference a class.")
-                return None
+            return var_type.args[0]
             
-        print("\tOutput/Input attribute is nor TypeType nor Instance.")
-        print(f"{type(var_type) = }\n{var_type = }")
+        log.debug("schema_unresolved", term=type_info.fullname, attr=attr_name, reason="neither TypeType nor Instance", type=var_type)
+        return None
+
+    @staticmethod
+    def _type_item(typ: MypyType) -> Optional[MypyType]:
+        """
+        `X` for `type[X]`. Mypy normalizes `type[A | B]` to `type[A] | type[B]`.
+        """
+        proper = get_proper_type(typ)
+        if isinstance(proper, TypeType):
+            return proper.item
+        if isinstance(proper, UnionType):
+            items = [get_proper_type(item) for item in proper.items]
+            if all(isinstance(item, TypeType) for item in items):
+                return UnionType([item.item for item in items if isinstance(item, TypeType)])
         return None
 
 def plugin(version: str) -> type[Plugin]:
-    print(f"StreamPlugin loaded for mypy version {version} and python version {sys.version}")
     return StreamPlugin
\ No newline at end of file
@@ -0,0 +1,815 @@
+"""
+Runtime companion of the plugin: checks that terms really emit what their
+`Output` declares.
+
+The plugin trusts `Output`; `validated` confirms it on live items. Every
+schema is compiled once into a specialized function (one `isinstance` per
+key, no walk over the type hints), and the check can be limited to every
+Nth item and to a share of the term's own running time:
+
+    @validated(every=10, budget=0.05)
+    class Scale(ls.FunctionTerm):
+        Input = Reading
+        Output = Scaled
+        ...
+
+Terms whose edges the plugin proved compatible can also exchange compact
+records instead of dicts: `record_type` generates a `__slots__` class per
+schema and `ColumnBlock` stores a batch of items column by column, and
+`Project` drops the keys the plugin's projection plan found unread, and
+`fuse` runs a chain of FunctionTerms as a single term. `Batch[Schema]`
+declares items holding NumPy columns, which `Batcher` and `Unbatcher`
+convert from and to single items.
+
+`load_topology` reads the circuit graphs the plugin exports
+(`topology_dir`), for tools that place terms without building circuits.
+"""
+from __future__ import annotations
+from typing import (
+    Annotated, Any, Callable, Generic, Iterator, Literal, NewType, NotRequired, Optional,
+    Required, TypeVar, Union, get_args, get_origin, get_type_hints, is_typeddict,
+)
+from array import array
+from dataclasses import dataclass
+import abc
+import collections.abc
+import functools
+import json
+import os
+import time
+import types
+
+import logicsponge.core as ls
+
+__all__ = [
+    "SchemaError", "Validator", "ValidationStats", "validator_for", "validated", "validation_stats",
+    "Record", "record_type", "ColumnBlock",
+    "Batch", "column_dtypes", "to_columns", "Batcher", "Unbatcher",
+    "Project", "load_projection_plan", "Fused", "fuse",
+    "TopologyNode", "CircuitGraph", "Topology", "load_topology", "load_topologies",
+]
+
+T = TypeVar("T", bound=type)
+S = TypeVar("S")
+
+# Sentinel for optional keys, in the namespace of the generated code
+_MISSING = object()
+
+
+# --- Validators ---
+
+
+class SchemaError(TypeError):
+    """
+    An item does not match the schema its term declares.
+    """
+
+    def __init__(self, term: str, schema: type, problems: list[str]) -> None:
+        self.term = term
+        self.schema = schema
+        self.problems = problems
+        super().__init__(f"{term} emitted an item that does not match {schema.__name__}: {'; '.join(problems)}")
+
+
+def _schema_keys(schema: type) -> Iterator[tuple[str, Any, bool]]:
+    """
+    The keys of a TypedDict with their value types, and whether they are required.
+
+    `__required_keys__` misses NotRequired/Required when the annotations are
+    strings (`from __future__ import annotations`), so we read the qualifiers
+    from the hints.
+    """
+    required_keys: frozenset[str] = getattr(schema, "__required_keys__", frozenset())
+    for key, tp in get_type_hints(schema, include_extras=True).items():
+        required = key in required_keys
+        while get_origin(tp) in (Annotated, NotRequired, Required):
+            if get_origin(tp) is NotRequired:
+                required = False
+            elif get_origin(tp) is Required:
+                required = True
+            tp = get_args(tp)[0]
+        yield key, tp, required
+
+
+def _data(item: Any) -> Any:
+    # DataItem wraps a frozendict; reading it directly saves a Python-level
+    # __getitem__ per key
+    return getattr(item, "_data", item)
+
+
+class _Compiler:
+    """
+    Turns a type into a Python expression that is true when a value has that
+    type, binding the objects the expression needs in `namespace`.
+    """
+
+    def __init__(self) -> None:
+        self.namespace: dict[str, Any] = {"_MISSING": _MISSING, "_data": _data}
+        self._depth = 0
+
+    def bind(self, value: Any) -> str:
+        name = f"_c{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def expression(self, tp: Any, var: str) -> Optional[str]:
+        """
+        None means that any value is accepted.
+        """
+        if tp is Any or tp is object or isinstance(tp, (TypeVar, str)):
+            return None
+        if tp is None or tp is type(None):
+            return f"{var} is None"
+        if isinstance(tp, NewType):
+            return self.expression(tp.__supertype__, var)
+        if is_typeddict(tp):
+            # Bound as a validator: a recursive schema refers to one still being built
+            return f"{self.bind(validator_for(tp))}.check({var})"
+
+        origin, args = get_origin(tp), get_args(tp)
+        if origin is Annotated:
+            return self.expression(args[0], var)
+        if origin is Union or origin is types.UnionType:
+            members = [self.expression(arg, var) for arg in args]
+            if any(member is None for member in members):
+                return None
+            return "(" + " or ".join(f"({member})" for member in members) + ")"
+        if origin is Literal:
+            try:
+                return f"{var} in {self.bind(frozenset(args))}"
+            except TypeError:
+                return f"{var} in {self.bind(args)}"
+        if tp is float:
+            return f"isinstance({var}, {self.bind((int, float))})"
+        if tp is complex:
+            return f"isinstance({var}, {self.bind((int, float, complex))})"
+        if isinstance(tp, type):
+            return f"isinstance({var}, {self.bind(tp)})"
+        if not isinstance(origin, type):
+            return None
+
+        check = f"isinstance({var}, {self.bind(origin)})"
+        if origin is tuple and args and args[-1] is not Ellipsis:
+            elements = [self.expression(arg, f"{var}[{i}]") for i, arg in enumerate(args)]
+            return " and ".join([check, f"len({var}) == {len(args)}"] + [e for e in elements if e is not None])
+        if issubclass(origin, collections.abc.Mapping) and len(args) == 2:
+            return self._all(check, f"{var}.items()", args, "_k{0}, _v{0}")
+        if issubclass(origin, collections.abc.Iterable) and args:
+            return self._all(check, var, args[:1], "_e{0}")
+        return check
+
+    def _all(self, check: str, iterable: str, args: tuple[Any, ...], targets: str) -> str:
+        self._depth += 1
+        names = targets.format(self._depth).split(", ")
+        elements = [self.expression(arg, name) for arg, name in zip(args, names)]
+        self._depth -= 1
+        if all(element is None for element in elements):
+            return check
+        condition = " and ".join(f"({e})" for e in elements if e is not None)
+        return f"{check} and all({condition} for {targets.format(self._depth + 1)} in {iterable})"
+
+
+class Validator:
+    """
+    Checks items against one TypedDict schema with generated code.
+
+    `check` answers with a bool and is what the sampled hot path runs; the
+    exact problems are only worked out (`problems`) once an item failed.
+    """
+
+    def __init__(self, schema: type) -> None:
+        self.schema = schema
+        compiler = _Compiler()
+        lines = ["def check(item):", "    item = _data(item)", "    try:"]
+        conditions = []
+        self._key_checks: list[tuple[str, bool, Callable[[Any], bool]]] = []
+        for i, (key, tp, required) in enumerate(_schema_keys(schema)):
+            expression = compiler.expression(tp, f"v{i}")
+            if required:
+                lines.append(f"        v{i} = item[{key!r}]")
+                if expression is not None:
+                    conditions.append(expression)
+            else:
+                lines.append(f"        v{i} = item.get({key!r}, _MISSING)")
+                if expression is not None:
+                    conditions.append(f"(v{i} is _MISSING or {expression})")
+            key_check = eval(f"lambda v{i}: {expression or 'True'}", compiler.namespace)
+            self._key_checks.append((key, required, key_check))
+        lines += ["    except (KeyError, TypeError, AttributeError):", "        return False"]
+        lines.append(f"    return {' and '.join(f'({c})' for c in conditions) or 'True'}")
+
+        self.source = "\n".join(lines)
+        exec(compile(self.source, f"<validator {schema.__qualname__}>", "exec"), compiler.namespace)
+        self.check: Callable[[Any], bool] = compiler.namespace["check"]
+
+    def problems(self, item: Any) -> list[str]:
+        """
+        Every missing and mistyped key of `item`.
+        """
+        data = _data(item)
+        if not hasattr(data, "get"):
+            return [f"expected a mapping, got {type(item).__name__}"]
+        problems = []
+        for key, required, key_check in self._key_checks:
+            value = data.get(key, _MISSING)
+            if value is _MISSING:
+                if required:
+                    problems.append(f"missing key {key!r}")
+            elif not key_check(value):
+                problems.append(f"key {key!r} has a value of type {type(value).__name__}")
+        return problems
+
+    def __call__(self, item: Any, term: str = "item") -> None:
+        if not self.check(item):
+            raise SchemaError(term, self.schema, self.problems(item) or ["invalid item"])
+
+
+_validators: dict[type, Validator] = {}
+
+
+def validator_for(schema: type) -> Validator:
+    """
+    The validator of a TypedDict schema, generated on first use.
+    """
+    validator = _validators.get(schema)
+    if validator is None:
+        validator = Validator.__new__(Validator)
+        # Registered before it is built, so that a recursive schema finds it
+        _validators[schema] = validator
+        try:
+            validator.__init__(schema)  # type: ignore[misc]
+        except BaseException:
+            del _validators[schema]
+            raise
+    return validator
+
+
+@dataclass
+class ValidationStats:
+    """
+    What the validation of a term class did, and what it cost.
+
+    Only the items due for a check (every Nth) are timed, so `term_s` is the
+    time the term spent on those.
+    """
+    every: int = 1
+    sampled: int = 0
+    checked: int = 0
+    # Sampled items left unchecked to stay within the budget
+    over_budget: int = 0
+    failures: int = 0
+    term_s: float = 0.0
+    check_s: float = 0.0
+
+    @property
+    def overhead(self) -> float:
+        """
+        Time spent checking relative to the time spent in the term, over all items.
+        """
+        return self.check_s / (self.term_s * self.every) if self.term_s else 0.0
+
+
+class _Sampler:
+    """
+    Decides which items to check. The items in between only pay for a
+    countdown: no clock is read for them.
+    """
+
+    def __init__(self, every: int, budget: Optional[float]) -> None:
+        self.countdown = every
+        self.budget = budget
+        self.stats = ValidationStats(every=every)
+        # Validator of the last Output seen, which is the class attribute more often than not
+        self._schema: Any = None
+        self._validator: Optional[Validator] = None
+
+    def check(self, term: Any, item: Any, term_s: float) -> None:
+        stats = self.stats
+        self.countdown = stats.every
+        stats.sampled += 1
+        stats.term_s += term_s
+        if self.budget is not None and stats.check_s > self.budget * stats.term_s * stats.every:
+            stats.over_budget += 1
+            return
+        schema: Any = getattr(term, "Output", None)
+        if schema is not self._schema:
+            self._schema = schema
+            self._validator = validator_for(schema) if is_typeddict(schema) else None
+        validator = self._validator
+        if item is None or validator is None:
+            return
+        start = time.perf_counter()
+        ok = validator.check(item)
+        stats.check_s += time.perf_counter() - start
+        stats.checked += 1
+        if not ok:
+            stats.failures += 1
+            validator(item, term=type(term).__name__)
+
+
+def validated(cls: Optional[T] = None, *, every: int = 1, budget: Optional[float] = None) -> Any:
+    """
+    Class decorator checking the items a FunctionTerm (`f`) or a SourceTerm
+    (`generate`) emits against its `Output`, raising SchemaError on a mismatch.
+
+    Only every `every`-th item is checked. With a `budget`, checks are also
+    skipped while they took more than that share of the time spent in the
+    term itself (0.05: at most 5% overhead).
+    """
+    if every < 1:
+        raise ValueError("every must be at least 1")
+
+    def decorate(cls: T) -> T:
+        sampler = _Sampler(every, budget)
+        if hasattr(cls, "generate"):
+            generate = cls.generate
+
+            @functools.wraps(generate)
+            def wrapped_generate(self: Any, *args: Any, **kwargs: Any) -> Iterator[Any]:
+                iterator = generate(self, *args, **kwargs)
+                while True:
+                    sampler.countdown -= 1
+                    if sampler.countdown:
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                    else:
+                        start = time.perf_counter()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                        sampler.check(self, item, time.perf_counter() - start)
+                    yield item
+
+            cls.generate = wrapped_generate
+        else:
+            f = cls.f  # type: ignore[attr-defined]
+
+            @functools.wraps(f)
+            def wrapped_f(self: Any, di: Any) -> Any:
+                sampler.countdown -= 1
+                if sampler.countdown:
+                    return f(self, di)
+                start = time.perf_counter()
+                item = f(self, di)
+                sampler.check(self, item, time.perf_counter() - start)
+                return item
+
+            cls.f = wrapped_f  # type: ignore[attr-defined]
+        cls.__validation_stats__ = sampler.stats  # type: ignore[attr-defined]
+        return cls
+
+    return decorate if cls is None else decorate(cls)
+
+
+def validation_stats(term: Any) -> ValidationStats:
+    """
+    The stats of a term class decorated with `validated`, or of its instance.
+    """
+    cls = term if isinstance(term, type) else type(term)
+    stats: Optional[ValidationStats] = getattr(cls, "__validation_stats__", None)
+    if stats is None:
+        raise TypeError(f"{cls.__name__} is not decorated with @validated")
+    return stats
+
+
+# --- Records ---
+
+# array typecodes of the required keys ColumnBlock packs; bools stay in lists,
+# where they take no more room than an array index
+NUMERIC_TYPECODES = {int: "q", float: "d"}
+
+
+class Record(abc.ABC):
+    """
+    Base of the classes `record_type` generates: one slot per key of the
+    schema instead of a dict. Keys need not be identifiers ("p-value"), so
+    slots are numbered and `record["p-value"]` works like on a DataItem.
+    """
+    __slots__ = ()
+    schema: type
+    keys: tuple[str, ...]
+    _slots: dict[str, str]
+
+    @abc.abstractmethod
+    def to_dict(self) -> dict[str, Any]:
+        ...
+
+    def to_item(self) -> ls.DataItem:
+        return ls.DataItem(self.to_dict())
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, self._slots[key])
+        except (KeyError, AttributeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots and hasattr(self, self._slots[key])
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Record):
+            return NotImplemented
+        return self.schema is other.schema and self.to_dict() == other.to_dict()
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def _generate_record(schema: type) -> type[Record]:
+    # Required keys first, so that the optional ones can default to missing
+    keys = sorted(_schema_keys(schema), key=lambda key: not key[2])
+    slots = {key: f"_{i}" for i, (key, _, _) in enumerate(keys)}
+    params = ", ".join(f"{slots[key]}" if required else f"{slots[key]}=_MISSING" for key, _, required in keys)
+    lines = [f"def __init__(self, {params}):" if keys else "def __init__(self):"]
+    for key, _, required in keys:
+        slot = slots[key]
+        if required:
+            lines.append(f"    self.{slot} = {slot}")
+        else:
+            lines.append(f"    if {slot} is not _MISSING: self.{slot} = {slot}")
+    lines.append("    pass")
+
+    lines += ["", "@classmethod", "def from_item(cls, item):", "    d = _data(item)"]
+    args = ", ".join(f"d[{key!r}]" if required else f"d.get({key!r}, _MISSING)" for key, _, required in keys)
+    lines.append(f"    return cls({args})")
+
+    required_keys = ", ".join(f"{key!r}: self.{slots[key]}" for key, _, required in keys if required)
+    lines += ["", "def to_dict(self):", f"    d = {{{required_keys}}}"]
+    for key, _, required in keys:
+        if not required:
+            lines.append(f"    v = getattr(self, {slots[key]!r}, _MISSING)")
+            lines.append(f"    if v is not _MISSING: d[{key!r}] = v")
+    lines.append("    return d")
+
+    namespace: dict[str, Any] = {"_MISSING": _MISSING, "_data": _data}
+    exec(compile("\n".join(lines), f"<record {schema.__qualname__}>", "exec"), namespace)
+    body = {name: namespace[name] for name in ("__init__", "from_item", "to_dict")}
+    body.update(__slots__=tuple(slots.values()), schema=schema, keys=tuple(slots), _slots=slots)
+    body["__qualname__"] = body["__name__"] = f"{schema.__name__}Record"
+    return type(f"{schema.__name__}Record", (Record,), body)
+
+
+_records: dict[type, type[Record]] = {}
+
+
+def record_type(schema: type) -> type[Record]:
+    """
+    The record class of a TypedDict schema, generated on first use. Its
+    constructor takes the values in the order of `keys` (the required keys
+    of the schema, then the others), and
+    `from_item`/`to_item` convert from and to DataItem.
+    """
+    record = _records.get(schema)
+    if record is None:
+        record = _records[schema] = _generate_record(schema)
+    return record
+
+
+class ColumnBlock:
+    """
+    A batch of items of one schema, stored column by column: required int
+    and float keys in arrays (8 bytes per value, instead of a pointer to a
+    boxed number), the other keys in lists. Ints beyond 64 bits do not fit.
+    """
+
+    def __init__(self, schema: type) -> None:
+        self.schema = schema
+        self.record = record_type(schema)
+        self.columns: dict[str, Any] = {}
+        for key, tp, required in sorted(_schema_keys(schema), key=lambda key: not key[2]):
+            typecode = NUMERIC_TYPECODES.get(tp) if required else None
+            self.columns[key] = array(typecode) if typecode else []
+        self._length = 0
+
+        # One append per column, without looping over the keys
+        lines = ["def append(item):", "    d = _data(item)"]
+        namespace: dict[str, Any] = {"_MISSING": _MISSING, "_data": _data}
+        for i, (key, column) in enumerate(self.columns.items()):
+            namespace[f"_a{i}"] = column.append
+            value = f"d.get({key!r}, _MISSING)" if isinstance(column, list) else f"d[{key!r}]"
+            lines.append(f"    _a{i}({value})")
+        exec(compile("\n".join(lines), f"<block {schema.__qualname__}>", "exec"), namespace)
+        self._append: Callable[[Any], None] = namespace["append"]
+
+    @classmethod
+    def from_items(cls, schema: type, items: collections.abc.Iterable[Any]) -> ColumnBlock:
+        block = cls(schema)
+        for item in items:
+            block.append(item)
+        return block
+
+    def append(self, item: Any) -> None:
+        """
+        Appends a DataItem, a dict or a record of the schema.
+        """
+        if isinstance(item, Record):
+            item = item.to_dict()
+        try:
+            self._append(item)
+        except BaseException:
+            # Roll back the columns appended to before the key that failed:
+            # missing, or a value the array of its column does not take
+            # (a float or an int beyond 64 bits in an int column)
+            for column in self.columns.values():
+                del column[self._length:]
+            raise
+        self._length += 1
+
+    def __len__(self) -> int:
+        return self._length
+
+    def column(self, key: str) -> Any:
+        """
+        The values of `key`; items without a value for an optional key have a
+        sentinel in its place, which `records()` leaves out.
+        """
+        return self.columns[key]
+
+    def __getitem__(self, index: int) -> Record:
+        return self.record(*(column[index] for column in self.columns.values()))
+
+    def records(self) -> Iterator[Record]:
+        for values in zip(*self.columns.values()):
+            yield self.record(*values)
+
+    def to_items(self) -> list[ls.DataItem]:
+        return [record.to_item() for record in self.records()]
+
+
+# --- Batches ---
+
+# Dtypes of the columns of a batch, by value type of the schema; the plugin
+# uses the same table (COLUMN_DTYPES)
+COLUMN_DTYPES: dict[Any, str] = {bool: "bool", int: "int64", float: "float64", complex: "complex128", str: "str"}
+
+
+class Batch(Generic[S]):
+    """
+    `Input = Batch[Reading]` declares that each item is a batch of Readings,
+    stored column by column: one NumPy array per key of Reading, with the
+    dtype `column_dtypes` gives it. The plugin only lets batches of
+    compatible schemas into each other; `Batcher` and `Unbatcher` convert
+    between batches and single items.
+    """
+    __slots__ = ()
+
+
+def column_dtypes(schema: type) -> dict[str, str]:
+    """
+    The dtype of each column of a `Batch[schema]`. Optional keys and values
+    of any other type are held in object arrays.
+    """
+    return {
+        key: COLUMN_DTYPES.get(tp, "object") if required else "object"
+        for key, tp, required in _schema_keys(schema)
+    }
+
+
+def to_columns(rows: collections.abc.Sequence[Any], dtypes: Optional[dict[str, str]] = None) -> dict[str, Any]:
+    """
+    The columns of a batch of items. Without `dtypes`, the keys of the first
+    item are taken and NumPy infers the dtypes.
+    """
+    # Only batches need NumPy: validators and records work without it
+    import numpy as np
+
+    if dtypes is None:
+        dtypes = {key: "" for key in _data(rows[0])}
+    data = [_data(row) for row in rows]
+    return {
+        key: np.asarray([row.get(key) for row in data], dtype=dtype or None)
+        for key, dtype in dtypes.items()
+    }
+
+
+class Batcher(ls.StatefulFunctionTerm):
+    """
+    Groups every `size` items into one batch. With `schema`, the columns get
+    the dtypes of its keys. A last batch of fewer than `size` items is not
+    emitted.
+    """
+
+    def __init__(self, *args: Any, size: int, schema: Optional[type] = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if size < 1:
+            raise ValueError("a batch holds at least one item")
+        self.size = size
+        self.dtypes = None if schema is None else column_dtypes(schema)
+        self._rows: list[ls.DataItem] = []
+
+    def f(self, di: ls.DataItem) -> Optional[ls.DataItem]:
+        self._rows.append(di)
+        if len(self._rows) < self.size:
+            return None
+        rows, self._rows = self._rows, []
+        return ls.DataItem(to_columns(rows, self.dtypes))
+
+
+class Unbatcher(ls.FlatMapTerm):
+    """
+    Splits each batch into its items, with Python values rather than NumPy
+    scalars.
+    """
+
+    def f(self, di: ls.DataItem) -> list[ls.DataItem]:
+        import numpy as np
+
+        data = _data(di)
+        columns = [column.tolist() if isinstance(column, np.ndarray) else column for column in data.values()]
+        return [ls.DataItem(dict(zip(data, row))) for row in zip(*columns)]
+
+
+# --- Projection ---
+
+
+def load_projection_plan(path: str) -> dict[str, frozenset[str]]:
+    """
+    Reads the plan the plugin writes with `projection_plan = <path>` and
+    returns, for each term that produces items (by fullname), the keys that
+    some term downstream of it reads.
+    """
+    with open(path) as f:
+        plan = json.load(f)
+    needed: dict[str, set[str]] = {}
+    for module in plan["modules"].values():
+        for edge in module["edges"]:
+            needed.setdefault(edge["producer"], set()).update(edge["needed"])
+    return {producer: frozenset(keys) for producer, keys in needed.items()}
+
+
+class Project(ls.FunctionTerm):
+    """
+    Keeps only the given keys of the items going through. Placed right after
+    the producer, it saves every term downstream from copying the others:
+
+        plan = load_projection_plan("projection_plan.json")
+        Source() * Project(keys=Project.planned(plan, Source)) * Count()
+    """
+
+    def __init__(self, *args: Any, keys: collections.abc.Iterable[str], **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.keys = tuple(keys)
+
+    @staticmethod
+    def planned(plan: dict[str, frozenset[str]], producer: type) -> frozenset[str]:
+        fullname = f"{producer.__module__}.{producer.__qualname__}"
+        try:
+            return plan[fullname]
+        except KeyError:
+            raise KeyError(f"the projection plan has no edge from {fullname}") from None
+
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        data = _data(di)
+        return ls.DataItem({key: data[key] for key in self.keys if key in data})
+
+
+# --- Fusion ---
+
+
+class Fused(ls.FunctionTerm):
+    """
+    One term calling the `f` of a run of FunctionTerms in sequence, instead of
+    handing every item over from term to term.
+    """
+
+    def __init__(self, terms: collections.abc.Sequence[ls.FunctionTerm], *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.terms = tuple(terms)
+        self._functions = tuple(term.f for term in self.terms)
+        for attr_name, term in (("Input", self.terms[0]), ("Output", self.terms[-1])):
+            if hasattr(term, attr_name):
+                setattr(self, attr_name, getattr(term, attr_name))
+
+    def f(self, di: ls.DataItem) -> Optional[ls.DataItem]:
+        for f in self._functions:
+            result = f(di)
+            if result is None:
+                return None
+            di = result
+        return di
+
+    def enter(self) -> None:
+        for term in self.terms:
+            term.enter()
+
+    def exit(self) -> None:
+        for term in reversed(self.terms):
+            term.exit()
+
+
+def fuse(*terms: ls.FunctionTerm, name: Optional[str] = None) -> Fused:
+    """
+    Replaces `a * b * c` by `fuse(a, b, c)`: the same items come out, from one
+    term. Only stateless FunctionTerms can be fused; the plugin lists the runs
+    of them that can be in its plan (`projection_plan`), and checks the Input
+    and Output of adjacent terms in the call like it checks `*`.
+    """
+    if not terms:
+        raise ValueError("fuse() needs at least one term")
+    for term in terms:
+        if not isinstance(term, ls.FunctionTerm) or isinstance(term, ls.StatefulFunctionTerm):
+            raise TypeError(f"only stateless FunctionTerms can be fused, got {type(term).__name__}")
+    return Fused(terms, name=name or "*".join(term.name for term in terms))
+
+
+# --- Topology ---
+
+TOPOLOGY_VERSION = 1
+
+
+@dataclass(frozen=True)
+class TopologyNode:
+    """
+    An operand of a composition: a term instance, or an expression holding a
+    circuit (kind "circuit"). Schemas are as the plugin resolved them:
+    `{"name", "keys", "required"}`, or None when undeclared.
+    """
+    id: int
+    term: str
+    kind: str
+    line: int
+    column: int
+    behavior: Optional[str] = None
+    input: Optional[dict[str, Any]] = None
+    output: Optional[dict[str, Any]] = None
+    cost: Optional[dict[str, Any]] = None
+
+    @property
+    def name(self) -> str:
+        return self.term.rpartition(".")[2]
+
+
+@dataclass(frozen=True)
+class CircuitGraph:
+    """
+    A composition that is not part of a larger one, as node ids: items enter
+    through `entries` and leave from `exits`.
+    """
+    line: int
+    column: int
+    nodes: tuple[int, ...]
+    entries: tuple[int, ...]
+    exits: tuple[int, ...]
+
+
+class Topology:
+    """
+    The circuits of one module, as exported by the plugin.
+    """
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        if data.get("version") != TOPOLOGY_VERSION:
+            raise ValueError(f"unsupported topology version {data.get('version')!r}")
+        self.module: str = data["module"]
+        self.nodes = {node["id"]: TopologyNode(**node) for node in data["nodes"]}
+        self.edges = [(source, target) for source, target in data["edges"]]
+        self.circuits = [
+            CircuitGraph(
+                circuit["line"], circuit["column"],
+                tuple(circuit["nodes"]), tuple(circuit["entries"]), tuple(circuit["exits"]),
+            )
+            for circuit in data["circuits"]
+        ]
+        self._successors: dict[int, list[int]] = {}
+        self._predecessors: dict[int, list[int]] = {}
+        for source, target in self.edges:
+            self._successors.setdefault(source, []).append(target)
+            self._predecessors.setdefault(target, []).append(source)
+
+    def successors(self, node: int) -> list[TopologyNode]:
+        return [self.nodes[target] for target in self._successors.get(node, ())]
+
+    def predecessors(self, node: int) -> list[TopologyNode]:
+        return [self.nodes[source] for source in self._predecessors.get(node, ())]
+
+    def circuit_at(self, line: int) -> Optional[CircuitGraph]:
+        return next((circuit for circuit in self.circuits if circuit.line == line), None)
+
+    def __repr__(self) -> str:
+        return f"Topology({self.module!r}, {len(self.nodes)} nodes, {len(self.circuits)} circuits)"
+
+
+def load_topology(directory: str, module: str) -> Topology:
+    """
+    Reads the graph of `module` from the directory the plugin writes to with
+    `topology_dir = <directory>`.
+    """
+    with open(os.path.join(directory, f"{module}.json")) as f:
+        return Topology(json.load(f))
+
+
+def load_topologies(directory: str) -> dict[str, Topology]:
+    """
+    Reads the graphs of all the modules in the directory, by module name.
+    """
+    topologies = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".json"):
+            topology = load_topology(directory, filename[:-len(".json")])
+            topologies[topology.module] = topology
+    return topologies
@@ -10,6 +10,8 @@ from logicsponge.core.logicsponge import Dump
 class Source(ls.SourceTerm):
     """A simple source."""
 
+    Rate = 0.5
+
     def generate(self) -> Iterator[ls.DataItem]:
         """Generate DataItems with incrementing count."""
         self.state["count"] = 0
@@ -24,6 +26,8 @@ class Source(ls.SourceTerm):
 class Sink(ls.FunctionTerm):
     """A simple sink."""
 
+    Latency = 1.0
+
     def f(self, item: ls.DataItem) -> ls.DataItem:
         """Call on new data."""
         time.sleep(1)
@@ -0,0 +1,64 @@
+# Stubs of logicsponge-core for the mypy plugin, see README.md ("Library stubs").
+# run_flow_graph is declared here so that mypy does not analyse the bytewax backend.
+from logicsponge.core.graph import TermGraph as TermGraph
+from logicsponge.core.logicsponge import (
+    AddIndex as AddIndex,
+    ConstantSourceTerm as ConstantSourceTerm,
+    DataItem as DataItem,
+    DataItemFilter as DataItemFilter,
+    DataStream as DataStream,
+    Delay as Delay,
+    Dump as Dump,
+    FlatMapTerm as FlatMapTerm,
+    Flatten as Flatten,
+    FunctionTerm as FunctionTerm,
+    Id as Id,
+    KeyFilter as KeyFilter,
+    KeyValueFilter as KeyValueFilter,
+    MergeToSingleStream as MergeToSingleStream,
+    ParallelTerm as ParallelTerm,
+    PPrint as PPrint,
+    Print as Print,
+    PrintKeys as PrintKeys,
+    Rename as Rename,
+    SequentialTerm as SequentialTerm,
+    SourceTerm as SourceTerm,
+    State as State,
+    StatefulFunctionTerm as StatefulFunctionTerm,
+    Stop as Stop,
+    Term as Term,
+    parallel as parallel,
+)
+
+def run_flow_graph(graph: TermGraph, *, flow_id: str = "logicsponge", workers: int | None = None) -> list[DataItem]: ...
+
+__all__ = [
+    "AddIndex",
+    "ConstantSourceTerm",
+    "DataItem",
+    "DataItemFilter",
+    "DataStream",
+    "Delay",
+    "Dump",
+    "FlatMapTerm",
+    "Flatten",
+    "FunctionTerm",
+    "Id",
+    "KeyFilter",
+    "KeyValueFilter",
+    "MergeToSingleStream",
+    "PPrint",
+    "ParallelTerm",
+    "Print",
+    "PrintKeys",
+    "Rename",
+    "SequentialTerm",
+    "SourceTerm",
+    "State",
+    "StatefulFunctionTerm",
+    "Stop",
+    "Term",
+    "TermGraph",
+    "parallel",
+    "run_flow_graph",
+]
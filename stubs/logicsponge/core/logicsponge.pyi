@@ -0,0 +1,226 @@
+# Stubs of logicsponge.core.logicsponge for the mypy plugin, see README.md ("Library stubs").
+#
+# Terms that pass items through declare `Input: type[_S]` and `Output: type[_S]`:
+# whatever schema comes in goes out. Stop declares an Input only: nothing comes out.
+# Flatten, MergeToSingleStream and AddIndex depend on the shape of the circuit and on
+# their arguments, the plugin describes them in LIBRARY_TERMS.
+import abc
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Callable as Callable, Iterable, Iterator
+from typing import Any, Generic, Self, TypeVar
+
+_S = TypeVar("_S")
+
+logger: logging.Logger
+State = dict[str, Any]
+
+class LatencyQueue:
+    queue: deque
+    tic_time: float | None
+    def __init__(self, max_size: int = 100) -> None: ...
+    def tic(self) -> None: ...
+    def toc(self) -> None: ...
+    @property
+    def avg(self) -> float: ...
+    @property
+    def max(self) -> float: ...
+
+class DataItem:
+    def __init__(self, data: dict[str, Any] | Self | None = None) -> None: ...
+    @property
+    def time(self) -> float: ...
+    @time.setter
+    def time(self, timestamp: float) -> None: ...
+    def set_time_to_now(self) -> Self: ...
+    def copy(self) -> DataItem: ...
+    def __getitem__(self, key: str) -> Any: ...
+    def __contains__(self, key: str) -> bool: ...
+    def __iter__(self) -> Iterator: ...
+    def __len__(self) -> int: ...
+    def __eq__(self, other: object) -> bool: ...
+    def __hash__(self) -> int: ...
+    def items(self) -> Iterator[tuple[str, Any]]: ...
+    def keys(self) -> Iterator[str]: ...
+    def values(self) -> Iterator[Any]: ...
+    def get(self, key: str, default: Any = None) -> Any: ...
+
+class DataStream:
+    id: str | None
+    label: str | None
+    def __init__(self, owner: Term, label: str | None = None) -> None: ...
+    def append(self, di: DataItem) -> Self: ...
+
+class Term(ABC, metaclass=abc.ABCMeta):
+    name: str
+    id: str | None
+    stats: Any | None
+    def __init__(self, name: str | None = None, **kwargs: Any) -> None: ...
+    def iter_inputs(self) -> dict[str, DataStream]: ...
+    def requires_stateful(self) -> bool: ...
+    def processes_data(self) -> bool: ...
+    def __mul__(self, other: Term) -> SequentialTerm: ...
+    def __or__(self, other: Term) -> ParallelTerm: ...
+    @abstractmethod
+    def start(self, *, persistent: bool = False) -> None: ...
+    @abstractmethod
+    def stop(self) -> None: ...
+    @abstractmethod
+    def join(self) -> None: ...
+    def cancel(self) -> None: ...
+    def connect_output_to(self, target: Term, *, output_name: str | None = None, input_name: str) -> None: ...
+
+class SourceTerm(Term, metaclass=abc.ABCMeta):
+    state: State
+    def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+    @abstractmethod
+    def generate(self) -> Iterator[DataItem]: ...
+    def enter(self) -> None: ...
+    def exit(self) -> None: ...
+    def start(self, *, persistent: bool = False) -> None: ...
+    def stop(self) -> None: ...
+    def join(self) -> None: ...
+
+class ConstantSourceTerm(SourceTerm):
+    def __init__(self, items: list[DataItem], *args: Any, **kwargs: Any) -> None: ...
+    def generate(self) -> Iterator[DataItem]: ...
+
+class FunctionTerm(Term):
+    state: State
+    def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+    def iter_inputs(self) -> dict[str, DataStream]: ...
+    def f(self, di: DataItem) -> DataItem | None: ...
+    def apply(self, di: DataItem) -> list[DataItem]: ...
+    def processes_data(self) -> bool: ...
+    def requires_stateful(self) -> bool: ...
+    def enter(self) -> None: ...
+    def exit(self) -> None: ...
+    def stop(self) -> None: ...
+    def join(self) -> None: ...
+    def start(self, *, persistent: bool = False) -> None: ...
+
+class StatefulFunctionTerm(FunctionTerm):
+    def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+    def requires_stateful(self) -> bool: ...
+
+class FlatMapTerm(Term):
+    state: State
+    def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+    def iter_inputs(self) -> dict[str, DataStream]: ...
+    def f(self, di: DataItem) -> Iterable[DataItem] | None: ...
+    def apply(self, di: DataItem) -> list[DataItem]: ...
+    def processes_data(self) -> bool: ...
+    def enter(self) -> None: ...
+    def exit(self) -> None: ...
+    def stop(self) -> None: ...
+    def join(self) -> None: ...
+    def start(self, *, persistent: bool = False) -> None: ...
+
+class CompositeTerm(Term, metaclass=abc.ABCMeta):
+    term_left: Term
+    term_right: Term
+    def __init__(self, term_left: Term, term_right: Term) -> None: ...
+    def start(self, *, persistent: bool = False) -> None: ...
+    def stop(self) -> None: ...
+    def join(self) -> None: ...
+
+class ParallelTerm(CompositeTerm):
+    def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+
+class SequentialTerm(CompositeTerm):
+    def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+
+class Stop(Term, Generic[_S]):
+    Input: type[_S]
+    def start(self, *, persistent: bool = False) -> None: ...
+    def stop(self) -> None: ...
+    def join(self) -> None: ...
+
+class Flatten(FunctionTerm):
+    level: int | None
+    def __init__(self, *args: Any, level: int | None = 1, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class MergeToSingleStream(FunctionTerm):
+    combine: bool
+    def __init__(self, *args: Any, combine: bool = False, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class KeyValueFilter(FunctionTerm):
+    key_value_filter: Callable[[str, Any], bool] | None
+    def __init__(self, *args: Any, key_value_filter: Callable[[str, Any], bool] | None = None, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class DataItemFilter(FunctionTerm, Generic[_S]):
+    Input: type[_S]
+    Output: type[_S]
+    data_item_filter: Callable[[DataItem], bool] | None
+    def __init__(self, *args: Any, data_item_filter: Callable[[DataItem], bool] | None = None, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem | None: ...
+
+class KeyFilter(KeyValueFilter):
+    keys: None | str | list[str]
+    not_keys: None | str | list[str]
+    def __init__(self, *args: Any, keys: None | str | list[str] = None, not_keys: None | str | list[str] = None, **kwargs: Any) -> None: ...
+
+class Print(FunctionTerm, Generic[_S]):
+    Input: type[_S]
+    Output: type[_S]
+    keys: None | str | list[str]
+    not_keys: None | str | list[str]
+    print_fun: Callable
+    date_to_str: bool
+    def __init__(self, *args: Any, keys: None | str | list[str] = None, print_fun: Callable = ..., date_to_str: bool = False, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class PPrint(Print[_S]):
+    def __init__(self, *args: Any, keys: None | str | list[str] = None, print_fun: Callable = ..., **kwargs: Any) -> None: ...
+
+class PrintKeys(FunctionTerm, Generic[_S]):
+    Input: type[_S]
+    Output: type[_S]
+    print_fun: Callable
+    def __init__(self, *args: Any, print_fun: Callable = ..., **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class Dump(FunctionTerm, Generic[_S]):
+    Input: type[_S]
+    Output: type[_S]
+    print_fun: Callable
+    def __init__(self, *args: Any, print_fun: Callable = ..., **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class Rename(FunctionTerm):
+    fun: Callable[[str], str]
+    def __init__(self, *args: Any, fun: Callable[[str], str] | dict[str, str] = ..., **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class Id(FunctionTerm, Generic[_S]):
+    Input: type[_S]
+    Output: type[_S]
+    def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class AddIndex(FunctionTerm):
+    key: str
+    index: int
+    def __init__(self, *args: Any, key: str, index: int = 0, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class Delay(FunctionTerm, Generic[_S]):
+    Input: type[_S]
+    Output: type[_S]
+    delay_s: float
+    def __init__(self, *args: Any, delay_s: float, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+KT = TypeVar("KT")
+VT = TypeVar("VT")
+
+def merge_dicts(outputs1: dict[KT, VT], outputs2: dict[KT, VT]) -> dict[KT, VT]: ...
+def was_overwritten(f: Callable) -> bool: ...
+def get_annotations(obj: object, method_name: str) -> list | None: ...
+def parallel(li: list[Term]) -> Term: ...
+def flatten_dict(d: dict[str, Any] | DataItem, parent_key: str | None = None, sep: str = '.') -> dict[str, Any]: ...
+def has_callable_signature(func: Any, args: tuple, ret: Any) -> bool: ...
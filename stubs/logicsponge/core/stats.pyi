@@ -0,0 +1,53 @@
+# Stubs of logicsponge.core.stats for the mypy plugin, see README.md ("Library stubs").
+#
+# The keys these terms emit depend on their arguments (`dim`), so they declare no
+# Input/Output: the plugin describes them in LIBRARY_TERMS.
+from typing import Any
+
+import numpy as np
+
+from logicsponge.core.logicsponge import DataItem, FunctionTerm, State
+
+class BaseStatistic(FunctionTerm):
+    dim: int
+    stat_name: str
+    state: State
+    def __init__(self, *args: Any, dim: int = 1, **kwargs: Any) -> None: ...
+    def calculate(self, *args: Any, **kwargs: Any) -> Any: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class Sum(FunctionTerm):
+    key: str
+    def __init__(self, *args: Any, key: str, **kwargs: Any) -> None: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class Mean(BaseStatistic):
+    def calculate(self, values: np.ndarray) -> float: ...
+
+class Std(BaseStatistic):
+    def calculate(self, values: np.ndarray) -> float: ...
+
+class StdHull(BaseStatistic):
+    factor: float
+    def __init__(self, *args: Any, factor: float = 1.0, **kwargs: Any) -> None: ...
+    def calculate(self, values: np.ndarray) -> dict[str, Any]: ...
+
+class TestStatistic(FunctionTerm):
+    arity: int | None
+    dim: int
+    stat_name: str
+    state: State
+    def __init__(self, *args: Any, dim: int = 1, **kwargs: Any) -> None: ...
+    def calculate(self, *args: Any, **kwargs: Any) -> Any: ...
+    def f(self, di: DataItem) -> DataItem: ...
+
+class OneSampleTTest(TestStatistic):
+    mean: float
+    def __init__(self, *args: Any, mean: float = 0.0, **kwargs: Any) -> None: ...
+    def calculate(self, values: np.ndarray) -> dict[str, Any]: ...
+
+class PairedTTest(TestStatistic):
+    def calculate(self, series1: np.ndarray, series2: np.ndarray) -> dict[str, Any]: ...
+
+class KruskalWallis(TestStatistic):
+    def calculate(self, *series: np.ndarray) -> dict[str, Any]: ...
@@ -0,0 +1,160 @@
+from typing import Iterator, NotRequired, TypedDict, reveal_type
+import logicsponge.core as ls
+
+# 1. Circuit types: a composition carries the Input and Output of the circuit
+class A(TypedDict):
+    x: int
+
+class B(TypedDict):
+    y: str
+
+class SourceA(ls.SourceTerm):
+    Output = A
+    def generate(self) -> Iterator[ls.DataItem]:
+        yield ls.DataItem({})
+
+class AtoB(ls.FunctionTerm):
+    Input = A
+    Output = B
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+pipeline = SourceA() * ls.Print() * AtoB()
+# N: Revealed type is "hw7.SequentialTerm[None -> B]"
+reveal_type(pipeline)
+sequential: ls.SequentialTerm = pipeline * ls.Stop()
+# E: Stream mismatch: Input expects key 'x'
+pipeline * AtoB()
+
+class AtoBAgain(AtoB):
+    pass
+
+# Another circuit of the same signature is named alike in messages
+# E: Incompatible types in assignment (expression has type "SequentialTerm[None -> B]", variable has type "int")
+again: int = SourceA() * AtoBAgain()
+
+
+# 2. Parallel branches: `|` produces a product of the branch Outputs, and
+# each branch gets every item of the upstream
+class In(TypedDict):
+    v: int
+
+class OutA(TypedDict):
+    a: str
+
+class OutB(TypedDict):
+    b: float
+
+class OutAB(TypedDict):
+    a: str
+    b: float
+
+class IntV(TypedDict):
+    v: int
+
+class StrV(TypedDict):
+    v: str
+
+class SourceIn(ls.SourceTerm):
+    Output = In
+    def generate(self) -> Iterator[ls.DataItem]:
+        yield ls.DataItem({})
+
+class ToA(ls.FunctionTerm):
+    Input = In
+    Output = OutA
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class ToB(ls.FunctionTerm):
+    Input = In
+    Output = OutB
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class UseAB(ls.FunctionTerm):
+    Input = OutAB
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class UseA(ls.FunctionTerm):
+    Input = OutA
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class UseInt(ls.FunctionTerm):
+    Input = IntV
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class UseStr(ls.FunctionTerm):
+    Input = StrV
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class Untyped(ls.FunctionTerm):
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+# N: Revealed type is "hw7.ParallelTerm[In -> product[OutA, OutB, OutA]]"
+reveal_type(ToA() | ToB() | ToA())
+SourceIn() * (ToA() | ToB()) * ls.MergeToSingleStream(combine=True) * UseAB()
+SourceIn() * (ToA() | ToB()) * ls.Flatten() * UseAB()
+SourceIn() * (ToA() | ToA()) * ls.MergeToSingleStream() * UseA()
+# E: Stream mismatch: Input expects key 'a'
+SourceIn() * (ToA() | ToB()) * ls.MergeToSingleStream() * UseA()
+# Whatever the order of the branches
+# E: Stream mismatch: Key 'v' type mismatch.
+# E: Stream mismatch: Parallel branches expect key 'v' with conflicting types.
+SourceIn() * (UseStr() | UseInt())
+# E: Stream mismatch: Key 'v' type mismatch.
+# E: Stream mismatch: Parallel branches expect key 'v' with conflicting types.
+SourceIn() * (UseInt() | UseStr())
+# E: No Input type found on branch "Untyped" of parallel composition.
+SourceIn() * (ToA() | Untyped())
+# Library terms take any items
+SourceIn() * (ToA() | ls.Print())
+
+
+# 3. Every missing and mistyped key is reported at once, honouring
+# NotRequired and total=False
+class Out(TypedDict):
+    a: str
+    c: int
+    note: NotRequired[str]
+    extra: NotRequired[int]
+
+class Needs(TypedDict):
+    a: int
+    b: str
+    c: float
+    d: int
+    note: str
+    extra: NotRequired[str]
+
+class Partial(TypedDict, total=False):
+    c: int
+    b: str
+
+class SourceOut(ls.SourceTerm):
+    Output = Out
+    def generate(self) -> Iterator[ls.DataItem]:
+        yield ls.DataItem({})
+
+class UseNeeds(ls.FunctionTerm):
+    Input = Needs
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class UsePartial(ls.FunctionTerm):
+    Input = Partial
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+# E: Stream mismatch: Key 'a' type mismatch.
+# E: Stream mismatch: Input expects key 'b', but Output does not provide it.
+# E: Stream mismatch: Input expects key 'd', but Output does not provide it.
+# E: Stream mismatch: Input expects key 'note', but Output may not provide it (not required in 'Out').
+# E: Stream mismatch: Key 'extra' type mismatch.
+bad = SourceOut() * UseNeeds()
+fine = SourceOut() * UsePartial()
@@ -0,0 +1,96 @@
+from typing import Iterator, TypedDict, Union, reveal_type
+import logicsponge.core as ls
+
+# 1. Unions declared in any form are one schema: an item must match one of
+# its members
+A = TypedDict("A", {"a": str})
+B = TypedDict("B", {"b": float})
+
+class C(TypedDict):
+    c: int
+
+type AB = A | B
+
+class SourceA(ls.SourceTerm):
+    Output = A
+    def generate(self) -> Iterator[ls.DataItem]:
+        yield ls.DataItem({"a": ""})
+
+class SourceC(ls.SourceTerm):
+    Output = C
+    def generate(self) -> Iterator[ls.DataItem]:
+        yield ls.DataItem({"c": 0})
+
+class UseAB(ls.FunctionTerm):
+    Input = Union[A, B]
+
+class UseBA(ls.FunctionTerm):
+    Input = B | A
+
+class UseAlias(ls.FunctionTerm):
+    Input = AB
+
+class UseProperty(ls.FunctionTerm):
+    @property
+    def Input(self) -> type[Union[B, A]]:
+        return Union[B, A]  # type: ignore[return-value]
+
+fine = [SourceA() * UseAB(), SourceA() * UseBA(), SourceA() * UseAlias(), SourceA() * UseProperty()]
+merged = (SourceA() | SourceA()) * ls.MergeToSingleStream() * UseBA()
+# Both compositions fail the same way: mypy reports the error once
+# E: Stream mismatch: 'C' matches no member of Input 'union[A, B]'.
+# E: A: Input expects key 'a', but Output does not provide it.
+bad = [SourceC() * UseAB(), SourceC() * UseAlias()]
+
+
+# 2. The type variables of a PEP 695 generic term are solved from the
+# upstream Output
+class IntX(TypedDict):
+    x: int
+
+class StrX(TypedDict):
+    x: str
+
+class IntY(TypedDict):
+    y: int
+
+class GenX[T](TypedDict):
+    x: T
+
+class GenY[T](TypedDict):
+    y: T
+
+class Ints(ls.SourceTerm):
+    Output = IntX
+    def generate(self) -> Iterator[ls.DataItem]:
+        yield ls.DataItem({"x": 1})
+
+class Strs(ls.SourceTerm):
+    Output = StrX
+    def generate(self) -> Iterator[ls.DataItem]:
+        yield ls.DataItem({"x": "a"})
+
+class XtoY[T](ls.FunctionTerm):
+    @property
+    def Input(self) -> type[GenX[T]]:
+        return GenX[T]
+    @property
+    def Output(self) -> type[GenY[T]]:
+        return GenY[T]
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return ls.DataItem({"y": di["x"]})
+
+class UseIntY(ls.FunctionTerm):
+    Input = IntY
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+solved_int = Ints() * XtoY() * UseIntY()
+# E: Stream mismatch: Key 'y' type mismatch.
+# E: Expected: builtins.int
+# E: Got:      builtins.str
+solved_str = Strs() * XtoY() * UseIntY()
+# E: Stream mismatch: Key 'x' type mismatch.
+explicit = Strs() * XtoY[int]() * UseIntY()
+# N: Revealed type is "hw8.SequentialTerm[None -> GenY[builtins_int]]"
+reveal_type(Ints() * XtoY())
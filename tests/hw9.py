@@ -0,0 +1,90 @@
+from typing import Iterator, TypedDict, reveal_type
+import logicsponge.core as ls
+from logicsponge.core import stats
+from mypy_pkg.runtime import Batch, Batcher, Unbatcher
+
+# 1. With the stubs, library terms get their schemas from their declarations,
+# and so do generic user terms
+class Sample(TypedDict):
+    value: float
+
+class Indexed(TypedDict):
+    index: int
+
+class Samples(ls.SourceTerm):
+    Output = Sample
+    def generate(self) -> Iterator[ls.DataItem]:
+        yield ls.DataItem({"value": 0.0})
+
+class Tap[S](ls.FunctionTerm):
+    Input: type[S]
+    Output: type[S]
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class UseIndexed(ls.FunctionTerm):
+    Input = Indexed
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+# N: Revealed type is "logicsponge.core.logicsponge.Print[Never]"
+reveal_type(ls.Print())
+# N: Revealed type is "hw9.SequentialTerm[None -> Sample]"
+reveal_type(Samples() * ls.Print() * ls.Delay(delay_s=1) * Tap())
+# E: Stream mismatch: Input expects key 'index', but Output does not provide it.
+bad = Samples() * ls.Id() * UseIndexed()
+fine = Samples() * ls.AddIndex(key="index") * ls.PPrint() * UseIndexed() * ls.Stop()
+
+# Statistics emit their own keys, except over time per key (dim=0), where
+# the keys of the upstream come out
+class Means(TypedDict):
+    mean: float
+
+class UseMean(ls.FunctionTerm):
+    Input = Means
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+means = [Samples() * stats.Mean() * UseMean(), Samples() * stats.Mean(dim=1) * UseMean()]
+# E: No Output type found on LHS of stream composition.
+per_key = Samples() * stats.Mean(dim=0) * UseMean()
+# E: Stream mismatch: Input expects key 'mean', but Output does not provide it.
+deviations = Samples() * stats.Std() * UseMean()
+
+
+# 2. Batches only go into batches of compatible columns; Batcher and
+# Unbatcher convert
+class Count(TypedDict):
+    value: int
+
+class TTest(TypedDict):
+    t: float
+
+class BatchTTest(ls.FunctionTerm):
+    Input = Batch[Sample]
+    Output = Batch[TTest]
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class CountBatch(ls.FunctionTerm):
+    Input = Batch[Count]
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+class Show(ls.FunctionTerm):
+    Input = TTest
+    def f(self, di: ls.DataItem) -> ls.DataItem:
+        return di
+
+ok = Samples() * Batcher(size=100) * ls.Print() * BatchTTest() * Unbatcher() * Show()
+# E: Stream mismatch: Output emits single items of 'Sample' but Input expects batches of 'Sample'; group them with Batcher(size=...).
+items_into_batch = Samples() * BatchTTest()
+# E: Stream mismatch: Output emits batches of 'TTest' but Input expects single items of 'TTest'; split them with Unbatcher().
+batch_into_items = Samples() * Batcher(size=10) * BatchTTest() * Show()
+# E: Stream mismatch: Column 'value' type mismatch.
+# E: Expected: int64 (builtins.int)
+columns = Samples() * Batcher(size=10) * CountBatch()
+# E: Stream mismatch: "Batcher" expects single items, but the upstream emits batches of 'Sample'.
+twice = Samples() * Batcher(size=10) * Batcher(size=10)
+# E: Stream mismatch: "Unbatcher" expects batches, but the upstream emits single items of 'Sample'.
+unbatch_items = Samples() * Unbatcher()
@@ -1,94 +1,844 @@
+import json
 import subprocess
 import os
 import re
+import shutil
+import textwrap
 import pytest
 from collections import defaultdict
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TESTS_DIR = os.path.join(BASE_DIR, "tests")
+STUBS_DIR = os.path.join(BASE_DIR, "stubs")
 
-def parse_expected_errors(file_path):
+GOLDEN_FILES = ["hw1.py", "hw2.py", "hw4.py", "hw5.py", "hw6.py", "hw7.py", "hw8.py", "hw9.py"]
+
+def parse_expected_errors(file_path, marker="# E:"):
     """
-    Reads the file and looks for comments like '# E: <message>'.
-    Returns a dict: { line_number: "expected message substring" }
+    Reads the file and looks for comments like '# E: <message>' (or '# N:'
+    for notes). A comment on a line of its own applies to the next line of
+    code, and several of them to the same line.
+    Returns a dict: { line_number: ["expected message substring", ...] }
     """
-    expected = {}
+    expected = defaultdict(list)
+    pending = []
     with open(file_path, "r") as f:
         for i, line in enumerate(f, start=1):
-            if "# E:" in line:
-                # Extract the message after # E:
-                parts = line.split("# E:", 1)
+            stripped = line.strip()
+            if marker in line:
+                # Extract the message after the marker
+                parts = line.split(marker, 1)
                 msg = parts[1].strip()
-                expected[i] = msg
+                if stripped.startswith("#"):
+                    pending.append(msg)
+                else:
+                    expected[i].append(msg)
+            elif pending and stripped and not stripped.startswith("#"):
+                expected[i].extend(pending)
+                pending = []
     return expected
 
-def parse_actual_errors(stdout):
+def parse_actual_errors(stdout, severity="error"):
     """
-    Parses Mypy output.
-    Returns a dict: { line_number: ["error message 1", "error message 2"] }
+    Parses Mypy output, with the indented lines that continue a message.
+    Returns a dict: { file_path: { line_number: ["error message 1", "error message 2"] } }
     """
     # Regex to capture: filename:line: error: message
-    # We only care about errors (not notes)
-    regex = re.compile(r"^.*:(\d+):\s+error:\s+(.*)$")
-    actual = defaultdict(list)
-    
+    regex = re.compile(r"^(.*?):(\d+):\s+(error|note):\s+(.*)$")
+    actual = defaultdict(lambda: defaultdict(list))
+    messages = None
+
     for line in stdout.splitlines():
         match = regex.match(line)
         if match:
-            line_num = int(match.group(1))
-            message = match.group(2)
-            actual[line_num].append(message)
+            messages = None
+            if match.group(3) == severity:
+                file_path = os.path.abspath(match.group(1))
+                messages = actual[file_path][int(match.group(2))]
+                messages.append(match.group(4))
+        elif messages and line.startswith(" "):
+            messages[-1] += "\n" + line
+        else:
+            messages = None
     return actual
 
-def run_mypy_and_compare(filename):
-    file_path = os.path.join(TESTS_DIR, filename)
+@pytest.fixture(scope="session")
+def golden_build():
+    """
+    Checks all golden files in one in-process mypy build, so typeshed and
+    logicsponge are only analysed once for the whole suite.
+    Returns the actual errors and notes, per file and line.
+    """
+    from mypy import api
+
     config_path = os.path.join(BASE_DIR, "mypy.ini")
-    
+    file_paths = [os.path.join(TESTS_DIR, filename) for filename in GOLDEN_FILES]
+    # hw9.py imports mypy_pkg.runtime
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("MYPYPATH", BASE_DIR)
+        stdout, stderr, status = api.run(
+            file_paths + ["--config-file", config_path, "--no-incremental", "--hide-error-codes"]
+        )
+    if status == 2:
+        pytest.fail(f"mypy crashed:\n{stdout}{stderr}")
+    return {severity: parse_actual_errors(stdout, severity) for severity in ("error", "note")}
+
+def compare_errors(filename, actual_errors, actual_notes):
+    file_path = os.path.join(TESTS_DIR, filename)
+
     # 1. Parse expectations from source code
     expected_errors = parse_expected_errors(file_path)
-    
-    # 2. Run Mypy
-    result = subprocess.run(
-        ["mypy", file_path, "--config-file", config_path, "--no-incremental", "--hide-error-codes"],
-        capture_output=True,
-        text=True
-    )
-    
-    # 3. Parse actual errors from Mypy output
-    actual_errors = parse_actual_errors(result.stdout)
-    
-    # 4. Compare
+    expected_notes = parse_expected_errors(file_path, "# N:")
+
+    # 2. Compare
     errors = []
-    
-    # Check if expected errors occurred
-    for line_num, expected_msg in expected_errors.items():
-        if line_num not in actual_errors:
-            errors.append(f"Line {line_num}: Expected error '{expected_msg}' but got PASSED.")
-        else:
-            # Check if the message matches
-            found = False
-            for actual_msg in actual_errors[line_num]:
-                if expected_msg in actual_msg:
-                    found = True
-                    break
-            if not found:
-                errors.append(f"Line {line_num}: Expected '{expected_msg}' but got '{actual_errors[line_num]}'")
-
-    # Check for unexpected errors (false positives)
+
+    # Check if expected errors and notes occurred
+    for expected, actual, kind in ((expected_errors, actual_errors, "error"), (expected_notes, actual_notes, "note")):
+        for line_num, expected_msgs in expected.items():
+            for expected_msg in expected_msgs:
+                if line_num not in actual:
+                    errors.append(f"Line {line_num}: Expected {kind} '{expected_msg}' but got PASSED.")
+                elif not any(expected_msg in actual_msg for actual_msg in actual[line_num]):
+                    errors.append(f"Line {line_num}: Expected '{expected_msg}' but got '{actual[line_num]}'")
+
+    # Check for unexpected errors (false positives); notes other than the
+    # expected ones (e.g. unread keys) are fine
     for line_num, msgs in actual_errors.items():
-        if line_num not in expected_errors:
-            errors.append(f"Line {line_num}: Unexpected error reported: {msgs}")
+        unexpected = [msg for msg in msgs if not any(expected in msg for expected in expected_errors.get(line_num, ()))]
+        if unexpected:
+            errors.append(f"Line {line_num}: Unexpected error reported: {unexpected}")
 
     if errors:
         pytest.fail(f"Test failed for {filename}:\n" + "\n".join(errors))
 
+def run_mypy_and_compare(filename, golden_build):
+    file_path = os.path.join(TESTS_DIR, filename)
+    compare_errors(filename, golden_build["error"][file_path], golden_build["note"][file_path])
+
 # --- Tests ---
 
-@pytest.mark.parametrize("filename", ["hw1.py", "hw2.py"])
-def test_valid_files(filename):
-    """Ensure these files have ZERO errors."""
-    run_mypy_and_compare(filename)
+@pytest.mark.parametrize("filename", ["hw1.py", "hw2.py", "hw5.py", "hw6.py"])
+def test_valid_files(filename, golden_build):
+    """Ensure these files have exactly the errors marked with '# E:' (none for hw1.py, hw5.py, hw6.py)."""
+    run_mypy_and_compare(filename, golden_build)
 
-def test_generics_failures():
+def test_generics_failures(golden_build):
     """Ensure hw4.py has exactly the errors marked with '# E:'."""
-    run_mypy_and_compare("hw4.py")
\ No newline at end of file
+    run_mypy_and_compare("hw4.py", golden_build)
+
+def test_compositions(golden_build):
+    """hw7.py: circuit types, parallel branches, and every key problem of a composition."""
+    run_mypy_and_compare("hw7.py", golden_build)
+
+def test_declaration_forms(golden_build):
+    """hw8.py: unions in every form, and generic terms solved from their upstream."""
+    run_mypy_and_compare("hw8.py", golden_build)
+
+def test_library_stubs_and_batches(golden_build):
+    """hw9.py: library terms declared by the stubs, and batches of columns."""
+    run_mypy_and_compare("hw9.py", golden_build)
+
+# --- Plugin logging ---
+
+def write_project(tmp_path, settings, files=None, mypy_path=(STUBS_DIR,)):
+    """Writes a pyproject.toml enabling the plugin, and searching `mypy_path` (the stubs by default), next to the given files (hw2.py by default)."""
+    plugin_path = os.path.join(BASE_DIR, "mypy_pkg", "plugin.py")
+    search_path = f"mypy_path = {json.dumps(list(mypy_path))}\n" if mypy_path else ""
+    with open(tmp_path / "pyproject.toml", "w") as f:
+        f.write(f'[tool.mypy]\nplugins = ["{plugin_path}"]\n{search_path}\n[tool.logicsponge]\n{settings}\n')
+    if files is None:
+        with open(os.path.join(TESTS_DIR, "hw2.py")) as src:
+            files = {"hw2.py": src.read()}
+    for name, text in files.items():
+        with open(tmp_path / name, "w") as f:
+            f.write(textwrap.dedent(text))
+
+def run_mypy_in(tmp_path, filename="hw2.py", incremental=False):
+    args = ["mypy", filename, "--config-file", "pyproject.toml"]
+    args += ["--cache-dir", ".mypy_cache"] if incremental else ["--no-incremental"]
+    return subprocess.run(args, capture_output=True, text=True, cwd=tmp_path)
+
+def test_logging_off_by_default(tmp_path):
+    """Only mypy's own report lines reach stdout."""
+    write_project(tmp_path, "allow_untyped_streams = false")
+    result = run_mypy_in(tmp_path)
+    report = re.compile(r"^(.*:\d+: (error|note): .*|\s+.*|Found \d+ errors? in .*|Success: .*)$")
+    assert result.stdout
+    for line in result.stdout.splitlines():
+        assert report.match(line), line
+    assert result.stderr == ""
+
+def test_json_log_file(tmp_path):
+    write_project(tmp_path, 'log_level = "debug"\nlog_format = "json"\nlog_file = "plugin.log"')
+    result = run_mypy_in(tmp_path)
+    with open(tmp_path / "plugin.log") as f:
+        entries = [json.loads(line) for line in f]
+    events = {entry["event"] for entry in entries}
+    assert "plugin_loaded" in events
+    assert "compose" in events
+    assert all(entry["level"] in ("debug", "info") for entry in entries)
+    assert "compose" not in result.stdout
+
+
+# --- Incremental mode ---
+
+SCHEMAS = """
+    class Base:
+        pass
+
+    class Msg(Base):
+        pass
+"""
+
+TERMS = """
+    from typing import Iterator
+    import logicsponge.core as ls
+    from schemas import Base, Msg
+
+    class Source(ls.SourceTerm):
+        Output = Msg
+        def generate(self) -> Iterator[ls.DataItem]:
+            yield ls.DataItem({})
+
+    class Consumer(ls.FunctionTerm):
+        Input = Base
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    class Untyped(ls.FunctionTerm):
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+"""
+
+def test_incremental_schema_change(tmp_path):
+    """Editing a schema module rechecks the compositions that use it."""
+    circuit = """
+        from terms import Source, Consumer
+
+        def main() -> None:
+            (Source() * Consumer()).start()
+    """
+    write_project(tmp_path, "", {"schemas.py": SCHEMAS, "terms.py": TERMS, "circuit.py": circuit})
+    assert run_mypy_in(tmp_path, "circuit.py", incremental=True).returncode == 0
+
+    # The interface of terms.py does not change, only the schema hierarchy does
+    write_project(tmp_path, "", {"schemas.py": SCHEMAS.replace("class Msg(Base):", "class Msg:")})
+    result = run_mypy_in(tmp_path, "circuit.py", incremental=True)
+    assert "circuit.py:5: error: Stream mismatch" in result.stdout
+
+def test_incremental_config_change(tmp_path):
+    """Changing [tool.logicsponge] invalidates cached results."""
+    circuit = """
+        from terms import Source, Untyped
+
+        def main() -> None:
+            (Source() * Untyped()).start()
+    """
+    files = {"schemas.py": SCHEMAS, "terms.py": TERMS, "circuit.py": circuit}
+    write_project(tmp_path, "allow_untyped_streams = false", files)
+    assert "No Input type found" in run_mypy_in(tmp_path, "circuit.py", incremental=True).stdout
+
+    write_project(tmp_path, "allow_untyped_streams = true", {})
+    assert run_mypy_in(tmp_path, "circuit.py", incremental=True).returncode == 0
+
+def test_incremental_schemas_from_metadata(tmp_path):
+    """A warm run reads the schemas of unchanged term modules from the cache."""
+    circuit = """
+        from terms import Source, Consumer
+
+        def main() -> None:
+            (Source() * Consumer()).start()
+    """
+    files = {"schemas.py": SCHEMAS, "terms.py": TERMS, "circuit.py": circuit}
+    write_project(tmp_path, "report_cache_stats = true", files)
+    assert run_mypy_in(tmp_path, "circuit.py", incremental=True).returncode == 0
+
+    write_project(tmp_path, "report_cache_stats = true", {"circuit.py": circuit + "    # edited\n"})
+    result = run_mypy_in(tmp_path, "circuit.py", incremental=True)
+    assert result.returncode == 0
+    assert "schemas from metadata hits=4, misses=0" in result.stderr
+
+def test_daemon_schema_change(tmp_path):
+    """dmypy rechecks a circuit variable built from a schema edited in another module."""
+    schemas = """
+        from typing import TypedDict
+
+        class Msg(TypedDict):
+            x: int
+    """
+    terms = """
+        from typing import Iterator, TypedDict
+        import logicsponge.core as ls
+        from schemas import Msg
+
+        class Need(TypedDict):
+            x: int
+
+        class Source(ls.SourceTerm):
+            Output = Msg
+            def generate(self) -> Iterator[ls.DataItem]:
+                yield ls.DataItem({})
+
+        class Use(ls.FunctionTerm):
+            Input = Need
+            def f(self, di: ls.DataItem) -> ls.DataItem:
+                return di
+    """
+    circuit = """
+        import logicsponge.core as ls
+        from terms import Source, Use
+        pipeline = Source() * ls.Print()
+        checked = pipeline * Use()
+    """
+    write_project(tmp_path, "", {"schemas.py": schemas, "terms.py": terms, "circuit.py": circuit})
+    dmypy = ["dmypy", "--status-file", str(tmp_path / ".dmypy.json")]
+    try:
+        result = subprocess.run(
+            dmypy + ["run", "--", "circuit.py", "--config-file", "pyproject.toml"],
+            capture_output=True, text=True, cwd=tmp_path,
+        )
+        assert result.returncode == 0, result.stdout + result.stderr
+
+        write_project(tmp_path, "", {"schemas.py": schemas.replace("x: int", "x: bytes")})
+        result = subprocess.run(dmypy + ["recheck"], capture_output=True, text=True, cwd=tmp_path)
+        assert "circuit.py:5: error: Stream mismatch: Key 'x' type mismatch." in result.stdout, result.stdout
+    finally:
+        subprocess.run(dmypy + ["stop"], capture_output=True, cwd=tmp_path)
+
+
+# --- Configuration ---
+
+UNTYPED_CIRCUIT = """
+    from terms import Source, Untyped
+
+    def main() -> None:
+        (Source() * Untyped()).start()
+"""
+
+def test_per_module_overrides(tmp_path):
+    """Overrides are matched like mypy's per-module sections."""
+    settings = """
+        allow_untyped_streams = false
+
+        [[tool.logicsponge.overrides]]
+        module = "legacy.*"
+        allow_untyped_streams = true
+
+        [[tool.logicsponge.overrides]]
+        module = ["legacy.strict"]
+        allow_untyped_streams = false
+    """
+    os.makedirs(tmp_path / "legacy")
+    files = {
+        "schemas.py": SCHEMAS,
+        "terms.py": TERMS,
+        "app.py": UNTYPED_CIRCUIT,
+        "legacy/__init__.py": "",
+        "legacy/old.py": UNTYPED_CIRCUIT,
+        "legacy/strict.py": UNTYPED_CIRCUIT,
+    }
+    write_project(tmp_path, textwrap.dedent(settings), files)
+    result = run_mypy_in(tmp_path, ".")
+    errors = [line for line in result.stdout.splitlines() if "No Input type found" in line]
+    assert sorted(line.split(":")[0] for line in errors) == ["app.py", os.path.join("legacy", "strict.py")]
+
+def test_mypy_ini_sections(tmp_path):
+    """[logicsponge] and [logicsponge-<pattern>] sections of mypy.ini, found from another directory."""
+    plugin_path = os.path.join(BASE_DIR, "mypy_pkg", "plugin.py")
+    write_project(tmp_path, "", {"schemas.py": SCHEMAS, "terms.py": TERMS, "circuit.py": UNTYPED_CIRCUIT})
+    os.remove(tmp_path / "pyproject.toml")
+    with open(tmp_path / "mypy.ini", "w") as f:
+        f.write(f"[mypy]\nplugins = {plugin_path}\n\n[logicsponge]\nallow_untyped_streams = False\n\n")
+        f.write("[logicsponge-circuit]\nallow_untyped_streams = True\n")
+    os.makedirs(tmp_path / "elsewhere")
+    result = subprocess.run(
+        ["mypy", "--no-incremental", "--config-file", "../mypy.ini", "../circuit.py", "../terms.py"],
+        capture_output=True, text=True, cwd=tmp_path / "elsewhere",
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+# --- Library terms ---
+
+LIBRARY_CIRCUIT = """
+    from typing import Iterator, TypedDict
+    import logicsponge.core as ls
+    from logicsponge.core import dashboard, stats
+    from tagging import Tagger
+
+    class Sample(TypedDict):
+        x: float
+
+    class Indexed(TypedDict):
+        index: int
+        tag: str
+
+    class PValue(TypedDict):
+        index: int
+        p: float
+
+    class Source(ls.SourceTerm):
+        Output = Sample
+        def generate(self) -> Iterator[ls.DataItem]:
+            yield ls.DataItem({})
+
+    class UseIndexed(ls.FunctionTerm):
+        Input = Indexed
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    class UsePValue(ls.FunctionTerm):
+        Input = PValue
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    Source() * dashboard.Plot("x") * ls.AddIndex(key="index") * Tagger() * ls.Print() * UseIndexed()
+    Source() * stats.OneSampleTTest("t", dim=0) * ls.DataItemFilter(lambda d: True) * ls.AddIndex(key="index") * UsePValue()
+"""
+
+TAGGING = """
+    import logicsponge.core as ls
+
+    class Tagger(ls.FunctionTerm):
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return ls.DataItem({**di, "tag": "t"})
+
+    BEHAVIORS = {"tagging.Tagger": {"behavior": "extend", "adds": {"tag": "str"}}}
+"""
+
+def test_library_behaviors_and_entry_points(tmp_path):
+    """Library terms transform the upstream schema; other packages register theirs through entry points."""
+    # The real package, for the terms the stubs do not declare
+    write_project(tmp_path, "", {"circuit.py": LIBRARY_CIRCUIT, "tagging.py": TAGGING}, mypy_path=())
+    dist_info = tmp_path / "tagging-0.1.dist-info"
+    os.makedirs(dist_info)
+    with open(dist_info / "METADATA", "w") as f:
+        f.write("Metadata-Version: 2.1\nName: tagging\nVersion: 0.1\n")
+    with open(dist_info / "entry_points.txt", "w") as f:
+        f.write("[logicsponge_mypy.behaviors]\ntagging = tagging:BEHAVIORS\n")
+
+    env = {**os.environ, "PYTHONPATH": str(tmp_path)}
+    result = subprocess.run(
+        ["mypy", "circuit.py", "--config-file", "pyproject.toml", "--no-incremental"],
+        capture_output=True, text=True, cwd=tmp_path, env=env,
+    )
+    assert "circuit.py:34: error: Stream mismatch: Input expects key 'p'" in result.stdout
+    assert "Found 1 error" in result.stdout, result.stdout
+
+
+# --- Costs and batches across modules ---
+
+COST_TERMS = """
+    from typing import Iterator, TypedDict
+    import logicsponge.core as ls
+    from mypy_pkg.runtime import Batch
+
+    class Ticks(ls.SourceTerm):
+        Rate = 20
+        def generate(self) -> Iterator[ls.DataItem]:
+            yield ls.DataItem({})
+
+    class Fast(ls.FunctionTerm):
+        Latency = 0.01
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    class Slow(ls.FunctionTerm):
+        Latency = 1.0
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    class Slower(Slow):
+        pass
+
+    class Broken(ls.FunctionTerm):
+        Latency = -1.0
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    class Sample(TypedDict):
+        value: float
+
+    class Count(TypedDict):
+        value: int
+
+    class Samples(ls.SourceTerm):
+        Output = Sample
+        def generate(self) -> Iterator[ls.DataItem]:
+            yield ls.DataItem({"value": 0.0})
+
+    class CountBatch(ls.FunctionTerm):
+        Input = Batch[Count]
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+"""
+
+COST_CIRCUIT = """
+    import logicsponge.core as ls
+    from mypy_pkg.runtime import Batcher
+    from terms import Ticks, Fast, Slow, Slower, Samples, CountBatch
+
+    ok = Ticks() * Fast() * (Fast() | Fast()) * ls.Print()
+    late = Ticks() * Fast() * Slow()
+    branches = Ticks() * (Fast() | Slower())
+    inner = Fast() * Slow()
+    outer = Ticks() * inner
+    untimed = Fast() * Slow() * Fast()
+    columns = Samples() * Batcher(size=10) * CountBatch()
+"""
+
+@pytest.fixture(scope="module")
+def cross_module_runs(tmp_path_factory):
+    """A cold run, then two incremental ones, of circuits built from the terms of another module."""
+    tmp_path = tmp_path_factory.mktemp("cross_module")
+    files = {"terms.py": COST_TERMS, "circuit.py": COST_CIRCUIT}
+    write_project(tmp_path, "allow_untyped_streams = true", files, mypy_path=[STUBS_DIR, BASE_DIR])
+    return [run_mypy_in(tmp_path, "circuit.py", incremental=incremental) for incremental in (False, True, True)]
+
+def test_throughput_bottleneck(cross_module_runs):
+    """Terms declaring Latency/Rate get their circuits checked for a bottleneck, across modules."""
+    for result in cross_module_runs:
+        assert (
+            'circuit.py:7: error: Stream throughput: upstream emits 20 items/s but "Slow" '
+            "processes at most 1 items/s (critical path 1.01 s per item)." in result.stdout
+        )
+        assert 'circuit.py:8: error: Stream throughput: upstream emits 20 items/s but "Slower"' in result.stdout
+        assert 'circuit.py:10: error: Stream throughput: upstream emits 20 items/s but "Slow"' in result.stdout
+        assert "terms.py:25: error: Latency of a term cannot be negative." in result.stdout
+        assert "Found 5 errors" in result.stdout, result.stdout
+
+def test_batch_schemas_across_modules(cross_module_runs):
+    """Batch schemas read back from the cache are checked like fresh ones."""
+    for result in cross_module_runs:
+        assert "circuit.py:12: error: Stream mismatch: Column 'value' type mismatch." in result.stdout
+        assert "  Expected: int64 (builtins.int)" in result.stdout
+
+
+# --- Plugin outputs ---
+
+PROJECTION_CIRCUIT = """
+    from typing import Iterator, TypedDict
+    import logicsponge.core as ls
+
+    class Wide(TypedDict):
+        a: int
+        b: str
+        c: float
+
+    class OnlyA(TypedDict):
+        a: int
+
+    class AC(TypedDict):
+        a: int
+        c: float
+
+    class Source(ls.SourceTerm):
+        Output = Wide
+        def generate(self) -> Iterator[ls.DataItem]:
+            yield ls.DataItem({})
+
+    class UseA(ls.FunctionTerm):
+        Input = OnlyA
+        Output = OnlyA
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    class UseAC(ls.FunctionTerm):
+        Input = AC
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    chain = Source() * UseA() * UseA()
+    printed = Source() * ls.Print() * UseA()
+    branches = Source() * (UseA() | UseAC())
+
+    class StrA(TypedDict):
+        a: str
+
+    class UseStrA(ls.FunctionTerm):
+        Input = StrA
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    mismatched = Source() * UseStrA()
+"""
+
+QUIET_CIRCUIT = """
+    from projection import Source, UseA
+
+    chain = Source() * UseA()
+"""
+
+FUSION_CIRCUIT = """
+    from typing import Iterator, TypedDict
+    import logicsponge.core as ls
+    from mypy_pkg.runtime import fuse
+
+    class Num(TypedDict):
+        n: int
+
+    class Text(TypedDict):
+        s: str
+
+    class Source(ls.SourceTerm):
+        Output = Num
+        def generate(self) -> Iterator[ls.DataItem]:
+            yield ls.DataItem({"n": 0})
+
+    class Inc(ls.FunctionTerm):
+        Input = Num
+        Output = Num
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return ls.DataItem({"n": di["n"] + 1})
+
+    class Show(ls.FunctionTerm):
+        Input = Num
+        Output = Text
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return ls.DataItem({"s": str(di["n"])})
+
+    class Total(ls.StatefulFunctionTerm):
+        Input = Num
+        Output = Num
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    chain = Source() * Inc() * Inc() * Total() * Inc() * Show()
+    split = Source() * Inc() * (Inc() | Inc())
+    fused = Source() * fuse(Inc(), Inc(), Show())
+    wrong = fuse(Show(), Inc())
+    stateful = fuse(Inc(), Total())
+    broken = Source() * Inc() * Show() * Inc()
+"""
+
+SCHEMAS_READING = """
+    from typing import NotRequired, TypedDict
+
+    class Reading(TypedDict):
+        name: str
+        value: float
+        unit: NotRequired[str]
+"""
+
+INTERNING_CIRCUIT = """
+    from typing import Iterator, NotRequired, TypedDict
+    import logicsponge.core as ls
+    import schemas
+
+    Reading = TypedDict("Reading", {"value": float, "name": str, "unit": NotRequired[str]})
+
+    class Other(TypedDict):
+        name: str
+        value: float
+        unit: str
+
+    class Source(ls.SourceTerm):
+        Output = schemas.Reading
+        def generate(self) -> Iterator[ls.DataItem]:
+            yield ls.DataItem({})
+
+    class UseCopy(ls.FunctionTerm):
+        Input = Reading
+
+    class UseOther(ls.FunctionTerm):
+        Input = Other
+
+    copy = Source() * UseCopy()
+    other = Source() * UseOther()
+"""
+
+TOPOLOGY_CIRCUIT = """
+    from typing import Iterator, TypedDict
+    import logicsponge.core as ls
+
+    class Num(TypedDict):
+        n: int
+
+    class Source(ls.SourceTerm):
+        Output = Num
+        def generate(self) -> Iterator[ls.DataItem]:
+            yield ls.DataItem({"n": 0})
+
+    class Inc(ls.FunctionTerm):
+        Input = Num
+        Output = Num
+        Latency = 0.5
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    main = Source() * (Inc() | Inc()) * ls.Print()
+    inner = Inc() * Inc()
+"""
+
+OUTPUTS_SETTINGS = """
+    projection_plan = "plan.json"
+    topology_dir = "topology"
+    profile = "profile.json"
+    profile_top = 3
+    report_cache_stats = true
+    log_level = "debug"
+    log_format = "json"
+    log_file = "plugin.log"
+
+    [[tool.logicsponge.overrides]]
+    module = "projection"
+    warn_unread_keys = true
+"""
+
+@pytest.fixture(scope="module")
+def outputs_build(tmp_path_factory):
+    """
+    One cold run of a project with every output of the plugin enabled: the
+    tests below read the part of each output that concerns their module.
+    """
+    tmp_path = tmp_path_factory.mktemp("outputs")
+    with open(os.path.join(TESTS_DIR, "hw8.py")) as f:
+        unions = f.read()
+    files = {
+        "projection.py": PROJECTION_CIRCUIT,
+        "quiet.py": QUIET_CIRCUIT,
+        "fusion.py": FUSION_CIRCUIT,
+        "unions.py": unions,
+        "schemas.py": SCHEMAS_READING,
+        "interning.py": INTERNING_CIRCUIT,
+        "topology.py": TOPOLOGY_CIRCUIT,
+    }
+    write_project(tmp_path, textwrap.dedent(OUTPUTS_SETTINGS), files, mypy_path=[STUBS_DIR, BASE_DIR])
+    result = run_mypy_in(tmp_path, ".")
+    with open(tmp_path / "plugin.log") as f:
+        log = [json.loads(line) for line in f]
+    return tmp_path, result, log
+
+def lines_of(result, filename, kind="error"):
+    return [line for line in result.stdout.splitlines() if line.startswith(f"{filename}:") and f": {kind}: " in line]
+
+def test_projection_plan(outputs_build):
+    """Keys no term reads are noted where enabled, and the keys each edge needs are exported."""
+    tmp_path, result, _ = outputs_build
+    # A mismatched edge is no plan for dropping keys
+    assert lines_of(result, "projection.py") == [
+        "projection.py:45: error: Stream mismatch: Key 'a' type mismatch.",
+    ], result.stdout
+    assert lines_of(result, "projection.py", "note") == [
+        'projection.py:33: note: Keys b, c produced by "Source" are never consumed',
+        'projection.py:35: note: Key b produced by "Source" is never consumed',
+    ]
+    # Off by default, the plan has the edges all the same
+    assert lines_of(result, "quiet.py", "note") == []
+    with open(tmp_path / "plan.json") as f:
+        plan = json.load(f)
+    assert [edge["unread"] for edge in plan["modules"]["quiet"]["edges"]] == [["b", "c"]]
+    edges = plan["modules"]["projection"]["edges"]
+    assert [(edge["line"], edge["producer"], edge["consumer"], edge["needed"]) for edge in edges] == [
+        (33, "projection.Source", "projection.UseA", ["a"]),
+        (33, "projection.UseA", "projection.UseA", ["a"]),
+        (35, "projection.Source", "projection.ParallelTerm[intersection[AC, OnlyA] -> None]", ["a", "c"]),
+    ]
+
+
+def test_fusion_plan_and_fuse(outputs_build):
+    """Runs of stateless FunctionTerms go to the plan, and fuse() is checked like `*`."""
+    tmp_path, result, _ = outputs_build
+    assert lines_of(result, "fusion.py") == [
+        "fusion.py:38: error: Stream mismatch: Input expects key 'n', but Output does not provide it.  [misc]",
+        'fusion.py:39: error: Cannot fuse "Total": only stateless FunctionTerms can be fused.  [misc]',
+        "fusion.py:40: error: Stream mismatch: Input expects key 'n', but Output does not provide it.  [misc]",
+    ], result.stdout
+
+    with open(tmp_path / "plan.json") as f:
+        fusions = json.load(f)["modules"]["fusion"]["fusions"]
+    assert [(fusion["line"], fusion["terms"]) for fusion in fusions] == [
+        (35, ["fusion.Inc", "fusion.Inc"]),
+        (35, ["fusion.Inc", "fusion.Show"]),
+        # The mismatched edge Show -> Inc ends the run
+        (40, ["fusion.Inc", "fusion.Show"]),
+    ]
+
+
+def test_union_inputs_in_every_form(outputs_build):
+    """Unions declared in any form (hw8.py) share one canonical schema, and so their verdicts."""
+    _, result, log = outputs_build
+    # Each verdict is computed once, and the compositions repeating it hit the cache
+    computed = [
+        (entry["output"], entry["input"])
+        for entry in log
+        if entry["event"] == "verdict" and entry["input"].startswith("union[")
+    ]
+    assert len(computed) == len(set(computed))
+    assert {input for _, input in computed} == {"union[unions.A, unions.B]"}
+    hits = re.search(r"verdict cache hits=(\d+)", result.stderr)
+    assert hits is not None and int(hits.group(1)) > 0
+
+
+def test_structurally_identical_schemas_are_interned(outputs_build):
+    """Copies of a schema share one shape: compositions between them need no key comparison."""
+    _, result, log = outputs_build
+    assert lines_of(result, "interning.py") == [
+        "interning.py:25: error: Stream mismatch: Input expects key 'unit', but Output may not provide it "
+        "(not required in 'Reading').  [misc]",
+    ], result.stdout
+    assert "same shape: interning.Reading, schemas.Reading" in result.stderr
+    # Only the composition with the other schema compares keys
+    computed = {(entry["output"], entry["input"]) for entry in log if entry["event"] == "verdict"}
+    assert ("schemas.Reading", "interning.Other") in computed
+    assert ("schemas.Reading", "interning.Reading") not in computed
+
+
+# --- Topology ---
+
+def test_topology_export(outputs_build, tmp_path):
+    """Each module's circuits are written as a graph, and only rewritten when they change."""
+    path = outputs_build[0] / "topology" / "topology.json"
+    with open(path) as f:
+        topology = json.load(f)
+    nodes = {node["id"]: node for node in topology["nodes"]}
+    assert [(node["term"], node["kind"], node["behavior"]) for node in nodes.values()] == [
+        ("topology.Source", "source", None),
+        ("topology.Inc", "function", None),
+        ("topology.Inc", "function", None),
+        ("logicsponge.core.logicsponge.Print", "library", "identity"),
+        ("topology.Inc", "function", None),
+        ("topology.Inc", "function", None),
+    ]
+    assert nodes[0]["output"] == {"name": "topology.Num", "keys": {"n": "builtins.int"}, "required": ["n"]}
+    assert nodes[1]["cost"]["latency"] == 0.5
+    assert topology["edges"] == [[0, 1], [0, 2], [1, 3], [2, 3], [4, 5]]
+    assert [(c["line"], c["nodes"], c["entries"], c["exits"]) for c in topology["circuits"]] == [
+        (20, [0, 1, 2, 3], [0], [3]),
+        (21, [4, 5], [4], [5]),
+    ]
+
+    write_project(tmp_path, 'topology_dir = "topology"', {"topology.py": TOPOLOGY_CIRCUIT})
+    os.makedirs(tmp_path / "topology")
+    path = shutil.copy2(path, tmp_path / "topology" / "topology.json")
+    mtime = path.stat().st_mtime_ns
+    run_mypy_in(tmp_path, "topology.py")
+    assert path.stat().st_mtime_ns == mtime
+    (tmp_path / "topology.py").write_text(textwrap.dedent(TOPOLOGY_CIRCUIT).replace("inner = Inc() * Inc()", "inner = Inc()"))
+    run_mypy_in(tmp_path, "topology.py")
+    with open(path) as f:
+        assert len(json.load(f)["circuits"]) == 1
+
+
+# --- Profiling ---
+
+def test_profile(outputs_build, tmp_path):
+    """The profile times hooks, phases and composition sites, from the settings or the environment."""
+    build_path, result, _ = outputs_build
+    with open(build_path / "profile.json") as f:
+        profile = json.load(f)
+    assert profile["hooks"]["check_stream_compatibility"]["calls"] > 0
+    assert {"_resolve_term", "_verdict", "_structural_check"} <= set(profile["phases"])
+    assert profile["caches"]["verdicts"]["misses"] > 0
+    sites = profile["slowest_sites"]
+    assert len(sites) == 3
+    assert sites[0]["total_s"] >= sites[1]["total_s"] >= sites[2]["total_s"]
+    assert "slowest composition site" in result.stderr
+    assert f"{sites[0]['file']}:{sites[0]['line']}" in result.stderr
+
+    # Nothing to check is enough to get a profile
+    write_project(tmp_path, "", {"empty.py": ""})
+    env = {**os.environ, "LOGICSPONGE_PROFILE": str(tmp_path / "from-env.json")}
+    subprocess.run(["mypy", "empty.py", "--config-file", "pyproject.toml", "--no-incremental"], capture_output=True, cwd=tmp_path, env=env)
+    assert (tmp_path / "from-env.json").exists()
@@ -0,0 +1,219 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+from typing import NotRequired, Optional, TypedDict
+
+import pytest
+import logicsponge.core as ls
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+spec = importlib.util.spec_from_file_location("logicsponge_runtime", os.path.join(BASE_DIR, "mypy_pkg", "runtime.py"))
+runtime = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = runtime
+spec.loader.exec_module(runtime)
+
+
+class Point(TypedDict):
+    x: float
+    y: float
+
+
+class Reading(TypedDict):
+    name: str
+    value: int | None
+    tags: list[str]
+    at: Point
+    unit: NotRequired[str]
+    previous: NotRequired[Optional["Reading"]]
+
+
+GOOD = {"name": "t", "value": None, "tags": ["a"], "at": {"x": 1, "y": 2.5}}
+
+
+def test_validator_is_compiled_once_per_schema():
+    validator = runtime.validator_for(Reading)
+    assert runtime.validator_for(Reading) is validator
+    assert "isinstance" in validator.source
+    assert validator.check(GOOD)
+    assert validator.check(ls.DataItem({**GOOD, "previous": ls.DataItem(GOOD), "unit": "s"}))
+
+
+def test_validator_reports_every_problem():
+    validator = runtime.validator_for(Reading)
+    bad = {"name": 1, "tags": ["a", 2], "at": {"x": "0", "y": 0}, "unit": None}
+    assert not validator.check(bad)
+    assert validator.problems(bad) == [
+        "key 'name' has a value of type int",
+        "missing key 'value'",
+        "key 'tags' has a value of type list",
+        "key 'at' has a value of type dict",
+        "key 'unit' has a value of type NoneType",
+    ]
+    with pytest.raises(runtime.SchemaError, match="does not match Reading"):
+        validator(bad)
+
+
+def test_validated_samples_function_terms():
+    @runtime.validated(every=3)
+    class Broken(ls.FunctionTerm):
+        Output = Point
+
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return ls.DataItem({"x": di["x"], "y": "oops" if di["x"] == 5 else 0.0})
+
+    term = Broken()
+    # Items 3 and 6 are checked: the broken 5th item goes through
+    for x in (0, 1, 2, 3, 5):
+        term.f(ls.DataItem({"x": x}))
+    with pytest.raises(runtime.SchemaError, match="key 'y' has a value of type str"):
+        term.f(ls.DataItem({"x": 5}))
+    stats = runtime.validation_stats(term)
+    assert (stats.sampled, stats.checked, stats.failures) == (2, 2, 1)
+
+
+def test_validated_sources_and_budget():
+    @runtime.validated(budget=0.0)
+    class Points(ls.SourceTerm):
+        Output = Point
+
+        def generate(self):
+            for i in range(10):
+                yield ls.DataItem({"x": i, "y": "not checked"})
+
+    with pytest.raises(runtime.SchemaError):
+        list(Points().generate())
+
+    # Once a check took any time, a zero budget skips all the others
+    assert len(list(Points().generate())) == 10
+    stats = runtime.validation_stats(Points)
+    assert stats.checked == 1 and stats.failures == 1 and stats.over_budget == 10
+
+
+Scores = TypedDict("Scores", {"p-value": float | None, "index": int, "tag": NotRequired[str]})
+
+
+def test_records_convert_from_and_to_data_items():
+    record = runtime.record_type(Scores)
+    assert runtime.record_type(Scores) is record
+    assert record.keys == ("p-value", "index", "tag")
+
+    item = ls.DataItem({"p-value": None, "index": 3})
+    converted = record.from_item(item)
+    assert not hasattr(converted, "__dict__")
+    assert converted["index"] == 3 and "tag" not in converted
+    assert converted == record(None, 3)
+    assert converted.to_item() == item
+    with pytest.raises(KeyError):
+        converted["tag"]
+    with pytest.raises(TypeError):
+        runtime.Record()
+
+
+def test_column_blocks_pack_numeric_keys():
+    items = [ls.DataItem({"p-value": 0.5, "index": i, "tag": "t"}) for i in range(3)]
+    block = runtime.ColumnBlock.from_items(Scores, items)
+    assert len(block) == 3
+    assert block.column("index").typecode == "q"
+    assert block.column("p-value") == [0.5] * 3
+    assert block[1]["index"] == 1
+    assert block.to_items() == items
+
+    with pytest.raises(KeyError):
+        block.append({"p-value": 0.1})
+    assert len(block) == 3 and len(block.column("p-value")) == 3
+    with pytest.raises(TypeError):
+        block.append({"p-value": 0.1, "index": 1.5})
+    assert len(block) == 3 and len(block.column("p-value")) == 3
+    assert block.to_items() == items
+
+
+def test_project_keeps_planned_keys(tmp_path):
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text(json.dumps({"version": 2, "modules": {"m": {"edges": [
+        {"line": 3, "producer": "m.Wide", "consumer": "m.UseA", "needed": ["a"], "unread": ["b", "c"]},
+        {"line": 4, "producer": "m.Wide", "consumer": "m.UseC", "needed": ["c"], "unread": ["a", "b"]},
+    ], "fusions": []}}}))
+    plan = runtime.load_projection_plan(str(plan_path))
+    assert plan == {"m.Wide": frozenset({"a", "c"})}
+
+    project = runtime.Project(keys=sorted(plan["m.Wide"]))
+    assert project.f(ls.DataItem({"a": 1, "b": 2, "c": 3})) == ls.DataItem({"a": 1, "c": 3})
+
+
+def test_fuse_runs_terms_in_sequence():
+    class Inc(ls.FunctionTerm):
+        Input = Point
+        Output = Point
+
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return ls.DataItem({"x": di["x"] + 1, "y": di["y"]})
+
+    class Positive(ls.FunctionTerm):
+        Output = Point
+
+        def f(self, di: ls.DataItem) -> Optional[ls.DataItem]:
+            return di if di["x"] > 0 else None
+
+    fused = runtime.fuse(Inc(), Positive(), Inc())
+    assert fused.Input is Point and fused.Output is Point
+    assert fused.f(ls.DataItem({"x": 0, "y": 1})) == ls.DataItem({"x": 2, "y": 1})
+    assert fused.f(ls.DataItem({"x": -5, "y": 1})) is None
+
+    class Total(ls.StatefulFunctionTerm):
+        def f(self, di: ls.DataItem) -> ls.DataItem:
+            return di
+
+    with pytest.raises(TypeError, match="only stateless FunctionTerms"):
+        runtime.fuse(Inc(), Total())
+
+
+def test_load_topology(tmp_path):
+    node = {"line": 3, "column": 0, "behavior": None, "input": None, "output": None, "cost": None}
+    (tmp_path / "m.json").write_text(json.dumps({
+        "version": 1,
+        "module": "m",
+        "nodes": [
+            {**node, "id": 0, "term": "m.Source", "kind": "source"},
+            {**node, "id": 1, "term": "m.A", "kind": "function", "column": 11},
+            {**node, "id": 2, "term": "m.B", "kind": "function", "column": 17},
+        ],
+        "edges": [[0, 1], [0, 2]],
+        "circuits": [{"line": 3, "column": 0, "nodes": [0, 1, 2], "entries": [0], "exits": [1, 2]}],
+    }))
+    topologies = runtime.load_topologies(str(tmp_path))
+    assert list(topologies) == ["m"]
+    topology = topologies["m"]
+    assert [node.name for node in topology.successors(0)] == ["A", "B"]
+    assert [node.name for node in topology.predecessors(2)] == ["Source"]
+    assert topology.circuit_at(3).exits == (1, 2)
+
+
+def test_batcher_and_unbatcher():
+    assert runtime.column_dtypes(Scores) == {"p-value": "object", "index": "int64", "tag": "object"}
+
+    batcher = runtime.Batcher(size=2, schema=Point)
+    assert batcher.f(ls.DataItem({"x": 1, "y": 2.0})) is None
+    batch = batcher.f(ls.DataItem({"x": 3, "y": 4.5}))
+    assert batch["x"].dtype == "float64" and batch["x"].tolist() == [1.0, 3.0]
+
+    items = runtime.Unbatcher().f(batch)
+    assert items == [ls.DataItem({"x": 1.0, "y": 2.0}), ls.DataItem({"x": 3.0, "y": 4.5})]
+    assert type(items[0]["x"]) is float
+
+
+def test_validators_and_records_without_numpy():
+    """Only batches import NumPy."""
+    code = (
+        "import importlib.util, sys; sys.modules['numpy'] = None\n"
+        "from typing import TypedDict\n"
+        "spec = importlib.util.spec_from_file_location('logicsponge_runtime', sys.argv[1])\n"
+        "runtime = importlib.util.module_from_spec(spec)\n"
+        "sys.modules[spec.name] = runtime\n"
+        "spec.loader.exec_module(runtime)\n"
+        "Point = TypedDict('Point', {'x': float})\n"
+        "assert runtime.validator_for(Point).check({'x': 1.0}) and runtime.record_type(Point)(1.0)['x'] == 1.0\n"
+    )
+    subprocess.run([sys.executable, "-c", code, spec.origin], check=True)